@@ -1,20 +1,30 @@
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from app.config import Config
+from app import serialization
+from app.serialization import FastJSONProvider
 
 # Initialize SQLAlchemy
 db = SQLAlchemy()
 
-def create_app(config_class=Config):
+def create_app(config_class=Config, register_api=True):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.json = FastJSONProvider(app)
+    # JSONB columns use the same encoder as responses and queue messages
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'json_serializer': serialization.dumps,
+        'json_deserializer': serialization.loads,
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+    }
     
     # Initialize extensions
     db.init_app(app)
     
-    # Import and register blueprints
-    from app.api.routes import api_bp
-    app.register_blueprint(api_bp, url_prefix='/api')
+    # Import and register blueprints; the worker only needs the database and skips them
+    if register_api:
+        from app.api.routes import api_bp
+        app.register_blueprint(api_bp, url_prefix='/api')
     
     # Create database tables
     with app.app_context():
@@ -0,0 +1,155 @@
+import math
+from app.config import Config
+
+class RunningStats:
+    """
+    Online mean and variance of a stream of values (Welford's method), plus a
+    time-decayed variant where older values carry exponentially less weight.
+    """
+    
+    __slots__ = ('count', 'mean', 'm2', 'decayed_weight', 'decayed_mean', 'decayed_m2')
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.decayed_weight = 0.0
+        self.decayed_mean = 0.0
+        self.decayed_m2 = 0.0
+    
+    def add(self, value, decay=1.0):
+        """
+        Add a value.
+        
+        Args:
+            value (float): The new value
+            decay (float): Factor applied to the weight of earlier values (1.0 = no decay)
+        """
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        
+        # Weighted Welford update for the decayed variant
+        self.decayed_weight = decay * self.decayed_weight + 1.0
+        delta = value - self.decayed_mean
+        self.decayed_mean += delta / self.decayed_weight
+        self.decayed_m2 = decay * self.decayed_m2 + delta * (value - self.decayed_mean)
+    
+    def remove(self, value):
+        """
+        Remove a value that was previously added (reverse Welford update).
+        The decayed variant is left alone; old values have already faded from it.
+        
+        Args:
+            value (float): The value to remove
+        """
+        if self.count <= 1:
+            self.count = 0
+            self.mean = 0.0
+            self.m2 = 0.0
+            return
+        
+        mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(0.0, self.m2 - (value - mean) * (value - self.mean))
+        self.mean = mean
+        self.count -= 1
+    
+    @property
+    def std(self):
+        """Population standard deviation"""
+        return math.sqrt(self.m2 / self.count) if self.count else 0.0
+    
+    @property
+    def decayed_std(self):
+        """Population standard deviation of the decayed variant"""
+        return math.sqrt(max(0.0, self.decayed_m2 / self.decayed_weight)) if self.decayed_weight else 0.0
+
+class AccountStats:
+    """Streaming statistics for the transactions sent by one account"""
+    
+    __slots__ = ('amounts', 'gaps', 'last_timestamp')
+    
+    def __init__(self):
+        self.amounts = RunningStats()
+        self.gaps = RunningStats()  # Hours between consecutive transactions
+        self.last_timestamp = None
+
+class AccountStatsStore:
+    """
+    Per-account amount and inter-arrival statistics, updated one transaction at
+    a time so that temporal scoring is an O(1) lookup.
+    
+    Amount statistics follow the sliding window exactly: transactions are added
+    as they enter the window and removed when they leave it. Inter-arrival
+    statistics cannot be un-merged and accumulate until the account has no
+    transactions left in the window, at which point its entry is dropped.
+    Transactions that arrive out of timestamp order update the amounts but not
+    the gaps.
+    """
+    
+    def __init__(self, half_life_hours=None):
+        """
+        Initialize an empty store.
+        
+        Args:
+            half_life_hours (float, optional): Half-life of the decayed statistics
+        """
+        self.half_life_hours = half_life_hours or Config.ACCOUNT_STATS_HALF_LIFE_HOURS
+        self._accounts = {}
+    
+    def __len__(self):
+        """Number of accounts with statistics"""
+        return len(self._accounts)
+    
+    def get(self, account_id):
+        """
+        Get the statistics for an account.
+        
+        Returns:
+            AccountStats: The account's statistics, or None if it has no transactions
+        """
+        return self._accounts.get(account_id)
+    
+    def record(self, account_id, amount, timestamp):
+        """
+        Add a transaction sent by the account.
+        
+        Args:
+            account_id (str): Sender's ID
+            amount (float): Transaction amount
+            timestamp (datetime): Transaction timestamp
+        """
+        stats = self._accounts.get(account_id)
+        if stats is None:
+            stats = self._accounts[account_id] = AccountStats()
+        
+        last_timestamp = stats.last_timestamp
+        if last_timestamp is None:
+            stats.amounts.add(amount)
+            stats.last_timestamp = timestamp
+            return
+        
+        hours = (timestamp - last_timestamp).total_seconds() / 3600
+        decay = 0.5 ** (max(hours, 0.0) / self.half_life_hours)
+        stats.amounts.add(amount, decay)
+        
+        if hours >= 0:
+            stats.gaps.add(hours, decay)
+            stats.last_timestamp = timestamp
+    
+    def remove(self, account_id, amount):
+        """
+        Remove a transaction that left the window.
+        
+        Args:
+            account_id (str): Sender's ID
+            amount (float): Transaction amount
+        """
+        stats = self._accounts.get(account_id)
+        if stats is None:
+            return
+        
+        stats.amounts.remove(amount)
+        if stats.amounts.count == 0:
+            del self._accounts[account_id]
@@ -1,8 +1,11 @@
+import hashlib
 import logging
 import json
 import re
-import numpy as np
 from urllib.parse import urlparse
+from app.config import Config
+from app.algorithm.domain_index import get_domain_index
+from app.algorithm.verdict_cache import get_verdict_cache
 
 class ContentAnalyzer:
     """
@@ -41,6 +44,72 @@ class ContentAnalyzer:
             'paytm.com',
             'bhimupi.npci.org.in'
         ]
+        
+        # Look-alike index over the legitimate domains plus any from PROTECTED_DOMAINS_FILE
+        self.domain_index = get_domain_index(
+            self.legitimate_domains,
+            Config.PROTECTED_DOMAINS_FILE,
+            Config.LOOKALIKE_SIMILARITY_THRESHOLD,
+            Config.LOOKALIKE_MAX_EDIT_DISTANCE
+        )
+        
+        # Domain verdicts are cached under a fingerprint of the rules that produced
+        # them, including the contents of the protected domain list
+        rules = [
+            self.suspicious_keywords, self.suspicious_tlds, self.suspicious_patterns,
+            self.legitimate_domains, self.domain_index.fingerprint(),
+            Config.LOOKALIKE_SIMILARITY_THRESHOLD, Config.LOOKALIKE_MAX_EDIT_DISTANCE
+        ]
+        self.verdict_version = hashlib.sha1(json.dumps(rules).encode('utf-8')).hexdigest()[:12]
+    
+    def _analyze_domain(self, domain):
+        """
+        Score the parts of a URL that depend only on its domain.
+        
+        Args:
+            domain (str): Lowercased domain (URL netloc)
+        
+        Returns:
+            dict: 'components' (score contributions, in order) and 'details'
+        """
+        components = []
+        details = {
+            'suspicious_domain': False,
+            'contains_suspicious_keywords': False,
+            'similar_to_legitimate': False,
+            'suspicious_tld': False
+        }
+        
+        # Check for suspicious TLD
+        if any(domain.endswith(tld) for tld in self.suspicious_tlds):
+            components.append(0.3)
+            details['suspicious_tld'] = True
+        
+        # Check for suspicious patterns in domain
+        for pattern in self.suspicious_patterns:
+            if re.search(pattern, domain):
+                components.append(0.2)
+                details['suspicious_domain'] = True
+                break
+        
+        # Check for suspicious keywords in domain
+        if any(keyword in domain for keyword in self.suspicious_keywords):
+            components.append(0.1)
+            details['contains_suspicious_keywords'] = True
+        
+        # Check similarity to legitimate domains
+        lookalike = self.domain_index.find_lookalike(domain)
+        if lookalike is not None:
+            components.append(0.4)
+            details['similar_to_legitimate'] = True
+            details['similar_to'] = lookalike[0]
+        
+        # If URL has many subdomain levels, increase risk
+        subdomain_count = domain.count('.')
+        if subdomain_count > 2:
+            components.append(0.1 * (subdomain_count - 2))
+        
+        return {'components': components, 'details': details}
     
     def _analyze_url(self, url):
         """
@@ -78,38 +147,19 @@ class ContentAnalyzer:
             domain = parsed_url.netloc
             risk_details['domain'] = domain
             
-            # Check for suspicious TLD
-            if any(domain.endswith(tld) for tld in self.suspicious_tlds):
-                risk_score += 0.3
-                risk_details['suspicious_tld'] = True
-            
-            # Check for suspicious patterns in domain
-            for pattern in self.suspicious_patterns:
-                if re.search(pattern, domain):
-                    risk_score += 0.2
-                    risk_details['suspicious_domain'] = True
-                    break
+            # Domain checks, served from the verdict cache when the domain was seen before
+            # (looked up per call: an analyzer created before a fork must not use the parent's cache)
+            verdict_cache = get_verdict_cache()
+            key = f"{self.verdict_version}:{domain.lower()}"
+            verdict = verdict_cache.get(key)
+            if verdict is None:
+                verdict = self._analyze_domain(domain.lower())
+                verdict_cache.put(key, verdict)
             
-            # Check for suspicious keywords in domain
-            if any(keyword in domain.lower() for keyword in self.suspicious_keywords):
-                risk_score += 0.1
-                risk_details['contains_suspicious_keywords'] = True
+            for component in verdict['components']:
+                risk_score += component
+            risk_details.update(verdict['details'])
             
-            # Check similarity to legitimate domains
-            for legit_domain in self.legitimate_domains:
-                # Simple Levenshtein-like similarity check
-                if self._domain_similarity(domain.lower(), legit_domain.lower()) > 0.7:
-                    if domain.lower() != legit_domain.lower():  # Not an exact match
-                        risk_score += 0.4
-                        risk_details['similar_to_legitimate'] = True
-                        risk_details['similar_to'] = legit_domain
-                        break
-            
-            # If URL has many subdomain levels, increase risk
-            subdomain_count = domain.count('.')
-            if subdomain_count > 2:
-                risk_score += 0.1 * (subdomain_count - 2)
-                
             # Normalize score
             risk_score = min(max(0.0, risk_score), 1.0)
             
@@ -120,34 +170,6 @@ class ContentAnalyzer:
         
         return risk_score, risk_details
     
-    def _domain_similarity(self, domain1, domain2):
-        """
-        Calculate similarity between two domains using a simple algorithm.
-        
-        Args:
-            domain1 (str): First domain
-            domain2 (str): Second domain
-            
-        Returns:
-            float: Similarity score between 0 and 1
-        """
-        # Remove common prefixes like www.
-        domain1 = re.sub(r'^www\.', '', domain1)
-        domain2 = re.sub(r'^www\.', '', domain2)
-        
-        # Simple character-based similarity
-        len1, len2 = len(domain1), len(domain2)
-        if len1 == 0 or len2 == 0:
-            return 0.0
-            
-        # Count matching characters
-        matches = sum(c1 == c2 for c1, c2 in zip(domain1, domain2))
-        
-        # Calculate similarity ratio
-        similarity = matches / max(len1, len2)
-        
-        return similarity
-    
     def _analyze_qr_code(self, qr_data):
         """
         Analyze QR code data for tampering.
@@ -0,0 +1,299 @@
+import hashlib
+import logging
+import threading
+
+def normalize_domain(domain):
+    """
+    Normalize a domain for comparison: lowercase, no port, no trailing dot, no www.
+    
+    Args:
+        domain (str): Domain or URL netloc
+    
+    Returns:
+        str: The normalized domain
+    """
+    domain = domain.strip().lower()
+    domain = domain.rsplit('@', 1)[-1]  # Drop user info
+    if not domain.startswith('['):
+        domain = domain.split(':', 1)[0]  # Drop port
+    domain = domain.rstrip('.')
+    if domain.startswith('www.'):
+        domain = domain[4:]
+    return domain
+
+def bounded_edit_distance(a, b, max_distance):
+    """
+    Levenshtein distance between two strings, computed only up to a bound.
+    
+    Only the diagonal band of width 2 * max_distance + 1 is evaluated, and the
+    computation stops as soon as every cell in a row exceeds the bound.
+    
+    Args:
+        a (str): First string
+        b (str): Second string
+        max_distance (int): Largest distance of interest
+    
+    Returns:
+        int: The edit distance, or max_distance + 1 if it is larger than max_distance
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    if a == b:
+        return 0
+    if len(a) > len(b):
+        a, b = b, a
+    
+    over = max_distance + 1
+    previous = [j if j <= max_distance else over for j in range(len(b) + 1)]
+    
+    for i in range(1, len(a) + 1):
+        low = max(1, i - max_distance)
+        high = min(len(b), i + max_distance)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= max_distance else over
+        char = a[i - 1]
+        row_min = current[0]
+        
+        for j in range(low, high + 1):
+            cost = 0 if char == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            current[j] = value if value <= max_distance else over
+            if current[j] < row_min:
+                row_min = current[j]
+        
+        if row_min > max_distance:
+            return over
+        previous = current
+    
+    return previous[len(b)]
+
+def _character_mask(text):
+    """Bit set of the characters in a string (characters may share a bit)"""
+    mask = 0
+    for char in text:
+        mask |= 1 << (ord(char) & 63)
+    return mask
+
+class LookalikeDomainIndex:
+    """
+    Index over a list of protected (legitimate) domains for look-alike detection.
+    
+    A domain is a look-alike when it is not itself protected but is within a
+    small edit distance of a protected domain, with similarity
+    1 - distance / max(len) above the threshold.
+    
+    Candidates are found with a partition filter. Each protected domain is
+    split into its name (up to the last dot), the dot and its top-level suffix,
+    and the name is cut into max_edit_distance + 1 segments. d edits can break
+    at most d of those pieces, so at least max_edit_distance + 1 - d name
+    segments survive intact, each shifted by at most d characters. A lookup
+    only probes the query's substrings at those offsets and compares the few
+    domains with enough intact segments using the bounded edit distance. The
+    cost depends on the domain's length, not on the size of the list.
+    
+    Before that comparison, a character-set check discards candidates cheaply:
+    each edit adds at most one missing character and removes at most one
+    extra one, so the distance is at least the number of characters only one
+    of the two domains contains.
+    """
+    
+    def __init__(self, domains=(), similarity_threshold=0.7, max_edit_distance=2):
+        """
+        Initialize the index.
+        
+        Args:
+            domains (iterable, optional): Protected domains
+            similarity_threshold (float): Similarity a look-alike must exceed
+            max_edit_distance (int): Largest edit distance searched for
+        """
+        self.similarity_threshold = similarity_threshold
+        self.max_edit_distance = max_edit_distance
+        self._protected = {}  # Protected domain -> character mask
+        
+        # (length, name length, segment number, segment text) -> protected domains
+        self._segments = {}
+        self._shapes = set()  # (length, name length) pairs present in the index
+        
+        # Names too short to split; compared directly
+        self._short = []
+        
+        self.add_domains(domains)
+    
+    def __len__(self):
+        return len(self._protected)
+    
+    def __contains__(self, domain):
+        return normalize_domain(domain) in self._protected
+    
+    def fingerprint(self):
+        """
+        Digest of the protected domains, which changes whenever the list does.
+        
+        Returns:
+            str: Hex SHA-1 of the sorted protected domains
+        """
+        digest = hashlib.sha1()
+        for domain in sorted(self._protected):
+            digest.update(domain.encode('utf-8') + b'\n')
+        return digest.hexdigest()
+    
+    def _split(self, name_length):
+        """Start and end of each segment of a name of the given length"""
+        pieces = self.max_edit_distance + 1
+        bounds = [name_length * i // pieces for i in range(pieces + 1)]
+        return list(zip(bounds, bounds[1:]))
+    
+    def _radius(self, length, other_length):
+        """Largest edit distance that keeps two domains of these lengths similar"""
+        longest = max(length, other_length)
+        radius = self.max_edit_distance
+        while radius > 0 and radius >= (1 - self.similarity_threshold) * longest:
+            radius -= 1
+        return radius
+    
+    def add_domains(self, domains):
+        """Add protected domains to the index"""
+        for domain in domains:
+            domain = normalize_domain(domain)
+            if not domain or domain in self._protected:
+                continue
+            self._protected[domain] = _character_mask(domain)
+            
+            dot = domain.rfind('.')
+            name_length = dot if dot > 0 else len(domain)
+            if name_length <= self.max_edit_distance:
+                self._short.append(domain)
+                continue
+            
+            shape = (len(domain), name_length)
+            self._shapes.add(shape)
+            for number, (start, end) in enumerate(self._split(name_length)):
+                key = shape + (number, domain[start:end])
+                self._segments.setdefault(key, []).append(domain)
+    
+    def load_file(self, path):
+        """
+        Add protected domains from a file with one domain per line.
+        Blank lines and lines starting with # are ignored.
+        
+        Args:
+            path (str): Path of the domain list
+        
+        Returns:
+            int: Number of domains in the index afterwards
+        """
+        with open(path, encoding='utf-8') as domain_file:
+            self.add_domains(
+                line.strip() for line in domain_file
+                if line.strip() and not line.lstrip().startswith('#')
+            )
+        return len(self)
+    
+    def _candidates(self, domain):
+        """
+        Protected domains that may be similar to the domain.
+        
+        Returns:
+            list: (protected_domain, radius) pairs, where radius is the largest
+                edit distance at which the pair would still be similar
+        """
+        length = len(domain)
+        candidates = [
+            (protected, self._radius(length, len(protected)))
+            for protected in self._short
+        ]
+        
+        for shape in self._shapes:
+            other_length, name_length = shape
+            radius = self._radius(length, other_length)
+            if radius == 0 or abs(length - other_length) > radius:
+                continue
+            
+            # Count the intact segments found for each protected domain
+            hits = {}
+            for number, (start, end) in enumerate(self._split(name_length)):
+                size = end - start
+                found = set()
+                for offset in range(max(0, start - radius), min(length - size, start + radius) + 1):
+                    matches = self._segments.get(shape + (number, domain[offset:offset + size]))
+                    if matches:
+                        found.update(matches)
+                for protected in found:
+                    hits[protected] = hits.get(protected, 0) + 1
+            
+            required = self.max_edit_distance + 1 - radius
+            candidates.extend(
+                (protected, radius) for protected, count in hits.items() if count >= required
+            )
+        
+        return candidates
+    
+    def find_lookalike(self, domain):
+        """
+        Find the protected domain the given domain imitates.
+        
+        Args:
+            domain (str): Domain to check
+        
+        Returns:
+            tuple: (protected_domain, similarity) for the most similar protected
+                domain, or None if the domain is protected itself or not
+                similar to any protected domain
+        """
+        domain = normalize_domain(domain)
+        if not domain or domain in self._protected:
+            return None
+        
+        mask = _character_mask(domain)
+        best = None
+        for protected, radius in self._candidates(domain):
+            if radius == 0 or abs(len(protected) - len(domain)) > radius:
+                continue
+            protected_mask = self._protected[protected]
+            if max((mask & ~protected_mask).bit_count(), (protected_mask & ~mask).bit_count()) > radius:
+                continue
+            distance = bounded_edit_distance(domain, protected, radius)
+            if distance > radius:
+                continue
+            similarity = 1 - distance / max(len(domain), len(protected))
+            if similarity > self.similarity_threshold:
+                candidate = (-similarity, distance, protected)
+                if best is None or candidate < best:
+                    best = candidate
+        
+        if best is None:
+            return None
+        return best[2], -best[0]
+
+# Indexes are expensive to build, so each protected list is loaded once per process
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+def get_domain_index(domains, path=None, similarity_threshold=0.7, max_edit_distance=2):
+    """
+    Return the shared index for a domain list (and optional file), building it once.
+    
+    Args:
+        domains (iterable): Built-in protected domains
+        path (str, optional): File with additional protected domains
+        similarity_threshold (float): Similarity a look-alike must exceed
+        max_edit_distance (int): Largest edit distance searched for
+    
+    Returns:
+        LookalikeDomainIndex: The shared index
+    """
+    key = (tuple(domains), path, similarity_threshold, max_edit_distance)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = LookalikeDomainIndex(domains, similarity_threshold, max_edit_distance)
+                if path:
+                    try:
+                        index.load_file(path)
+                    except OSError as e:
+                        logging.error(f"Could not load protected domains from {path}: {str(e)}")
+                logging.info(f"Look-alike domain index built with {len(index)} protected domains")
+                _indexes[key] = index
+    return index
@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+from app.models.transaction import Transaction
+
+# Number of recent transactions loaded per party by the input processor
+RECENT_HISTORY_LIMIT = 20
+
+class TransactionContext:
+    """
+    History rows for one transaction, fetched once and shared by every stage.
+    
+    Without a history window, the context only loads what the input processor
+    needs: the sender's last sent and the receiver's last received transactions,
+    in a single query. With a history window (when the graph and temporal
+    analysis are not served from in-memory stores), one query loads every
+    transaction touching either party in the window, and the recent lists are
+    served from it, topped up only for parties with too few rows in the window.
+    
+    Rows are loaded on first use, so a context nobody reads costs nothing.
+    """
+    
+    def __init__(self, transaction, include_window=False, window_days=30):
+        """
+        Initialize the context.
+        
+        Args:
+            transaction (Transaction): The transaction being scored
+            include_window (bool): Whether to load the full history window
+            window_days (int): Size of the history window in days
+        """
+        self.transaction = transaction
+        self.include_window = include_window
+        
+        # Covers both the graph window (from now) and the temporal window (from the transaction)
+        self.window_start = min(datetime.utcnow(), transaction.timestamp) - timedelta(days=window_days)
+        
+        self._window_rows = None
+        self._sender_recent = None
+        self._receiver_recent = None
+    
+    def _recent_sent_ids(self, sender_id):
+        return Transaction.query.with_entities(Transaction.id).filter(
+            Transaction.sender_id == sender_id
+        ).order_by(Transaction.timestamp.desc()).limit(RECENT_HISTORY_LIMIT)
+    
+    def _recent_received_ids(self, receiver_id):
+        return Transaction.query.with_entities(Transaction.id).filter(
+            Transaction.receiver_id == receiver_id
+        ).order_by(Transaction.timestamp.desc()).limit(RECENT_HISTORY_LIMIT)
+    
+    @staticmethod
+    def _latest(rows):
+        return sorted(rows, key=lambda tx: tx.timestamp, reverse=True)[:RECENT_HISTORY_LIMIT]
+    
+    def _load_recent(self):
+        # Both recent lists in one round-trip
+        sender_id = self.transaction.sender_id
+        receiver_id = self.transaction.receiver_id
+        rows = Transaction.history_query().filter(
+            Transaction.id.in_(self._recent_sent_ids(sender_id)) |
+            Transaction.id.in_(self._recent_received_ids(receiver_id))
+        ).all()
+        self._sender_recent = self._latest([tx for tx in rows if tx.sender_id == sender_id])
+        self._receiver_recent = self._latest([tx for tx in rows if tx.receiver_id == receiver_id])
+    
+    def sender_recent(self):
+        """The sender's most recent sent transactions, newest first"""
+        if self._sender_recent is None:
+            if not self.include_window:
+                self._load_recent()
+            else:
+                # Fewer rows than the limit inside the window means there may be
+                # older ones; only then is a second query needed
+                sender_id = self.transaction.sender_id
+                sent = [tx for tx in self.window_transactions() if tx.sender_id == sender_id]
+                if len(sent) < RECENT_HISTORY_LIMIT:
+                    sent = Transaction.history_query().filter(Transaction.id.in_(self._recent_sent_ids(sender_id))).all()
+                self._sender_recent = self._latest(sent)
+        return self._sender_recent
+    
+    def receiver_recent(self):
+        """The receiver's most recent received transactions, newest first"""
+        if self._receiver_recent is None:
+            if not self.include_window:
+                self._load_recent()
+            else:
+                receiver_id = self.transaction.receiver_id
+                received = [tx for tx in self.window_transactions() if tx.receiver_id == receiver_id]
+                if len(received) < RECENT_HISTORY_LIMIT:
+                    received = Transaction.history_query().filter(Transaction.id.in_(self._recent_received_ids(receiver_id))).all()
+                self._receiver_recent = self._latest(received)
+        return self._receiver_recent
+    
+    def window_transactions(self):
+        """
+        Every transaction touching the sender or receiver since window_start.
+        
+        Raises:
+            ValueError: If the context was created without the history window
+        """
+        if not self.include_window:
+            raise ValueError("TransactionContext was created without the history window")
+        if self._window_rows is None:
+            self._window_rows = Transaction.involving(
+                [self.transaction.sender_id, self.transaction.receiver_id],
+                self.window_start
+            ).all()
+        return self._window_rows
+    
+    def sender_history(self, since, before):
+        """
+        The sender's transactions with since <= timestamp < before, newest first.
+        
+        Args:
+            since (datetime): Start of the period (not earlier than window_start)
+            before (datetime): End of the period, exclusive
+        """
+        sender_id = self.transaction.sender_id
+        rows = [
+            tx for tx in self.window_transactions()
+            if tx.sender_id == sender_id and since <= tx.timestamp < before
+        ]
+        return sorted(rows, key=lambda tx: tx.timestamp, reverse=True)
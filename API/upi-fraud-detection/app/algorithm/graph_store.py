@@ -0,0 +1,319 @@
+from array import array
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+# Aggregates for all live transactions from one account to another
+PairStats = namedtuple('PairStats', ['count', 'total_amount', 'first_seen', 'last_seen'])
+
+_EPOCH = datetime(1970, 1, 1)
+
+def _to_epoch(timestamp):
+    """Convert a naive UTC datetime to seconds since the epoch"""
+    return (timestamp - _EPOCH).total_seconds()
+
+def _from_epoch(seconds):
+    """Convert seconds since the epoch back to a naive UTC datetime"""
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None)
+
+class CompactGraph:
+    """
+    Compact directed transaction graph.
+    
+    Account IDs are interned to integers. Each account's successors and
+    predecessors are kept in typed arrays, and every (sender, receiver) pair has
+    one slot in parallel arrays holding its transaction count, total amount and
+    first/last timestamp. Repeat payments between the same accounts update the
+    pair's aggregates instead of collapsing into a single edge.
+    
+    Pair lookups are O(1); neighbour iteration and edge removal are O(degree).
+    Node IDs and pair slots are recycled once they have no transactions left.
+    """
+    
+    def __init__(self):
+        """Initialize an empty graph"""
+        # Interning: account ID <-> node number
+        self._node_ids = {}
+        self._names = []
+        self._free_nodes = []
+        
+        # Adjacency per node number (None until the node has an edge in that direction)
+        self._successors = []
+        self._predecessors = []
+        
+        # Pair aggregates: (sender << 32 | receiver) -> slot in the arrays below
+        self._pair_slots = {}
+        self._free_slots = []
+        self._counts = array('l')
+        self._totals = array('d')
+        self._first = array('d')
+        self._last = array('d')
+    
+    def __len__(self):
+        """Number of accounts in the graph"""
+        return len(self._node_ids)
+    
+    @property
+    def edge_count(self):
+        """Number of distinct (sender, receiver) pairs"""
+        return len(self._pair_slots)
+    
+    def _intern(self, account_id):
+        node = self._node_ids.get(account_id)
+        if node is not None:
+            return node
+        
+        if self._free_nodes:
+            node = self._free_nodes.pop()
+            self._names[node] = account_id
+        else:
+            node = len(self._names)
+            self._names.append(account_id)
+            self._successors.append(None)
+            self._predecessors.append(None)
+        
+        self._node_ids[account_id] = node
+        return node
+    
+    def _release_if_isolated(self, node):
+        if self._successors[node] or self._predecessors[node]:
+            return
+        
+        del self._node_ids[self._names[node]]
+        self._names[node] = None
+        self._successors[node] = None
+        self._predecessors[node] = None
+        self._free_nodes.append(node)
+    
+    def has_node(self, account_id):
+        """Check whether the account has any transaction in the graph"""
+        return account_id in self._node_ids
+    
+    def has_edge(self, sender_id, receiver_id):
+        """Check whether the sender has paid the receiver"""
+        return self._slot(sender_id, receiver_id) is not None
+    
+    def _slot(self, sender_id, receiver_id):
+        sender = self._node_ids.get(sender_id)
+        receiver = self._node_ids.get(receiver_id)
+        if sender is None or receiver is None:
+            return None
+        return self._pair_slots.get(sender << 32 | receiver)
+    
+    def pair_stats(self, sender_id, receiver_id):
+        """
+        Get the aggregates for payments from sender to receiver.
+        
+        Returns:
+            PairStats: Aggregates, or None if the sender never paid the receiver
+        """
+        slot = self._slot(sender_id, receiver_id)
+        if slot is None:
+            return None
+        
+        return PairStats(
+            self._counts[slot],
+            self._totals[slot],
+            _from_epoch(self._first[slot]),
+            _from_epoch(self._last[slot])
+        )
+    
+    def successors(self, account_id):
+        """Accounts the given account has paid"""
+        node = self._node_ids.get(account_id)
+        if node is None or not self._successors[node]:
+            return []
+        return [self._names[neighbor] for neighbor in self._successors[node]]
+    
+    def predecessors(self, account_id):
+        """Accounts that have paid the given account"""
+        node = self._node_ids.get(account_id)
+        if node is None or not self._predecessors[node]:
+            return []
+        return [self._names[neighbor] for neighbor in self._predecessors[node]]
+    
+    def add_transaction(self, sender_id, receiver_id, amount, timestamp):
+        """
+        Record a payment from sender to receiver.
+        
+        Args:
+            sender_id (str): Sender's ID
+            receiver_id (str): Receiver's ID
+            amount (float): Transaction amount
+            timestamp (datetime): Transaction timestamp
+        """
+        sender = self._intern(sender_id)
+        receiver = self._intern(receiver_id)
+        seconds = _to_epoch(timestamp)
+        
+        key = sender << 32 | receiver
+        slot = self._pair_slots.get(key)
+        if slot is not None:
+            self._counts[slot] += 1
+            self._totals[slot] += amount
+            self._first[slot] = min(self._first[slot], seconds)
+            self._last[slot] = max(self._last[slot], seconds)
+            return
+        
+        # New pair: take a free slot or grow the aggregate arrays
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._counts[slot] = 1
+            self._totals[slot] = amount
+            self._first[slot] = seconds
+            self._last[slot] = seconds
+        else:
+            slot = len(self._counts)
+            self._counts.append(1)
+            self._totals.append(amount)
+            self._first.append(seconds)
+            self._last.append(seconds)
+        self._pair_slots[key] = slot
+        
+        if self._successors[sender] is None:
+            self._successors[sender] = array('l')
+        self._successors[sender].append(receiver)
+        
+        if self._predecessors[receiver] is None:
+            self._predecessors[receiver] = array('l')
+        self._predecessors[receiver].append(sender)
+    
+    @contextmanager
+    def provisional_transaction(self, sender_id, receiver_id, amount, timestamp):
+        """
+        Record a payment for the duration of a with block, then take it out
+        again, restoring the pair's aggregates exactly.
+        
+        Usage:
+            with graph.provisional_transaction(sender_id, receiver_id, amount, timestamp):
+                ...
+        
+        Args:
+            sender_id (str): Sender's ID
+            receiver_id (str): Receiver's ID
+            amount (float): Transaction amount
+            timestamp (datetime): Transaction timestamp
+        """
+        slot = self._slot(sender_id, receiver_id)
+        previous = None if slot is None else (self._totals[slot], self._first[slot], self._last[slot])
+        self.add_transaction(sender_id, receiver_id, amount, timestamp)
+        try:
+            yield
+        finally:
+            if previous is None:
+                # The pair's only payment: drop the edge and any account it created
+                self.remove_transaction(sender_id, receiver_id, amount, timestamp)
+            else:
+                slot = self._slot(sender_id, receiver_id)
+                self._counts[slot] -= 1
+                self._totals[slot], self._first[slot], self._last[slot] = previous
+    
+    def remove_transaction(self, sender_id, receiver_id, amount, timestamp):
+        """
+        Remove a payment previously recorded with add_transaction.
+        
+        Transactions are expected to be removed oldest first, so the pair's first
+        timestamp moves up to the removed one (a lower bound for the oldest
+        payment still in the graph).
+        
+        Args:
+            sender_id (str): Sender's ID
+            receiver_id (str): Receiver's ID
+            amount (float): Transaction amount
+            timestamp (datetime): Transaction timestamp
+        """
+        sender = self._node_ids.get(sender_id)
+        receiver = self._node_ids.get(receiver_id)
+        if sender is None or receiver is None:
+            return
+        
+        key = sender << 32 | receiver
+        slot = self._pair_slots.get(key)
+        if slot is None:
+            return
+        
+        self._counts[slot] -= 1
+        if self._counts[slot] > 0:
+            self._totals[slot] -= amount
+            self._first[slot] = max(self._first[slot], _to_epoch(timestamp))
+            return
+        
+        # Last payment between the pair: drop the edge
+        del self._pair_slots[key]
+        self._free_slots.append(slot)
+        self._successors[sender].remove(receiver)
+        self._predecessors[receiver].remove(sender)
+        
+        self._release_if_isolated(sender)
+        if receiver != sender:
+            self._release_if_isolated(receiver)
+    
+    def bounded_distance(self, source_id, target_id, max_depth, max_visits):
+        """
+        Shortest path length from source to target, searching at most max_depth hops.
+        
+        Runs a bidirectional breadth-first search (successors forward from the
+        source, predecessors backward from the target), always expanding the
+        smaller frontier. The search gives up once it has visited max_visits
+        accounts, which bounds the work when a high-degree account such as a
+        merchant sits in the neighbourhood.
+        
+        Args:
+            source_id (str): Account the path starts from
+            target_id (str): Account the path ends at
+            max_depth (int): Maximum path length to look for
+            max_visits (int): Maximum number of accounts to visit
+        
+        Returns:
+            tuple: (distance, truncated) where distance is -1 if there is no path
+                of at most max_depth hops, and truncated is True if the visit
+                budget ran out before the search could finish (distance is then
+                the shortest path found so far, or -1)
+        """
+        source = self._node_ids.get(source_id)
+        target = self._node_ids.get(target_id)
+        if source is None or target is None:
+            return -1, False
+        if source == target:
+            return 0, False
+        
+        forward = {source: 0}
+        backward = {target: 0}
+        forward_frontier = [source]
+        backward_frontier = [target]
+        forward_depth = backward_depth = 0
+        visits = 2
+        
+        while forward_frontier and backward_frontier and forward_depth + backward_depth < max_depth:
+            # Expand the smaller side by one full level
+            if len(forward_frontier) <= len(backward_frontier):
+                adjacency, seen, other = self._successors, forward, backward
+                frontier, depth = forward_frontier, forward_depth
+            else:
+                adjacency, seen, other = self._predecessors, backward, forward
+                frontier, depth = backward_frontier, backward_depth
+            
+            best = -1
+            next_frontier = []
+            for node in frontier:
+                for neighbor in adjacency[node] or ():
+                    if neighbor in other:
+                        length = depth + 1 + other[neighbor]
+                        if best == -1 or length < best:
+                            best = length
+                    if neighbor not in seen:
+                        seen[neighbor] = depth + 1
+                        next_frontier.append(neighbor)
+                        visits += 1
+                        if visits > max_visits:
+                            return best, True
+            
+            if best != -1:
+                return best, False
+            
+            if seen is forward:
+                forward_frontier, forward_depth = next_frontier, depth + 1
+            else:
+                backward_frontier, backward_depth = next_frontier, depth + 1
+        
+        return -1, False
@@ -1,7 +1,9 @@
 import logging
-import networkx as nx
-import numpy as np
+from contextlib import nullcontext
 from datetime import datetime, timedelta
+from app.config import Config
+from app.algorithm.graph_store import CompactGraph
+from app.metrics import stage_timer
 from app.models.transaction import Transaction
 from app import db
 
@@ -11,54 +13,149 @@ class GraphTemporalAnalyzer:
     Builds a transaction graph and analyzes patterns to detect anomalies.
     """
     
-    def __init__(self):
-        """Initialize the analyzer"""
-        self.graph = nx.DiGraph()  # Directed graph for transactions
+    def __init__(self, transaction_graph=None):
+        """
+        Initialize the analyzer.
+        
+        Args:
+            transaction_graph (TransactionGraph, optional): Incrementally maintained
+                graph to score against. Without it, a graph is built from the
+                database for every transaction.
+        """
+        self.graph = CompactGraph()  # Directed graph for transactions
+        self.transaction_graph = transaction_graph
+    
+    @property
+    def needs_history_window(self):
+        """Whether analyze() reads the 30-day history window from the database"""
+        return self.transaction_graph is None or self.transaction_graph.account_stats is None
     
-    def _build_transaction_graph(self, sender_id, receiver_id):
+    def _build_transaction_graph(self, sender_id, receiver_id, context=None):
         """
         Build a transaction graph for the given sender and receiver.
         
         Args:
             sender_id (str): Sender's ID
             receiver_id (str): Receiver's ID
+            context (TransactionContext, optional): Shared history rows
             
         Returns:
-            nx.DiGraph: Transaction graph
+            CompactGraph: Transaction graph
         """
+        # Start from an empty graph so a reused analyzer does not carry over
+        # edges from previously scored transactions
+        self.graph = CompactGraph()
+        
         # Get transactions from the last 30 days
         thirty_days_ago = datetime.utcnow() - timedelta(days=30)
         
         # Query transactions
-        transactions = Transaction.query.filter(
-            ((Transaction.sender_id == sender_id) | 
-             (Transaction.receiver_id == sender_id) |
-             (Transaction.sender_id == receiver_id) | 
-             (Transaction.receiver_id == receiver_id)) &
-            (Transaction.timestamp >= thirty_days_ago)
-        ).all()
+        if context is not None:
+            transactions = [
+                tx for tx in context.window_transactions()
+                if tx.timestamp >= thirty_days_ago
+            ]
+        else:
+            transactions = Transaction.involving([sender_id, receiver_id], thirty_days_ago).all()
         
         # Build graph from transactions
         for tx in transactions:
-            # Add nodes if they don't exist
-            if not self.graph.has_node(tx.sender_id):
-                self.graph.add_node(tx.sender_id)
-                
-            if not self.graph.has_node(tx.receiver_id):
-                self.graph.add_node(tx.receiver_id)
-                
-            # Add edge with transaction properties
-            self.graph.add_edge(
-                tx.sender_id, 
-                tx.receiver_id, 
-                amount=tx.amount,
-                timestamp=tx.timestamp,
-                transaction_id=tx.id
-            )
+            self.graph.add_transaction(tx.sender_id, tx.receiver_id, tx.amount, tx.timestamp)
         
         return self.graph
     
-    def _analyze_temporal_patterns(self, sender_id, amount, timestamp):
+    def _summarize_sender_history(self, sender_id, timestamp, context=None):
+        """
+        Summarize the sender's last 30 days of transactions from the database.
+        
+        Args:
+            sender_id (str): Sender's ID
+            timestamp (datetime): Transaction timestamp
+            context (TransactionContext, optional): Shared history rows
+            
+        Returns:
+            dict: history_length, mean_amount, std_amount and, with at least two
+                transactions, mean_hours_between_tx, std_hours_between_tx and
+                hours_since_last_tx
+        """
+        # Only the database fallback needs numpy; importing it here keeps start-up fast
+        import numpy as np
+        
+        # Get sender's transaction history
+        thirty_days_ago = timestamp - timedelta(days=30)
+        if context is not None:
+            sender_history = context.sender_history(thirty_days_ago, timestamp)
+        else:
+            sender_history = Transaction.history_query().filter(
+                Transaction.sender_id == sender_id,
+                Transaction.timestamp >= thirty_days_ago,
+                Transaction.timestamp < timestamp  # Only consider past transactions
+            ).order_by(Transaction.timestamp.desc()).all()
+        
+        summary = {'history_length': len(sender_history)}
+        if not sender_history:
+            return summary
+        
+        # Amount statistics
+        amounts = [tx.amount for tx in sender_history]
+        summary['mean_amount'] = np.mean(amounts) if amounts else 0
+        summary['std_amount'] = np.std(amounts) if len(amounts) > 1 else summary['mean_amount'] * 0.5
+        
+        # Get time intervals between transactions
+        timestamps = [tx.timestamp for tx in sender_history]
+        if len(timestamps) > 1:
+            # Sort timestamps
+            timestamps.sort()
+            
+            # Calculate time differences in hours
+            time_diffs = [(timestamps[i+1] - timestamps[i]).total_seconds() / 3600 
+                          for i in range(len(timestamps)-1)]
+            
+            # Calculate mean and std of time differences
+            mean_time_diff = np.mean(time_diffs) if time_diffs else 24  # Default to 24 hours
+            summary['mean_hours_between_tx'] = mean_time_diff
+            summary['std_hours_between_tx'] = np.std(time_diffs) if len(time_diffs) > 1 else mean_time_diff * 0.5
+            
+            # Calculate time since last transaction
+            summary['hours_since_last_tx'] = (timestamp - timestamps[-1]).total_seconds() / 3600
+        
+        return summary
+    
+    def _summarize_sender_stats(self, sender_id, timestamp):
+        """
+        Summarize the sender's history from the streaming account statistics.
+        
+        Same result as _summarize_sender_history, in O(1) instead of a query
+        over the sender's whole window.
+        
+        Args:
+            sender_id (str): Sender's ID
+            timestamp (datetime): Transaction timestamp
+            
+        Returns:
+            dict: Same keys as _summarize_sender_history, plus decayed_mean_amount
+        """
+        stats = self.transaction_graph.account_stats.get(sender_id)
+        if stats is None or stats.amounts.count == 0:
+            return {'history_length': 0}
+        
+        amounts = stats.amounts
+        summary = {
+            'history_length': amounts.count,
+            'mean_amount': amounts.mean,
+            'std_amount': amounts.std if amounts.count > 1 else amounts.mean * 0.5,
+            'decayed_mean_amount': amounts.decayed_mean
+        }
+        
+        gaps = stats.gaps
+        if gaps.count > 0:
+            summary['mean_hours_between_tx'] = gaps.mean
+            summary['std_hours_between_tx'] = gaps.std if gaps.count > 1 else gaps.mean * 0.5
+            summary['hours_since_last_tx'] = (timestamp - stats.last_timestamp).total_seconds() / 3600
+        
+        return summary
+    
+    def _analyze_temporal_patterns(self, sender_id, amount, timestamp, context=None):
         """
         Analyze temporal patterns for anomaly detection.
         
@@ -66,17 +163,16 @@ class GraphTemporalAnalyzer:
             sender_id (str): Sender's ID
             amount (float): Transaction amount
             timestamp (datetime): Transaction timestamp
+            context (TransactionContext, optional): Shared history rows
             
         Returns:
             tuple: (temporal_score, temporal_details)
         """
-        # Get sender's transaction history
-        thirty_days_ago = timestamp - timedelta(days=30)
-        sender_history = Transaction.query.filter(
-            Transaction.sender_id == sender_id,
-            Transaction.timestamp >= thirty_days_ago,
-            Transaction.timestamp < timestamp  # Only consider past transactions
-        ).order_by(Transaction.timestamp.desc()).all()
+        # Summarize the sender's transaction history
+        if self.transaction_graph is not None and self.transaction_graph.account_stats is not None:
+            summary = self._summarize_sender_stats(sender_id, timestamp)
+        else:
+            summary = self._summarize_sender_history(sender_id, timestamp, context)
         
         # Initialize scores and details
         temporal_score = 0.0
@@ -84,19 +180,18 @@ class GraphTemporalAnalyzer:
             'amount_anomaly': 0.0,
             'frequency_anomaly': 0.0,
             'time_window_anomaly': 0.0,
-            'history_length': len(sender_history)
+            'history_length': summary['history_length']
         }
         
         # If no history, return medium risk score (0.5)
-        if not sender_history:
+        if not summary['history_length']:
             temporal_score = 0.5
             temporal_details['reason'] = 'No transaction history'
             return temporal_score, temporal_details
         
         # Calculate amount anomaly score
-        amounts = [tx.amount for tx in sender_history]
-        mean_amount = np.mean(amounts) if amounts else 0
-        std_amount = np.std(amounts) if len(amounts) > 1 else mean_amount * 0.5
+        mean_amount = summary['mean_amount']
+        std_amount = summary['std_amount']
         
         # If standard deviation is 0, set it to a small value to avoid division by zero
         std_amount = max(std_amount, 0.01)
@@ -109,36 +204,25 @@ class GraphTemporalAnalyzer:
         temporal_details['amount_anomaly'] = amount_anomaly
         temporal_details['avg_transaction_amount'] = mean_amount
         temporal_details['transaction_amount_std'] = std_amount
+        if 'decayed_mean_amount' in summary:
+            temporal_details['decayed_avg_transaction_amount'] = summary['decayed_mean_amount']
         
         # Calculate frequency anomaly
-        # Get time intervals between transactions
-        timestamps = [tx.timestamp for tx in sender_history]
-        if len(timestamps) > 1:
-            # Sort timestamps
-            timestamps.sort()
+        if 'hours_since_last_tx' in summary:
+            mean_time_diff = summary['mean_hours_between_tx']
+            std_time_diff = summary['std_hours_between_tx']
+            time_since_last = summary['hours_since_last_tx']
             
-            # Calculate time differences in hours
-            time_diffs = [(timestamps[i+1] - timestamps[i]).total_seconds() / 3600 
-                          for i in range(len(timestamps)-1)]
-            
-            # Calculate mean and std of time differences
-            mean_time_diff = np.mean(time_diffs) if time_diffs else 24  # Default to 24 hours
-            std_time_diff = np.std(time_diffs) if len(time_diffs) > 1 else mean_time_diff * 0.5
+            # If time since last is much shorter than usual, flag it
+            if mean_time_diff > 0:
+                z_score_time = abs(time_since_last - mean_time_diff) / std_time_diff if std_time_diff > 0 else 0
+                frequency_anomaly = min(max(0, z_score_time / 3), 1)
+            else:
+                frequency_anomaly = 0.0
             
-            # Calculate time since last transaction
-            if timestamps:
-                time_since_last = (timestamp - timestamps[-1]).total_seconds() / 3600
-                
-                # If time since last is much shorter than usual, flag it
-                if mean_time_diff > 0:
-                    z_score_time = abs(time_since_last - mean_time_diff) / std_time_diff if std_time_diff > 0 else 0
-                    frequency_anomaly = min(max(0, z_score_time / 3), 1)
-                else:
-                    frequency_anomaly = 0.0
-                
-                temporal_details['frequency_anomaly'] = frequency_anomaly
-                temporal_details['avg_hours_between_tx'] = mean_time_diff
-                temporal_details['hours_since_last_tx'] = time_since_last
+            temporal_details['frequency_anomaly'] = frequency_anomaly
+            temporal_details['avg_hours_between_tx'] = mean_time_diff
+            temporal_details['hours_since_last_tx'] = time_since_last
         
         # Check for unusual time window
         hour_of_day = timestamp.hour
@@ -180,38 +264,40 @@ class GraphTemporalAnalyzer:
         }
         
         # Check if there's an edge between sender and receiver
-        if self.graph.has_edge(sender_id, receiver_id):
+        pair_stats = self.graph.pair_stats(sender_id, receiver_id)
+        if pair_stats is not None:
             graph_details['is_first_transaction'] = False
             
             # Count previous transactions
-            prev_transactions = len([e for e in self.graph.edges(data=True) 
-                                    if e[0] == sender_id and e[1] == receiver_id])
+            prev_transactions = pair_stats.count
             graph_details['previous_transactions'] = prev_transactions
             
             # More previous transactions means lower risk
             graph_score -= min(0.3, 0.05 * prev_transactions)
         
-        # Check network distance between sender and receiver
-        try:
-            if nx.has_path(self.graph, sender_id, receiver_id):
-                distance = nx.shortest_path_length(self.graph, sender_id, receiver_id)
-                graph_details['network_distance'] = distance
-                
-                # Shorter distance means lower risk
-                if distance == 1:  # Direct connection
-                    graph_score -= 0.2
-                elif distance == 2:  # Friend of friend
-                    graph_score -= 0.1
-            else:
-                graph_details['network_distance'] = -1  # No path exists
-        except nx.NetworkXError:
-            graph_details['network_distance'] = -1
+        # Check network distance between sender and receiver, looking only as far
+        # as the configured depth (-1 if there is no path that short)
+        distance, truncated = self.graph.bounded_distance(
+            sender_id,
+            receiver_id,
+            Config.GRAPH_MAX_SEARCH_DEPTH,
+            Config.GRAPH_MAX_SEARCH_VISITS
+        )
+        graph_details['network_distance'] = distance
+        if truncated:
+            graph_details['network_search_truncated'] = True
+        
+        # Shorter distance means lower risk
+        if distance == 1:  # Direct connection
+            graph_score -= 0.2
+        elif distance == 2:  # Friend of friend
+            graph_score -= 0.1
         
         # Check common neighbors (mutual contacts)
         if self.graph.has_node(sender_id) and self.graph.has_node(receiver_id):
             # Get neighbors
-            sender_neighbors = set(self.graph.neighbors(sender_id))
-            receiver_neighbors = set(self.graph.neighbors(receiver_id))
+            sender_neighbors = set(self.graph.successors(sender_id))
+            receiver_neighbors = set(self.graph.successors(receiver_id))
             
             # Find common neighbors
             common = sender_neighbors.intersection(receiver_neighbors)
@@ -229,7 +315,22 @@ class GraphTemporalAnalyzer:
         
         return graph_score, graph_details
     
-    def analyze(self, sender_id, receiver_id, amount, timestamp):
+    def _update_transaction_graph(self, transaction_id, sender_id, receiver_id, amount, timestamp, record=True):
+        """
+        Bring the incrementally maintained graph up to date with this transaction.
+        
+        The transaction's own edge is added before scoring, matching a graph
+        built from the database where the stored transaction is already visible.
+        With record=False the edge is left to the caller, who adds it provisionally.
+        """
+        self.transaction_graph.sync()
+        self.transaction_graph.evict()
+        if record:
+            self.transaction_graph.add_transaction(transaction_id, sender_id, receiver_id, amount, timestamp)
+        self.graph = self.transaction_graph.graph
+        return self.graph
+    
+    def analyze(self, sender_id, receiver_id, amount, timestamp, transaction_id=None, context=None, record=True):
         """
         Analyze transaction using graph and temporal patterns.
         
@@ -238,22 +339,45 @@ class GraphTemporalAnalyzer:
             receiver_id (str): Receiver's ID
             amount (float): Transaction amount
             timestamp (datetime): Transaction timestamp
+            transaction_id (str, optional): Transaction ID, required to update the
+                incrementally maintained graph
+            context (TransactionContext, optional): Shared history rows, created
+                with include_window=needs_history_window
+            record (bool): Whether to keep the transaction in the incrementally
+                maintained graph and statistics. With False it is only present
+                while it is scored, for callers that record it once it is stored
             
         Returns:
             tuple: (risk_score, risk_details)
         """
         # Build the transaction graph
-        self._build_transaction_graph(sender_id, receiver_id)
+        incremental = self.transaction_graph is not None and transaction_id is not None
+        with stage_timer('graph_build'):
+            if incremental:
+                self._update_transaction_graph(transaction_id, sender_id, receiver_id, amount, timestamp, record)
+            else:
+                self._build_transaction_graph(sender_id, receiver_id, context)
         
-        # Analyze temporal patterns
-        temporal_score, temporal_details = self._analyze_temporal_patterns(
-            sender_id, amount, timestamp
-        )
+        own_edge = nullcontext()
+        if incremental and not record:
+            own_edge = self.graph.provisional_transaction(sender_id, receiver_id, amount, timestamp)
         
-        # Analyze graph patterns
-        graph_score, graph_details = self._analyze_graph_patterns(
-            sender_id, receiver_id
-        )
+        with own_edge:
+            # Analyze temporal patterns
+            with stage_timer('temporal'):
+                temporal_score, temporal_details = self._analyze_temporal_patterns(
+                    sender_id, amount, timestamp, context
+                )
+            
+            # The sender's statistics only include this transaction once it has been scored
+            if incremental and record:
+                self.transaction_graph.record_sender_stats(transaction_id, sender_id, amount, timestamp)
+            
+            # Analyze graph patterns
+            with stage_timer('graph_analysis'):
+                graph_score, graph_details = self._analyze_graph_patterns(
+                    sender_id, receiver_id
+                )
         
         # Combine scores with weights
         # Higher weight to temporal for new users, higher to graph for established users
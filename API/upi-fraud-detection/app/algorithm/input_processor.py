@@ -1,61 +1,116 @@
-import json
 import logging
+from collections.abc import Mapping
 from app import db
 from app.models.transaction import Transaction
 
-def process_transaction_input(transaction):
+class LazyAccountView(Mapping):
+    """
+    Read-only view of an account's user data that is computed on first access.
+    
+    The history rows are only loaded, and each field only derived from them,
+    when a stage actually reads it; the results are cached for later reads.
+    """
+    
+    def __init__(self, account_id, load_history, fields):
+        """
+        Initialize the view.
+        
+        Args:
+            account_id (str): The account's ID
+            load_history (callable): Returns the account's history rows
+            fields (dict): Field name -> function computing it from the history rows
+        """
+        self._account_id = account_id
+        self._load_history = load_history
+        self._fields = fields
+        self._history = None
+        self._values = {}
+    
+    def __getitem__(self, key):
+        if key == 'id':
+            return self._account_id
+        if key not in self._values:
+            if key not in self._fields:
+                raise KeyError(key)
+            if self._history is None:
+                self._history = self._load_history()
+            self._values[key] = self._fields[key](self._history)
+        return self._values[key]
+    
+    def __iter__(self):
+        yield 'id'
+        yield from self._fields
+    
+    def __len__(self):
+        return len(self._fields) + 1
+    
+    def __repr__(self):
+        loaded = ', '.join(f"{key}={value!r}" for key, value in self._values.items())
+        return f"<LazyAccountView {self._account_id} {loaded}>"
+
+def _average_amount(history):
+    sent_amounts = [tx.amount for tx in history]
+    return sum(sent_amounts) / len(sent_amounts) if sent_amounts else 0
+
+def _max_amount(history):
+    sent_amounts = [tx.amount for tx in history]
+    return max(sent_amounts) if sent_amounts else 0
+
+# Fields derived from the sender's last sent transactions. History rows are
+# loaded with their payload columns deferred, so their dicts leave out txn_metadata
+SENDER_FIELDS = {
+    'transaction_history': lambda history: [tx.to_dict(include_metadata=False) for tx in history],
+    'is_new_account': lambda history: len(history) < 5,  # Consider as new if < 5 transactions
+    'avg_transaction_amount': _average_amount,
+    'max_transaction_amount': _max_amount,
+    'recent_receivers': lambda history: [tx.receiver_id for tx in history]
+}
+
+# Fields derived from the receiver's last received transactions
+RECEIVER_FIELDS = {
+    'transaction_history': lambda history: [tx.to_dict(include_metadata=False) for tx in history],
+    'is_new_account': lambda history: len(history) < 5
+}
+
+def process_transaction_input(transaction, context=None):
     """
     Process transaction input, load user history, and prepare data for algorithm.
     
+    The user data is lazy: history rows are only loaded, converted and
+    aggregated when a field of user_data is read.
+    
     Args:
         transaction (Transaction): The transaction object to process
-        
+        context (TransactionContext, optional): Shared history rows; when omitted
+            the history is queried here
+    
     Returns:
         tuple: (user_data, transaction_data) prepared for algorithm processing
     """
     try:
         # Extract txn_metadata
-        txn_metadata = json.loads(transaction.txn_metadata) if transaction.txn_metadata else {}
+        txn_metadata = transaction.txn_metadata or {}
         
         # Load user history for sender
-        sender_history = Transaction.query.filter_by(
-            sender_id=transaction.sender_id
-        ).order_by(Transaction.timestamp.desc()).limit(20).all()
-        
-        # Check if this is a new account with limited history
-        is_new_account = len(sender_history) < 5  # Consider as new if < 5 transactions
-        
-        # Get transaction patterns
-        sent_amounts = [tx.amount for tx in sender_history]
-        avg_amount = sum(sent_amounts) / len(sent_amounts) if sent_amounts else 0
-        max_amount = max(sent_amounts) if sent_amounts else 0
-        
-        # Recent receivers
-        recent_receivers = [tx.receiver_id for tx in sender_history]
+        def load_sender_history():
+            if context is not None:
+                return context.sender_recent()
+            return Transaction.history_query().filter_by(
+                sender_id=transaction.sender_id
+            ).order_by(Transaction.timestamp.desc()).limit(20).all()
         
         # Load receiver history
-        receiver_history = Transaction.query.filter_by(
-            receiver_id=transaction.receiver_id
-        ).order_by(Transaction.timestamp.desc()).limit(20).all()
-        
-        # Check if receiver is a new account
-        is_receiver_new = len(receiver_history) < 5
+        def load_receiver_history():
+            if context is not None:
+                return context.receiver_recent()
+            return Transaction.history_query().filter_by(
+                receiver_id=transaction.receiver_id
+            ).order_by(Transaction.timestamp.desc()).limit(20).all()
         
-        # Prepare user data dictionary
+        # Prepare user data views
         user_data = {
-            'sender': {
-                'id': transaction.sender_id,
-                'transaction_history': [tx.to_dict() for tx in sender_history],
-                'is_new_account': is_new_account,
-                'avg_transaction_amount': avg_amount,
-                'max_transaction_amount': max_amount,
-                'recent_receivers': recent_receivers
-            },
-            'receiver': {
-                'id': transaction.receiver_id,
-                'transaction_history': [tx.to_dict() for tx in receiver_history],
-                'is_new_account': is_receiver_new
-            }
+            'sender': LazyAccountView(transaction.sender_id, load_sender_history, SENDER_FIELDS),
+            'receiver': LazyAccountView(transaction.receiver_id, load_receiver_history, RECEIVER_FIELDS)
         }
         
         # Prepare transaction data dictionary
@@ -71,7 +126,7 @@ def process_transaction_input(transaction):
         }
         
         return user_data, transaction_data
-        
+    
     except Exception as e:
         logging.error(f"Error processing transaction input: {str(e)}")
-        raise
\ No newline at end of file
+        raise
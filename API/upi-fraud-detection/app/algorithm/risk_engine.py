@@ -2,6 +2,16 @@ import logging
 import json
 from app.config import Config
 
+# Decision codes used by calculate_risk_batch, indexing DECISIONS
+DECISION_APPROVED = 0
+DECISION_PENDING_VERIFICATION = 1
+DECISION_BLOCKED = 2
+DECISIONS = ('approved', 'pending_verification', 'blocked')
+
+# Simulation types that force a decision
+BLOCKING_SIMULATIONS = ('phishing_url', 'qr_code_tampering', 'network_fraud')
+VERIFICATION_SIMULATIONS = ('high_value',)
+
 class RiskEngine:
     """
     Risk scoring engine that combines different signals and makes a final decision.
@@ -18,7 +28,7 @@ class RiskEngine:
         self.medium_risk_threshold = Config.MEDIUM_RISK_THRESHOLD
         self.high_risk_threshold = Config.HIGH_RISK_THRESHOLD
     
-    def calculate_risk(self, graph_temporal_score, content_analysis_score, 
+    def calculate_risk(self, graph_temporal_score, content_analysis_score,
                        transaction_data, graph_temporal_details, content_analysis_details):
         """
         Calculate final risk score and make decision.
@@ -29,7 +39,7 @@ class RiskEngine:
             transaction_data (dict): Transaction data
             graph_temporal_details (dict): Details from graph-temporal analysis
             content_analysis_details (dict): Details from content analysis
-            
+        
         Returns:
             tuple: (risk_score, decision, risk_details)
         """
@@ -81,10 +91,10 @@ class RiskEngine:
         # Check for simulation type
         if transaction_data.get('is_simulated', False):
             simulation_type = transaction_data.get('simulation_type', '')
-            if simulation_type in ['phishing_url', 'qr_code_tampering', 'network_fraud']:
+            if simulation_type in BLOCKING_SIMULATIONS:
                 decision = 'blocked'
                 override_reason = f'Simulated {simulation_type} detected'
-            elif simulation_type == 'high_value':
+            elif simulation_type in VERIFICATION_SIMULATIONS:
                 decision = 'pending_verification'
                 override_reason = 'Simulated high-value transaction requires verification'
         
@@ -106,4 +116,69 @@ class RiskEngine:
             'override_reason': override_reason
         }
         
-        return risk_score, decision, risk_details
\ No newline at end of file
+        return risk_score, decision, risk_details
+    
+    def calculate_risk_batch(self, graph_temporal_scores, content_analysis_scores, amounts,
+                             is_new_account=None, is_simulated=None, simulation_types=None):
+        """
+        Calculate risk scores and decisions for many transactions at once.
+        
+        Applies the same weights, amount adjustment, thresholds and overrides as
+        calculate_risk with vectorized operations, and gives identical scores
+        and decisions for the same inputs.
+        
+        Args:
+            graph_temporal_scores (array-like): Scores from graph-temporal analysis
+            content_analysis_scores (array-like): Scores from content analysis
+            amounts (array-like): Transaction amounts
+            is_new_account (array-like, optional): Whether each sender is a new account
+            is_simulated (array-like, optional): Whether each transaction is simulated
+            simulation_types (array-like, optional): Simulation type of each transaction
+                ('' or None when not simulated)
+        
+        Returns:
+            tuple: (risk_scores, decisions) where decisions holds DECISION_* codes
+                (map them to names with DECISIONS)
+        """
+        # Only batch scoring needs numpy; importing it here keeps start-up fast
+        import numpy as np
+        
+        graph_temporal_scores = np.asarray(graph_temporal_scores, dtype=np.float64)
+        content_analysis_scores = np.asarray(content_analysis_scores, dtype=np.float64)
+        amounts = np.asarray(amounts, dtype=np.float64)
+        
+        # Weights per row: new accounts rely more on content
+        if is_new_account is None:
+            risk_scores = (
+                self.graph_temporal_weight * graph_temporal_scores +
+                self.content_analysis_weight * content_analysis_scores
+            )
+        else:
+            is_new_account = np.asarray(is_new_account, dtype=bool)
+            graph_temporal_weights = np.where(is_new_account, 0.4, self.graph_temporal_weight)
+            content_analysis_weights = np.where(is_new_account, 0.6, self.content_analysis_weight)
+            risk_scores = (
+                graph_temporal_weights * graph_temporal_scores +
+                content_analysis_weights * content_analysis_scores
+            )
+        
+        # Amount-based adjustment, only for amounts above the threshold
+        high_amount = amounts > 10000
+        risk_factors = np.minimum(0.2, (amounts - 10000) / 50000)
+        risk_scores = np.where(high_amount, np.minimum(1.0, risk_scores + risk_factors), risk_scores)
+        
+        # Thresholds
+        decisions = np.full(risk_scores.shape, DECISION_BLOCKED, dtype=np.int8)
+        decisions[risk_scores < self.high_risk_threshold] = DECISION_PENDING_VERIFICATION
+        decisions[risk_scores < self.low_risk_threshold] = DECISION_APPROVED
+        
+        # Overrides, in the same order as calculate_risk
+        decisions[content_analysis_scores > 0.8] = DECISION_BLOCKED
+        
+        if is_simulated is not None and simulation_types is not None:
+            is_simulated = np.asarray(is_simulated, dtype=bool)
+            simulation_types = np.asarray(simulation_types, dtype=object)
+            decisions[is_simulated & np.isin(simulation_types, BLOCKING_SIMULATIONS)] = DECISION_BLOCKED
+            decisions[is_simulated & np.isin(simulation_types, VERIFICATION_SIMULATIONS)] = DECISION_PENDING_VERIFICATION
+        
+        return risk_scores, decisions
\ No newline at end of file
@@ -0,0 +1,190 @@
+import heapq
+import logging
+from datetime import datetime, timedelta
+from app.config import Config
+from app.algorithm.graph_store import CompactGraph
+from app.models.transaction import Transaction
+
+class TransactionGraph:
+    """
+    Transaction graph that lives in the worker process for a sliding time window.
+    
+    The graph is bootstrapped from the database once and then updated
+    incrementally: each scored transaction adds its edge, and edges older than
+    the window are dropped in timestamp order from a min-heap. Transactions
+    written by other processes are picked up by a periodic catch-up query.
+    
+    When given an AccountStatsStore, the same feed keeps per-sender statistics
+    for processed transactions in the window up to date. Transactions first
+    seen while still pending are counted once a later sync finds them scored.
+    """
+    
+    def __init__(self, window_days=None, sync_seconds=None, account_stats=None, grace_seconds=None):
+        """
+        Initialize an empty graph.
+        
+        Args:
+            window_days (int, optional): Size of the sliding window in days
+            sync_seconds (int, optional): Interval between catch-up queries, 0 disables them
+            account_stats (AccountStatsStore, optional): Per-sender statistics to maintain
+            grace_seconds (int, optional): How far behind the last sync catch-up queries start
+        """
+        self.window = timedelta(days=window_days or Config.GRAPH_WINDOW_DAYS)
+        self.sync_interval = timedelta(
+            seconds=Config.GRAPH_SYNC_SECONDS if sync_seconds is None else sync_seconds
+        )
+        self.grace = timedelta(
+            seconds=Config.GRAPH_SYNC_GRACE_SECONDS if grace_seconds is None else grace_seconds
+        )
+        self.graph = CompactGraph()
+        self.account_stats = account_stats
+        
+        # Min-heap of (timestamp, transaction_id, sender_id, receiver_id, amount)
+        self._expiry = []
+        
+        # Transaction ID -> whether it has been added to the account statistics
+        self._transaction_ids = {}
+        
+        # Transaction ID -> (sender_id, amount, timestamp) of transactions in the
+        # window not scored yet, whose statistics are recorded once they are
+        self._pending = {}
+        
+        self.bootstrapped = False
+        self._last_sync = None
+    
+    def __len__(self):
+        """Number of transactions currently in the window"""
+        return len(self._transaction_ids)
+    
+    def bootstrap(self):
+        """
+        Load every transaction in the window from the database.
+        Must be called inside an app context.
+        """
+        now = datetime.utcnow()
+        self._load_since(now - self.window)
+        self.bootstrapped = True
+        self._last_sync = now
+        logging.info(f"Transaction graph bootstrapped with {len(self)} transactions")
+    
+    def sync(self):
+        """
+        Pick up transactions written since the last sync (e.g. scored by another
+        worker process). Must be called inside an app context.
+        
+        Rows are found by their client-supplied timestamp, so the query re-reads
+        a grace window behind the last sync to catch rows stamped up to that
+        much earlier than the time they were stored.
+        """
+        if not self.bootstrapped:
+            self.bootstrap()
+            return
+        
+        now = datetime.utcnow()
+        if not self.sync_interval or now - self._last_sync < self.sync_interval:
+            return
+        
+        # Overlap with the previous syncs; duplicates are ignored by ID
+        self._load_since(self._last_sync - max(self.sync_interval, self.grace))
+        self._record_scored_pending()
+        self._last_sync = now
+    
+    def _load_since(self, since):
+        rows = Transaction.query.with_entities(
+            Transaction.id,
+            Transaction.sender_id,
+            Transaction.receiver_id,
+            Transaction.amount,
+            Transaction.timestamp,
+            Transaction.processed
+        ).filter(Transaction.timestamp >= since).order_by(Transaction.timestamp).all()
+        
+        for row in rows:
+            self.add_transaction(
+                row.id, row.sender_id, row.receiver_id, row.amount, row.timestamp,
+                processed=row.processed
+            )
+    
+    def _record_scored_pending(self, chunk_size=500):
+        """Record the statistics of pending transactions that have been scored since, e.g. by another process"""
+        pending_ids = list(self._pending)
+        for start in range(0, len(pending_ids), chunk_size):
+            rows = Transaction.query.with_entities(Transaction.id).filter(
+                Transaction.id.in_(pending_ids[start:start + chunk_size]),
+                Transaction.processed.is_(True)
+            ).all()
+            for row in rows:
+                sender_id, amount, timestamp = self._pending[row.id]
+                self.record_sender_stats(row.id, sender_id, amount, timestamp)
+    
+    def add_transaction(self, transaction_id, sender_id, receiver_id, amount, timestamp, processed=False):
+        """
+        Add a transaction edge to the graph.
+        
+        Args:
+            transaction_id (str): Transaction ID, used to ignore duplicates
+            sender_id (str): Sender's ID
+            receiver_id (str): Receiver's ID
+            amount (float): Transaction amount
+            timestamp (datetime): Transaction timestamp
+            processed (bool): Whether the transaction has already been scored, in
+                which case it is also added to the account statistics
+        
+        Returns:
+            bool: False if the transaction was already in the graph
+        """
+        if transaction_id in self._transaction_ids:
+            # Seen pending before and scored since
+            if processed:
+                self.record_sender_stats(transaction_id, sender_id, amount, timestamp)
+            return False
+        
+        self._transaction_ids[transaction_id] = False
+        heapq.heappush(self._expiry, (timestamp, transaction_id, sender_id, receiver_id, amount))
+        self.graph.add_transaction(sender_id, receiver_id, amount, timestamp)
+        
+        if processed:
+            self.record_sender_stats(transaction_id, sender_id, amount, timestamp)
+        elif self.account_stats is not None:
+            self._pending[transaction_id] = (sender_id, amount, timestamp)
+        return True
+    
+    def record_sender_stats(self, transaction_id, sender_id, amount, timestamp):
+        """
+        Add a transaction in the window to the sender's statistics, once.
+        
+        Args:
+            transaction_id (str): Transaction ID
+            sender_id (str): Sender's ID
+            amount (float): Transaction amount
+            timestamp (datetime): Transaction timestamp
+        """
+        if self.account_stats is None or self._transaction_ids.get(transaction_id) is not False:
+            return
+        
+        self.account_stats.record(sender_id, amount, timestamp)
+        self._transaction_ids[transaction_id] = True
+        self._pending.pop(transaction_id, None)
+    
+    def evict(self, now=None):
+        """
+        Drop transactions that are older than the window.
+        
+        Args:
+            now (datetime, optional): Reference time, defaults to the current UTC time
+        
+        Returns:
+            int: Number of transactions removed
+        """
+        cutoff = (now or datetime.utcnow()) - self.window
+        removed = 0
+        
+        while self._expiry and self._expiry[0][0] < cutoff:
+            timestamp, transaction_id, sender_id, receiver_id, amount = heapq.heappop(self._expiry)
+            if self._transaction_ids.pop(transaction_id, False):
+                self.account_stats.remove(sender_id, amount)
+            self._pending.pop(transaction_id, None)
+            self.graph.remove_transaction(sender_id, receiver_id, amount, timestamp)
+            removed += 1
+        
+        return removed
@@ -0,0 +1,239 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from app import serialization
+from app.config import Config
+from app.metrics import VERDICT_CACHE_LOOKUPS
+
+# Expired and least recently used rows are pruned from the shared store every this many writes
+PRUNE_EVERY = 500
+
+# Shared-tier hits refresh last_used in one write per this many hits or seconds,
+# rather than taking the SQLite write lock on every lookup
+TOUCH_BATCH_SIZE = 100
+TOUCH_INTERVAL_SECONDS = 30
+
+class DomainVerdictCache:
+    """
+    Cache of domain verdicts with TTL and LRU eviction.
+    
+    Verdicts live in a SQLite file shared by every process on the host, so a
+    domain scored by one worker is a hit for the others and survives restarts.
+    In front of it, each process keeps a small in-memory LRU, so repeat hits on
+    a hot domain cost a dict lookup. Entries expire after ttl_seconds in both
+    tiers; the shared store is trimmed to max_entries by last use, which hits
+    record in batches.
+    
+    The cache never fails a lookup: if the SQLite file cannot be used, it
+    logs the error and falls back to the in-memory tier.
+    """
+    
+    def __init__(self, path=None, ttl_seconds=None, max_entries=None, memory_entries=None):
+        """
+        Initialize the cache.
+        
+        Args:
+            path (str, optional): SQLite file for the shared tier; in-memory only if empty
+            ttl_seconds (int, optional): Time a verdict stays valid
+            max_entries (int, optional): Maximum number of verdicts in the shared tier
+            memory_entries (int, optional): Maximum number of verdicts in the in-memory tier
+        """
+        self.path = path
+        self.ttl_seconds = ttl_seconds or Config.DOMAIN_CACHE_TTL_SECONDS
+        self.max_entries = max_entries or Config.DOMAIN_CACHE_MAX_ENTRIES
+        self.memory_entries = memory_entries or Config.DOMAIN_CACHE_MEMORY_ENTRIES
+        
+        # Counters for this process
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        
+        self._memory = OrderedDict()  # key -> (expires_at, verdict)
+        self._lock = threading.Lock()
+        self._connection = None
+        self._writes = 0
+        self._touched = {}  # key -> last shared-tier hit not written yet
+        self._last_touch_flush = time.monotonic()
+        
+        if path:
+            self._open()
+    
+    def _open(self):
+        try:
+            connection = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS domain_verdicts ('
+                'key TEXT PRIMARY KEY, verdict TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, last_used REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_domain_verdicts_last_used ON domain_verdicts (last_used)')
+            self._connection = connection
+        except sqlite3.Error as e:
+            logging.error(f"Domain verdict cache unavailable at {self.path}: {str(e)}")
+            self._connection = None
+    
+    def _remember(self, key, verdict, expires_at):
+        self._memory[key] = (expires_at, verdict)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+    
+    def get(self, key):
+        """
+        Look up a verdict.
+        
+        Args:
+            key (str): Cache key
+        
+        Returns:
+            dict: The cached verdict (shared, do not modify), or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    VERDICT_CACHE_LOOKUPS.inc('memory_hit')
+                    return entry[1]
+                del self._memory[key]
+            
+            verdict = None
+            if self._connection is not None:
+                try:
+                    row = self._connection.execute(
+                        'SELECT verdict, expires_at FROM domain_verdicts WHERE key = ?', (key,)
+                    ).fetchone()
+                    if row is not None and row[1] > now:
+                        verdict = serialization.loads(row[0])
+                        self._remember(key, verdict, row[1])
+                except sqlite3.Error as e:
+                    logging.error(f"Error reading domain verdict cache: {str(e)}")
+            
+            if verdict is None:
+                self.misses += 1
+                VERDICT_CACHE_LOOKUPS.inc('miss')
+                return None
+            
+            self.shared_hits += 1
+            VERDICT_CACHE_LOOKUPS.inc('shared_hit')
+            self._touch(key, now)
+            return verdict
+    
+    def put(self, key, verdict):
+        """
+        Store a verdict.
+        
+        Args:
+            key (str): Cache key
+            verdict (dict): JSON-serializable verdict
+        """
+        now = time.time()
+        expires_at = now + self.ttl_seconds
+        with self._lock:
+            self._remember(key, verdict, expires_at)
+            if self._connection is None:
+                return
+            
+            try:
+                self._connection.execute(
+                    'INSERT OR REPLACE INTO domain_verdicts (key, verdict, expires_at, last_used) VALUES (?, ?, ?, ?)',
+                    (key, serialization.dumps(verdict), expires_at, now)
+                )
+                self._writes += 1
+                if self._writes % PRUNE_EVERY == 0:
+                    self._prune(now)
+            except sqlite3.Error as e:
+                logging.error(f"Error writing domain verdict cache: {str(e)}")
+    
+    def _touch(self, key, now):
+        """Note a shared-tier hit, writing the pending last_used updates once enough have built up"""
+        self._touched[key] = now
+        if (len(self._touched) >= TOUCH_BATCH_SIZE or
+                time.monotonic() - self._last_touch_flush >= TOUCH_INTERVAL_SECONDS):
+            # last_used only orders pruning: a failed write (e.g. SQLITE_BUSY) costs nothing else
+            try:
+                self._flush_touched()
+            except sqlite3.Error as e:
+                logging.error(f"Error recording domain verdict cache use: {str(e)}")
+    
+    def _flush_touched(self):
+        touched, self._touched = self._touched, {}
+        self._last_touch_flush = time.monotonic()
+        if not touched:
+            return
+        # One transaction, so the write lock is taken once for the batch
+        self._connection.execute('BEGIN IMMEDIATE')
+        try:
+            self._connection.executemany(
+                'UPDATE domain_verdicts SET last_used = ? WHERE key = ?',
+                [(last_used, key) for key, last_used in touched.items()]
+            )
+            self._connection.execute('COMMIT')
+        except sqlite3.Error:
+            self._connection.execute('ROLLBACK')
+            raise
+    
+    def _prune(self, now):
+        # Last use must be current before trimming by it
+        self._flush_touched()
+        self._connection.execute('DELETE FROM domain_verdicts WHERE expires_at <= ?', (now,))
+        self._connection.execute(
+            'DELETE FROM domain_verdicts WHERE key IN ('
+            'SELECT key FROM domain_verdicts ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)
+        )
+    
+    def clear(self):
+        """Drop every verdict from both tiers"""
+        with self._lock:
+            self._memory.clear()
+            if self._connection is not None:
+                try:
+                    self._connection.execute('DELETE FROM domain_verdicts')
+                except sqlite3.Error as e:
+                    logging.error(f"Error clearing domain verdict cache: {str(e)}")
+    
+    def stats(self):
+        """
+        Hit and miss counters for this process.
+        
+        Returns:
+            dict: Hits per tier, misses, hit rate and in-memory size
+        """
+        lookups = self.hits + self.shared_hits + self.misses
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            'memory_entries': len(self._memory)
+        }
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+def get_verdict_cache():
+    """
+    Return the domain verdict cache for the current process, opening it on first use.
+    
+    Returns:
+        DomainVerdictCache: The process-wide cache
+    """
+    global _cache, _cache_pid
+    
+    # A forked child must not share the parent's SQLite connection
+    if _cache is None or _cache_pid != os.getpid():
+        with _cache_lock:
+            if _cache is None or _cache_pid != os.getpid():
+                _cache = DomainVerdictCache(Config.DOMAIN_CACHE_PATH)
+                _cache_pid = os.getpid()
+    
+    return _cache
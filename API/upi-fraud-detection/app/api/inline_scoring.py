@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+import time
+from app.algorithm.feature_context import TransactionContext
+from app.algorithm.input_processor import process_transaction_input
+from app.config import Config
+from app.metrics import DECISIONS, stage_timer
+from app.models.transaction import Transaction
+from app.runtime import WorkerRuntime
+
+class InlineScorer:
+    """
+    Scores transactions inside the API process within a latency budget.
+    
+    Uses a WorkerRuntime bound to the API app, so the analyzers, the look-alike
+    index and the in-memory transaction graph stay warm between requests. The
+    deadline is checked before each stage; a stage that has started runs to
+    completion. When the budget runs out, the caller gets the stages that
+    finished and a conservative decision, and the transaction goes through
+    the queue for the full analysis.
+    
+    Each API process keeps its own runtime, so each loads the transaction graph
+    for the whole window once; INLINE_SCORE_GRAPH=false skips that and the
+    graph stage. The graph and statistics only take in a transaction after the
+    caller has stored its verdict (record).
+    """
+    
+    # Stages in the order they run: cheap, cached content checks first
+    STAGES = ('input', 'content', 'graph_temporal', 'risk')
+    
+    def __init__(self, app, load_graph=None):
+        """
+        Initialize the scorer and warm up its runtime in the background.
+        
+        Args:
+            app (Flask): The API app
+            load_graph (bool, optional): Whether to load the transaction graph for
+                the graph stage, defaults to Config.INLINE_SCORE_GRAPH
+        """
+        self.runtime = WorkerRuntime(app=app)
+        self.load_graph = Config.INLINE_SCORE_GRAPH if load_graph is None else load_graph
+        
+        # The runtime's graph and statistics are not thread-safe
+        self._lock = threading.Lock()
+        
+        # Until warmup finishes the graph is incomplete, so the graph stage is skipped
+        self._warmup_thread = None
+        if self.load_graph:
+            self._warmup_thread = threading.Thread(target=self._warmup, name='inline-scorer-warmup', daemon=True)
+            self._warmup_thread.start()
+    
+    def _warmup(self):
+        try:
+            self.runtime.warmup()
+        except Exception as e:
+            logging.error(f"Error warming up inline scorer: {str(e)}")
+    
+    def score(self, transaction, deadline_ms):
+        """
+        Score a transaction, stopping between stages once the deadline has passed.
+        
+        Must be called inside an app context.
+        
+        Args:
+            transaction (Transaction): The transaction to score (need not be stored yet)
+            deadline_ms (float): Latency budget in milliseconds
+        
+        Returns:
+            dict: 'complete' (bool), 'completed_stages' (list), 'elapsed_ms', and
+                for a complete run the column values to store ('columns') and the
+                decision; for a partial run a conservative 'decision' and its 'reason'
+        """
+        start = time.perf_counter()
+        deadline = start + deadline_ms / 1000
+        completed = []
+        
+        def remaining():
+            return deadline - time.perf_counter()
+        
+        if not self._lock.acquire(timeout=max(remaining(), 0)):
+            return self._partial(start, completed, None, 'Scorer busy until the deadline')
+        
+        try:
+            runtime = self.runtime
+            context = TransactionContext(
+                transaction,
+                include_window=runtime.graph_temporal.needs_history_window
+            )
+            with stage_timer('input'):
+                user_data, transaction_data = process_transaction_input(transaction, context)
+            completed.append('input')
+            
+            if remaining() <= 0:
+                return self._partial(start, completed, None, 'Deadline reached before content analysis')
+            with stage_timer('content'):
+                content_analysis_score, content_analysis_details = runtime.content_analyzer.analyze(transaction_data)
+            completed.append('content')
+            
+            if not self.load_graph:
+                return self._partial(start, completed, content_analysis_score, 'Graph stage disabled in the API')
+            if not runtime.warmed_up:
+                return self._partial(start, completed, content_analysis_score, 'Transaction graph is still loading')
+            if remaining() <= 0:
+                return self._partial(start, completed, content_analysis_score, 'Deadline reached before graph-temporal analysis')
+            graph_temporal_score, graph_temporal_details = runtime.graph_temporal.analyze(
+                transaction.sender_id,
+                transaction.receiver_id,
+                transaction.amount,
+                transaction.timestamp,
+                transaction.id,
+                context,
+                # Not stored yet: record() adds it once the verdict is committed
+                record=False
+            )
+            completed.append('graph_temporal')
+            
+            # The risk engine is a few arithmetic operations; once here, finish
+            with stage_timer('risk'):
+                risk_score, decision, risk_details = runtime.risk_engine.calculate_risk(
+                    graph_temporal_score,
+                    content_analysis_score,
+                    transaction_data,
+                    graph_temporal_details,
+                    content_analysis_details
+                )
+            completed.append('risk')
+            DECISIONS.inc(decision)
+        finally:
+            self._lock.release()
+        
+        return {
+            'complete': True,
+            'completed_stages': completed,
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+            'decision': decision,
+            'columns': {
+                'graph_temporal_score': graph_temporal_score,
+                'content_analysis_score': content_analysis_score,
+                'risk_score': risk_score,
+                'status': decision,
+                'processed': True,
+                'risk_details': Transaction.serialize_risk_details(risk_details)
+            }
+        }
+    
+    def record(self, transaction):
+        """
+        Add a scored transaction to the graph and statistics, once its verdict is stored.
+        
+        Args:
+            transaction (Transaction): The committed transaction
+        """
+        with self._lock:
+            if not self.runtime.warmed_up:
+                # Bootstrap or a later sync loads it from the database
+                return
+            self.runtime.transaction_graph.add_transaction(
+                transaction.id,
+                transaction.sender_id,
+                transaction.receiver_id,
+                transaction.amount,
+                transaction.timestamp,
+                processed=True
+            )
+    
+    @staticmethod
+    def _partial(start, completed, content_analysis_score, reason):
+        """
+        Conservative decision from the stages that finished.
+        
+        Content analysis alone can block (the risk engine blocks any content score
+        above 0.8 whatever the other signals); otherwise the transaction needs
+        verification until the full analysis is done.
+        """
+        if content_analysis_score is not None and content_analysis_score > 0.8:
+            decision = 'blocked'
+        else:
+            decision = 'pending_verification'
+        
+        return {
+            'complete': False,
+            'completed_stages': list(completed),
+            'elapsed_ms': (time.perf_counter() - start) * 1000,
+            'decision': decision,
+            'content_analysis_score': content_analysis_score,
+            'reason': reason
+        }
+
+_scorer = None
+_scorer_pid = None
+_scorer_lock = threading.Lock()
+
+def get_inline_scorer(app):
+    """
+    Return the inline scorer for the current process, creating it on first use.
+    
+    Args:
+        app (Flask): The API app
+    
+    Returns:
+        InlineScorer: The process-wide scorer
+    """
+    global _scorer, _scorer_pid
+    
+    # Each forked API worker warms up its own runtime
+    if _scorer is None or _scorer_pid != os.getpid():
+        with _scorer_lock:
+            if _scorer is None or _scorer_pid != os.getpid():
+                _scorer = InlineScorer(app)
+                _scorer_pid = os.getpid()
+    
+    return _scorer
@@ -0,0 +1,59 @@
+import hashlib
+import threading
+import time
+
+class ResponseCache:
+    """
+    Short-lived in-process cache of rendered response bodies with their ETags.
+    
+    Meant for endpoints that many clients refresh constantly: within the TTL
+    every refresh is served from memory, and clients that send the ETag back
+    get a 304 without a body.
+    """
+    
+    def __init__(self, ttl_seconds, max_entries=256):
+        """
+        Initialize the cache.
+        
+        Args:
+            ttl_seconds (float): Time a response stays valid
+            max_entries (int): Maximum number of cached responses
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}  # key -> (expires_at, body, etag)
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """
+        Look up a response.
+        
+        Returns:
+            tuple: (body, etag), or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            return None
+        return entry[1], entry[2]
+    
+    def put(self, key, body):
+        """
+        Store a response body.
+        
+        Args:
+            key (hashable): Cache key, e.g. the request parameters
+            body (bytes): Rendered response body
+        
+        Returns:
+            str: The body's ETag
+        """
+        etag = hashlib.sha1(body).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop expired entries first, everything if that is not enough
+                self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+                if len(self._entries) >= self.max_entries:
+                    self._entries = {}
+            self._entries[key] = (now + self.ttl_seconds, body, etag)
+        return etag
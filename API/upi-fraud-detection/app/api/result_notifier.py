@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import time
+import pika
+from app import serialization
+from app.config import Config
+from app.rabbitmq.producer import get_connection_parameters
+
+class ResultWaiter:
+    """
+    A request waiting for one transaction's verdict.
+    
+    Use as a context manager so the subscription is always removed.
+    """
+    
+    def __init__(self, notifier, transaction_id):
+        self.notifier = notifier
+        self.transaction_id = transaction_id
+        self.result = None
+        self._event = threading.Event()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.notifier.unsubscribe(self)
+    
+    def set(self, result):
+        self.result = result
+        self._event.set()
+    
+    def wait(self, timeout):
+        """
+        Block until the verdict is announced.
+        
+        Args:
+            timeout (float): Maximum seconds to wait
+        
+        Returns:
+            dict: The announced result, or None on timeout
+        """
+        self._event.wait(timeout)
+        return self.result
+
+class ResultNotifier:
+    """
+    Wakes up requests waiting for transaction verdicts.
+    
+    A background thread binds an exclusive, auto-deleted queue to the results
+    exchange, on which workers announce every verdict they store, and hands
+    each announcement to the requests subscribed to that transaction. Requests
+    therefore wait without querying the database. While the listener is
+    disconnected, `connected` is False and waiters fall back to re-checking
+    the database periodically.
+    """
+    
+    def __init__(self, exchange=None):
+        """
+        Initialize the notifier. The listener thread is started by start().
+        
+        Args:
+            exchange (str, optional): Results exchange to listen on
+        """
+        self.exchange = exchange or Config.RESULTS_EXCHANGE
+        self.connected = False
+        self._waiters = {}  # transaction ID -> set of ResultWaiter
+        self._lock = threading.Lock()
+        self._thread = None
+    
+    def start(self):
+        """Start the background listener thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='result-notifier', daemon=True)
+            self._thread.start()
+    
+    def subscribe(self, transaction_id):
+        """
+        Register interest in a transaction's verdict. Subscribe before checking
+        the database, so a verdict stored in between is not missed.
+        
+        Args:
+            transaction_id (str): Transaction to wait for
+        
+        Returns:
+            ResultWaiter: Waiter to block on (use as a context manager)
+        """
+        waiter = ResultWaiter(self, transaction_id)
+        with self._lock:
+            self._waiters.setdefault(transaction_id, set()).add(waiter)
+        return waiter
+    
+    def unsubscribe(self, waiter):
+        """Remove a waiter registered with subscribe()"""
+        with self._lock:
+            waiters = self._waiters.get(waiter.transaction_id)
+            if waiters is not None:
+                waiters.discard(waiter)
+                if not waiters:
+                    del self._waiters[waiter.transaction_id]
+    
+    def notify(self, transaction_id, result):
+        """
+        Wake up every waiter for a transaction.
+        
+        Args:
+            transaction_id (str): Transaction whose verdict was stored
+            result (dict): Announced result
+        """
+        with self._lock:
+            waiters = self._waiters.pop(transaction_id, ())
+        for waiter in waiters:
+            waiter.set(result)
+    
+    def _on_message(self, channel, method, properties, body):
+        try:
+            result = serialization.loads(body)
+            self.notify(result['transaction_id'], result)
+        except Exception as e:
+            logging.error(f"Dropping malformed result message: {str(e)}")
+    
+    def _run(self):
+        """Listen on the results exchange, reconnecting with backoff (listener thread)"""
+        delay = 1
+        while True:
+            try:
+                connection = pika.BlockingConnection(get_connection_parameters())
+                channel = connection.channel()
+                channel.exchange_declare(exchange=self.exchange, exchange_type='fanout', durable=True)
+                queue_name = channel.queue_declare(queue='', exclusive=True, auto_delete=True).method.queue
+                channel.queue_bind(exchange=self.exchange, queue=queue_name)
+                channel.basic_consume(queue=queue_name, on_message_callback=self._on_message, auto_ack=True)
+                
+                self.connected = True
+                delay = 1
+                logging.info(f"Listening for transaction results on exchange: {self.exchange}")
+                channel.start_consuming()
+            except Exception as e:
+                logging.error(f"Results listener disconnected: {str(e)}. Reconnecting in {delay} seconds...")
+            finally:
+                self.connected = False
+            
+            time.sleep(delay)
+            delay = min(delay * 2, 30)
+
+_notifier = None
+_notifier_pid = None
+_notifier_lock = threading.Lock()
+
+def get_result_notifier():
+    """
+    Return the result notifier for the current process, starting it on first use.
+    
+    Returns:
+        ResultNotifier: The process-wide notifier
+    """
+    global _notifier, _notifier_pid
+    
+    # Each forked API worker needs its own listener thread and queue
+    if _notifier is None or _notifier_pid != os.getpid():
+        with _notifier_lock:
+            if _notifier is None or _notifier_pid != os.getpid():
+                _notifier = ResultNotifier()
+                _notifier.start()
+                _notifier_pid = os.getpid()
+    
+    return _notifier
@@ -1,13 +1,39 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, current_app, g, request, jsonify, stream_with_context
+import base64
+import binascii
+import hmac
+import logging
+import math
+import time
 import uuid
-import json
-from app import db
+from sqlalchemy import tuple_
+from app import db, serialization
+from app.api.inline_scoring import get_inline_scorer
+from app.api.response_cache import ResponseCache
+from app.api.result_notifier import get_result_notifier
+from app.config import Config
+from app.metrics import CONTENT_TYPE, HTTP_REQUEST_DURATION, REGISTRY
 from app.models.transaction import Transaction
-from app.rabbitmq.producer import publish_transaction
+from app.profiler import get_profiler
+from app.rabbitmq.producer import publish_transaction, publish_transactions
 from datetime import datetime
 
 api_bp = Blueprint('api', __name__)
 
+@api_bp.before_request
+def _start_request_timer():
+    g.request_start = time.perf_counter()
+
+@api_bp.after_request
+def _record_request_duration(response):
+    # For streamed responses this is the time to the first byte
+    start = g.pop('request_start', None)
+    if start is not None:
+        HTTP_REQUEST_DURATION.observe(
+            time.perf_counter() - start, request.endpoint or 'unknown', request.method, str(response.status_code)
+        )
+    return response
+
 @api_bp.route('/transaction', methods=['POST'])
 def process_transaction():
     """
@@ -30,7 +56,6 @@ def process_transaction():
         
         # Extract txn_metadata if provided
         txn_metadata = data.get('txn_metadata', {})
-        txn_metadata_json = json.dumps(txn_metadata) if txn_metadata else None
         
         # Create transaction record
         transaction = Transaction(
@@ -39,7 +64,7 @@ def process_transaction():
             receiver_id=data['receiver_id'],
             amount=float(data['amount']),
             timestamp=datetime.fromisoformat(data.get('timestamp', datetime.utcnow().isoformat())),
-            txn_metadata=txn_metadata_json,
+            txn_metadata=txn_metadata or None,
             status='pending',
             processed=False
         )
@@ -61,6 +86,196 @@ def process_transaction():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def _transaction_row(data, default_timestamp):
+    """
+    Validate one transaction from a batch and build its row.
+    
+    Args:
+        data (dict): Transaction as sent by the client
+        default_timestamp (datetime): Timestamp used when none is given
+    
+    Returns:
+        dict: Column values for a new transaction
+    
+    Raises:
+        ValueError: If the transaction is invalid
+    """
+    if not isinstance(data, dict):
+        raise ValueError('Transaction must be an object')
+    
+    for field in ['sender_id', 'receiver_id', 'amount']:
+        if field not in data:
+            raise ValueError(f'Missing required field: {field}')
+    
+    # Checked here: an oversized ID would fail the whole bulk insert on PostgreSQL
+    for field in ['sender_id', 'receiver_id']:
+        max_length = getattr(Transaction, field).type.length
+        if len(str(data[field])) > max_length:
+            raise ValueError(f'{field} is longer than {max_length} characters')
+    
+    try:
+        amount = float(data['amount'])
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid amount: {data['amount']!r}")
+    if not math.isfinite(amount):
+        raise ValueError(f"Invalid amount: {data['amount']!r}")
+    
+    timestamp = default_timestamp
+    if 'timestamp' in data:
+        try:
+            timestamp = datetime.fromisoformat(data['timestamp'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid timestamp: {data['timestamp']!r}")
+    
+    txn_metadata = data.get('txn_metadata', {})
+    if not isinstance(txn_metadata, dict):
+        raise ValueError('txn_metadata must be an object')
+    
+    return {
+        'id': str(uuid.uuid4()),
+        'sender_id': str(data['sender_id']),
+        'receiver_id': str(data['receiver_id']),
+        'amount': amount,
+        'timestamp': timestamp,
+        'txn_metadata': txn_metadata or None,
+        'status': 'pending',
+        'processed': False,
+        'is_simulated': False
+    }
+
+@api_bp.route('/transactions/batch', methods=['POST'])
+def process_transactions_batch():
+    """
+    Endpoint to receive many transactions in one request.
+    
+    Accepts a list of transactions (or {"transactions": [...]}), validates them
+    in one pass, stores the valid ones with a single commit and queues them for
+    processing together. Invalid items are reported per index and do not
+    prevent the others from being accepted.
+    """
+    try:
+        data = request.json
+        if isinstance(data, dict):
+            data = data.get('transactions')
+        if not isinstance(data, list) or not data:
+            return jsonify({'error': 'No transactions provided'}), 400
+        
+        if len(data) > Config.BATCH_MAX_TRANSACTIONS:
+            return jsonify({
+                'error': f'Too many transactions: {len(data)} (maximum {Config.BATCH_MAX_TRANSACTIONS})'
+            }), 413
+        
+        # Validate everything before touching the database
+        now = datetime.utcnow()
+        rows = []
+        accepted = []
+        errors = []
+        for index, item in enumerate(data):
+            try:
+                row = _transaction_row(item, now)
+            except ValueError as e:
+                errors.append({'index': index, 'error': str(e)})
+                continue
+            rows.append(row)
+            accepted.append({'index': index, 'transaction_id': row['id']})
+        
+        if not rows:
+            return jsonify({'error': 'No valid transactions', 'errors': errors}), 400
+        
+        # Save to database in one commit
+        db.session.bulk_insert_mappings(Transaction, rows)
+        db.session.commit()
+        
+        # Publish to RabbitMQ for processing
+        transaction_ids = [row['id'] for row in rows]
+        try:
+            publish_transactions(transaction_ids)
+        except Exception as e:
+            return jsonify({
+                'error': f'Transactions stored but not queued for processing: {str(e)}',
+                'transaction_ids': transaction_ids
+            }), 503
+        
+        return jsonify({
+            'transaction_ids': transaction_ids,
+            'transactions': accepted,
+            'errors': errors,
+            'status': 'pending',
+            'message': f'{len(rows)} transactions received and queued for processing'
+        }), 202
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/score', methods=['POST'])
+def score_transaction_inline():
+    """
+    Endpoint to score a transaction synchronously within a latency budget.
+    
+    Runs the analyzers in the request process. The budget comes from the
+    optional deadline_ms field (capped by INLINE_SCORE_MAX_DEADLINE_MS). If it
+    runs out, the response carries a conservative decision from the stages
+    that finished and the transaction is queued for the full analysis.
+    """
+    try:
+        data = request.json
+        if not data:
+            return jsonify({'error': 'No data provided'}), 400
+        
+        try:
+            deadline_ms = float(data.get('deadline_ms', current_app.config['INLINE_SCORE_DEADLINE_MS']))
+        except (TypeError, ValueError):
+            return jsonify({'error': f"Invalid deadline_ms: {data.get('deadline_ms')!r}"}), 400
+        
+        try:
+            row = _transaction_row(data, datetime.utcnow())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        deadline_ms = min(max(deadline_ms, 0.0), current_app.config['INLINE_SCORE_MAX_DEADLINE_MS'])
+        
+        transaction = Transaction(**row)
+        scorer = get_inline_scorer(current_app._get_current_object())
+        result = scorer.score(transaction, deadline_ms)
+        
+        response = {
+            'transaction_id': transaction.id,
+            'status': result['decision'],
+            'partial': not result['complete'],
+            'completed_stages': result['completed_stages'],
+            'elapsed_ms': result['elapsed_ms']
+        }
+        
+        if result['complete']:
+            # Store the verdict; no queueing needed
+            for column, value in result['columns'].items():
+                setattr(transaction, column, value)
+            db.session.add(transaction)
+            db.session.commit()
+            scorer.record(transaction)
+            
+            response['risk_score'] = transaction.risk_score
+            response['graph_temporal_score'] = transaction.graph_temporal_score
+            response['content_analysis_score'] = transaction.content_analysis_score
+            return jsonify(response), 200
+        
+        # Partial: store as pending and hand over to the worker
+        db.session.add(transaction)
+        db.session.commit()
+        
+        response['reason'] = result['reason']
+        try:
+            publish_transaction(transaction.id)
+            response['message'] = 'Full analysis queued'
+        except Exception as e:
+            logging.error(f"Could not queue full analysis for {transaction.id}: {str(e)}")
+            response['message'] = 'Full analysis could not be queued'
+        return jsonify(response), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/simulate-fraud', methods=['POST'])
 def simulate_fraud():
     """
@@ -122,7 +337,7 @@ def simulate_fraud():
             receiver_id=data['receiver_id'],
             amount=amount,
             timestamp=datetime.fromisoformat(data.get('timestamp', datetime.utcnow().isoformat())),
-            txn_metadata=json.dumps(txn_metadata),
+            txn_metadata=txn_metadata,
             status='pending',
             processed=False,
             is_simulated=True,
@@ -163,6 +378,126 @@ def get_transaction_status(transaction_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def _wait_for_result(transaction_id, timeout):
+    """
+    Wait until a transaction has been processed, without polling the database
+    while the results listener is connected.
+    
+    The database connection is returned to the pool while waiting.
+    
+    Args:
+        transaction_id (str): Transaction to wait for
+        timeout (float): Maximum seconds to wait
+    
+    Returns:
+        Transaction: The transaction (processed unless the wait timed out),
+            or None if it does not exist
+    """
+    notifier = get_result_notifier()
+    deadline = time.monotonic() + timeout
+    
+    with notifier.subscribe(transaction_id) as waiter:
+        # Subscribed first, so a verdict stored after this read still wakes us up
+        transaction = Transaction.query.get(transaction_id)
+        
+        while transaction is not None and not transaction.processed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            
+            # Without a listener, wake up now and then to re-check the database
+            db.session.close()
+            poll = remaining if notifier.connected else min(remaining, Config.RESULT_FALLBACK_POLL_SECONDS)
+            announced = waiter.wait(poll) is not None
+            if not announced and poll >= remaining:
+                break
+            
+            transaction = Transaction.query.get(transaction_id)
+            if announced:
+                break
+    
+    return transaction
+
+def _pending_response(transaction_id):
+    return {
+        'transaction_id': transaction_id,
+        'status': 'pending',
+        'message': 'Transaction is still being processed'
+    }
+
+@api_bp.route('/transaction/<transaction_id>/wait', methods=['GET'])
+def wait_for_transaction(transaction_id):
+    """
+    Long-poll for a transaction's verdict.
+    
+    Returns the transaction as soon as the worker has stored its verdict, or a
+    pending response once the timeout (seconds, capped by
+    RESULT_WAIT_MAX_SECONDS) has passed.
+    """
+    try:
+        timeout = min(max(float(request.args.get('timeout', Config.RESULT_WAIT_MAX_SECONDS)), 0.0), Config.RESULT_WAIT_MAX_SECONDS)
+        
+        transaction = _wait_for_result(transaction_id, timeout)
+        if not transaction:
+            return jsonify({'error': 'Transaction not found'}), 404
+        
+        if not transaction.processed:
+            return jsonify(_pending_response(transaction_id)), 202
+        
+        return jsonify(transaction.to_dict()), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/transaction/<transaction_id>/events', methods=['GET'])
+def transaction_events(transaction_id):
+    """
+    Server-Sent Events stream for a transaction's verdict.
+    
+    Sends a 'pending' event, keep-alive comments while waiting and a 'result'
+    event with the processed transaction, then closes. The stream also closes
+    after the timeout (seconds, capped by RESULT_STREAM_MAX_SECONDS); clients
+    such as EventSource reconnect by themselves.
+    """
+    try:
+        timeout = min(max(float(request.args.get('timeout', Config.RESULT_STREAM_MAX_SECONDS)), 0.0), Config.RESULT_STREAM_MAX_SECONDS)
+        
+        transaction = Transaction.query.get(transaction_id)
+        if not transaction:
+            return jsonify({'error': 'Transaction not found'}), 404
+        
+        def event(name, data):
+            return f"event: {name}\ndata: {serialization.dumps(data)}\n\n"
+        
+        def generate():
+            current = transaction
+            deadline = time.monotonic() + timeout
+            yield 'retry: 1000\n'
+            
+            if not current.processed:
+                yield event('pending', _pending_response(transaction_id))
+            
+            while not current.processed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                current = _wait_for_result(transaction_id, min(remaining, Config.RESULT_STREAM_KEEPALIVE_SECONDS))
+                if current is None:
+                    return
+                if not current.processed:
+                    yield ': keep-alive\n\n'
+            
+            yield event('result', current.to_dict())
+        
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/risk-details/<transaction_id>', methods=['GET'])
 def get_risk_details(transaction_id):
     """
@@ -197,20 +532,153 @@ def get_risk_details(transaction_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Columns listed by the recent transactions feed; txn_metadata only on request
+RECENT_COLUMNS = (
+    'id', 'sender_id', 'receiver_id', 'amount', 'timestamp', 'risk_score', 'status', 'processed',
+    'graph_temporal_score', 'content_analysis_score', 'is_simulated', 'simulation_type'
+)
+
+# Dashboard refreshes within the TTL are served from memory
+_recent_cache = ResponseCache(Config.RECENT_TRANSACTIONS_CACHE_SECONDS)
+
+def _encode_cursor(timestamp, transaction_id):
+    """Opaque cursor pointing after the given (timestamp, id) position"""
+    position = serialization.dumps_bytes([timestamp, transaction_id])
+    return base64.urlsafe_b64encode(position).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    """
+    Decode a cursor made by _encode_cursor.
+    
+    Returns:
+        tuple: (timestamp, transaction_id)
+    
+    Raises:
+        ValueError: If the cursor is invalid
+    """
+    try:
+        position = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, transaction_id = serialization.loads(position)
+        return datetime.fromisoformat(timestamp), str(transaction_id)
+    except (binascii.Error, TypeError, ValueError):
+        raise ValueError('Invalid cursor')
+
 @api_bp.route('/recent-transactions', methods=['GET'])
 def get_recent_transactions():
     """
     Get recent transactions for display in the dashboard.
+    
+    Newest first, paginated by keyset on (timestamp, id): pass the returned
+    next_cursor as cursor to get the following page. limit is capped by
+    RECENT_TRANSACTIONS_MAX_LIMIT and txn_metadata is only included with
+    include_metadata=true. Responses are cached for a few seconds and carry an
+    ETag, so conditional refreshes get a 304.
     """
     try:
-        limit = int(request.args.get('limit', 10))
-        transactions = Transaction.query.order_by(Transaction.timestamp.desc()).limit(limit).all()
+        try:
+            limit = int(request.args.get('limit', 10))
+            cursor = request.args.get('cursor') or None
+            position = _decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        limit = min(max(limit, 1), Config.RECENT_TRANSACTIONS_MAX_LIMIT)
+        include_metadata = request.args.get('include_metadata', '').lower() in ('1', 'true', 'yes')
         
-        result = {
-            'transactions': [transaction.to_dict() for transaction in transactions]
-        }
+        key = (limit, cursor, include_metadata)
+        cached = _recent_cache.get(key)
+        if cached is None:
+            columns = RECENT_COLUMNS + (('txn_metadata',) if include_metadata else ())
+            query = Transaction.query.with_entities(*[getattr(Transaction, column) for column in columns])
+            if position is not None:
+                query = query.filter(tuple_(Transaction.timestamp, Transaction.id) < position)
+            
+            # One extra row tells whether there is a next page
+            rows = query.order_by(Transaction.timestamp.desc(), Transaction.id.desc()).limit(limit + 1).all()
+            
+            transactions = []
+            for row in rows[:limit]:
+                transaction = dict(zip(columns, row))
+                if include_metadata:
+                    transaction['txn_metadata'] = row.txn_metadata or {}
+                transactions.append(transaction)
+            
+            last = rows[limit - 1] if len(rows) > limit else None
+            result = {
+                'transactions': transactions,
+                'next_cursor': _encode_cursor(last.timestamp, last.id) if last is not None else None
+            }
+            
+            body = jsonify(result).get_data()
+            cached = (body, _recent_cache.put(key, body))
         
-        return jsonify(result), 200
+        body, etag = cached
+        response = Response(body, status=200, mimetype='application/json')
+        response.set_etag(etag)
+        response.cache_control.max_age = int(Config.RECENT_TRANSACTIONS_CACHE_SECONDS)
+        return response.make_conditional(request)
         
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
\ No newline at end of file
+        return jsonify({'error': str(e)}), 500
+
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Metrics of this API process in the Prometheus text format: pipeline stage
+    latencies of inline scoring, decisions, errors and request latencies.
+    """
+    return Response(REGISTRY.render(), status=200, content_type=CONTENT_TYPE)
+
+def _check_admin_token():
+    """Error response unless the request carries ADMIN_TOKEN, None if it does"""
+    if not Config.ADMIN_TOKEN:
+        # Admin endpoints are off unless a token is configured
+        return jsonify({'error': 'Not found'}), 404
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), Config.ADMIN_TOKEN.encode()):
+        return jsonify({'error': 'Invalid admin token'}), 403
+    return None
+
+@api_bp.route('/admin/profile', methods=['POST'])
+def start_profile():
+    """
+    Profile the API process that handles this request for a few seconds.
+    
+    Optional JSON body: {"seconds": 30}. The collapsed stacks are written to
+    PROFILER_OUTPUT_DIR; GET /api/admin/profile reports progress and returns
+    them once written. Each gunicorn worker is a separate process with its
+    own profiler.
+    """
+    denied = _check_admin_token()
+    if denied is not None:
+        return denied
+    
+    seconds = (request.get_json(silent=True) or {}).get('seconds')
+    try:
+        seconds = float(seconds) if seconds is not None else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seconds must be a number'}), 400
+    
+    profiler = get_profiler()
+    if not profiler.start(seconds):
+        return jsonify({'error': 'A profile is already running', **profiler.status()}), 409
+    return jsonify(profiler.status()), 202
+
+@api_bp.route('/admin/profile', methods=['GET'])
+def get_profile():
+    """
+    Status of this process's profiler; with format=folded, the collapsed
+    stacks of its last profile as text.
+    """
+    denied = _check_admin_token()
+    if denied is not None:
+        return denied
+    
+    profiler = get_profiler()
+    status = profiler.status()
+    if request.args.get('format') != 'folded':
+        return jsonify(status), 200
+    
+    if status['last_profile'] is None:
+        return jsonify({'error': 'No profile written yet', **status}), 404
+    with open(status['last_profile']['path']) as f:
+        return Response(f.read(), status=200, mimetype='text/plain')
\ No newline at end of file
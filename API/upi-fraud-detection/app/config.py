@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file if it exists
@@ -19,6 +20,91 @@ class Config:
     # Queue names
     TRANSACTION_QUEUE = 'transactions_queue'
     
+    # Fanout exchange on which workers announce stored verdicts
+    RESULTS_EXCHANGE = 'transaction_results'
+    
+    # Waiting for verdicts: longest long-poll, longest event stream, keep-alive
+    # interval for event streams, and how often waiters re-check the database
+    # while the results listener is disconnected
+    RESULT_WAIT_MAX_SECONDS = int(os.getenv('RESULT_WAIT_MAX_SECONDS', 30))
+    RESULT_STREAM_MAX_SECONDS = int(os.getenv('RESULT_STREAM_MAX_SECONDS', 300))
+    RESULT_STREAM_KEEPALIVE_SECONDS = int(os.getenv('RESULT_STREAM_KEEPALIVE_SECONDS', 15))
+    RESULT_FALLBACK_POLL_SECONDS = float(os.getenv('RESULT_FALLBACK_POLL_SECONDS', 2))
+    
+    # Publisher: channels per API process and limits on messages awaiting delivery
+    PUBLISHER_CHANNELS = int(os.getenv('PUBLISHER_CHANNELS', 4))
+    PUBLISHER_MAX_PENDING = int(os.getenv('PUBLISHER_MAX_PENDING', 10000))
+    PUBLISHER_MAX_UNCONFIRMED = int(os.getenv('PUBLISHER_MAX_UNCONFIRMED', 1000))
+    
+    # Maximum number of transactions accepted by POST /api/transactions/batch
+    BATCH_MAX_TRANSACTIONS = int(os.getenv('BATCH_MAX_TRANSACTIONS', 5000))
+    
+    # POST /api/score: default latency budget and the largest budget a caller may ask for
+    INLINE_SCORE_DEADLINE_MS = float(os.getenv('INLINE_SCORE_DEADLINE_MS', 50))
+    INLINE_SCORE_MAX_DEADLINE_MS = float(os.getenv('INLINE_SCORE_MAX_DEADLINE_MS', 1000))
+    # Whether each API process loads its own transaction graph (GRAPH_WINDOW_DAYS of
+    # rows, in the background) for the graph stage. Memory and start-up queries
+    # scale with the number of gunicorn workers; when disabled, inline scoring
+    # stops after content analysis and queues the transaction for the worker
+    INLINE_SCORE_GRAPH = os.getenv('INLINE_SCORE_GRAPH', 'true').lower() in ('1', 'true', 'yes')
+    
+    # GET /api/recent-transactions: largest page and how long responses are cached
+    RECENT_TRANSACTIONS_MAX_LIMIT = int(os.getenv('RECENT_TRANSACTIONS_MAX_LIMIT', 100))
+    RECENT_TRANSACTIONS_CACHE_SECONDS = float(os.getenv('RECENT_TRANSACTIONS_CACHE_SECONDS', 2))
+    
+    # Worker batching: a batch size of 1 processes messages one at a time
+    WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', 1))
+    WORKER_BATCH_TIMEOUT_MS = int(os.getenv('WORKER_BATCH_TIMEOUT_MS', 50))
+    
+    # Worker supervisor: consumer processes per container, time a process gets
+    # to finish its work in hand on SIGTERM, and how often throughput is logged
+    WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', 1))
+    WORKER_SHUTDOWN_TIMEOUT_SECONDS = float(os.getenv('WORKER_SHUTDOWN_TIMEOUT_SECONDS', 30))
+    WORKER_REPORT_SECONDS = float(os.getenv('WORKER_REPORT_SECONDS', 60))
+    
+    # Worker consumer: 'blocking' (pika, one message or batch at a time) or
+    # 'async' (aio-pika, up to WORKER_ASYNC_IN_FLIGHT transactions at once, with
+    # database work on WORKER_ASYNC_DB_THREADS threads). Async pays off when
+    # database round-trips dominate, e.g. with a remote PostgreSQL server
+    WORKER_MODE = os.getenv('WORKER_MODE', 'blocking')
+    WORKER_ASYNC_IN_FLIGHT = int(os.getenv('WORKER_ASYNC_IN_FLIGHT', 32))
+    WORKER_ASYNC_DB_THREADS = int(os.getenv('WORKER_ASYNC_DB_THREADS', 4))
+    
+    # Port of the worker's Prometheus metrics listener (0 disables it). Under the
+    # supervisor, consumer process N listens on WORKER_METRICS_PORT + N
+    WORKER_METRICS_PORT = int(os.getenv('WORKER_METRICS_PORT', 9100))
+    
+    # On-demand sampling profiler (SIGUSR2 or POST /api/admin/profile): time
+    # between samples, default and longest window, and where profiles are written
+    PROFILER_INTERVAL_MS = float(os.getenv('PROFILER_INTERVAL_MS', 10))
+    PROFILER_DURATION_SECONDS = float(os.getenv('PROFILER_DURATION_SECONDS', 30))
+    PROFILER_MAX_SECONDS = float(os.getenv('PROFILER_MAX_SECONDS', 300))
+    PROFILER_OUTPUT_DIR = os.getenv('PROFILER_OUTPUT_DIR', os.path.join(tempfile.gettempdir(), 'safepay-profiles'))
+    
+    # Stored risk_details: 'full' keeps every analyzer's explanation, 'summary'
+    # only the scores, weights, decision and override reason
+    RISK_DETAILS_LEVEL = os.getenv('RISK_DETAILS_LEVEL', 'full')
+    
+    # Encoding of the risk_details and txn_metadata columns outside PostgreSQL
+    # (JSONB there): 'json' or 'msgpack', zlib-compressed from
+    # PAYLOAD_COMPRESS_MIN_BYTES (0 disables). Only choose 'msgpack' when every
+    # process reading the database has the msgpack package installed
+    PAYLOAD_CODEC = os.getenv('PAYLOAD_CODEC', 'json')
+    PAYLOAD_COMPRESS_MIN_BYTES = int(os.getenv('PAYLOAD_COMPRESS_MIN_BYTES', 256))
+    
+    # JSON encoding of API responses, queue messages and stored payloads:
+    # 'auto' (orjson when installed, else the stdlib json module) or 'json'
+    JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+    
+    # Start-up readiness checks of RabbitMQ and the database: total wait and
+    # retry delays (doubling from the initial delay up to the maximum)
+    READINESS_TIMEOUT_SECONDS = float(os.getenv('READINESS_TIMEOUT_SECONDS', 60))
+    READINESS_INITIAL_DELAY_SECONDS = float(os.getenv('READINESS_INITIAL_DELAY_SECONDS', 0.05))
+    READINESS_MAX_DELAY_SECONDS = float(os.getenv('READINESS_MAX_DELAY_SECONDS', 2))
+    
+    # Token for the /api/admin endpoints, sent as X-Admin-Token (unset disables them)
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    
     # Algorithm Configuration
     GRAPH_TEMPORAL_WEIGHT = 0.6  # Weight for graph-temporal analysis in final score
     CONTENT_ANALYSIS_WEIGHT = 0.4  # Weight for phishing/QR analysis in final score
@@ -28,6 +114,33 @@ class Config:
     MEDIUM_RISK_THRESHOLD = 0.7
     HIGH_RISK_THRESHOLD = 0.9
     
+    # In-memory transaction graph kept by the worker (0 disables catch-up queries)
+    GRAPH_WINDOW_DAYS = int(os.getenv('GRAPH_WINDOW_DAYS', 30))
+    GRAPH_SYNC_SECONDS = int(os.getenv('GRAPH_SYNC_SECONDS', 60))
+    # Catch-up queries re-read this far behind the last sync, so each row is read
+    # about (grace / sync interval) times. Rows are found by their client-supplied
+    # timestamp: one committed more than this after its timestamp (backdated, or
+    # held up in a retry) is only seen by other processes at their next bootstrap
+    GRAPH_SYNC_GRACE_SECONDS = int(os.getenv('GRAPH_SYNC_GRACE_SECONDS', 120))
+    
+    # Half-life of the time-decayed per-account statistics
+    ACCOUNT_STATS_HALF_LIFE_HOURS = float(os.getenv('ACCOUNT_STATS_HALF_LIFE_HOURS', 24 * 7))
+    
+    # Sender -> receiver distance search: hops to look for and accounts to visit at most
+    GRAPH_MAX_SEARCH_DEPTH = int(os.getenv('GRAPH_MAX_SEARCH_DEPTH', 3))
+    GRAPH_MAX_SEARCH_VISITS = int(os.getenv('GRAPH_MAX_SEARCH_VISITS', 10000))
+    
+    # Look-alike domain detection: extra protected domains (one per line) and match limits
+    PROTECTED_DOMAINS_FILE = os.getenv('PROTECTED_DOMAINS_FILE')
+    LOOKALIKE_SIMILARITY_THRESHOLD = float(os.getenv('LOOKALIKE_SIMILARITY_THRESHOLD', 0.7))
+    LOOKALIKE_MAX_EDIT_DISTANCE = int(os.getenv('LOOKALIKE_MAX_EDIT_DISTANCE', 2))
+    
+    # Domain verdict cache: SQLite file shared by the processes on a host (empty for in-memory only)
+    DOMAIN_CACHE_PATH = os.getenv('DOMAIN_CACHE_PATH', os.path.join(tempfile.gettempdir(), 'safepay-domain-verdicts.sqlite3'))
+    DOMAIN_CACHE_TTL_SECONDS = int(os.getenv('DOMAIN_CACHE_TTL_SECONDS', 3600))
+    DOMAIN_CACHE_MAX_ENTRIES = int(os.getenv('DOMAIN_CACHE_MAX_ENTRIES', 100000))
+    DOMAIN_CACHE_MEMORY_ENTRIES = int(os.getenv('DOMAIN_CACHE_MEMORY_ENTRIES', 4096))
+    
     # New account handling
     NEW_ACCOUNT_DEFAULT_RISK = 0.5
     NEW_ACCOUNT_HISTORY_THRESHOLD = 5  # Number of transactions to consider an account as "new"
\ No newline at end of file
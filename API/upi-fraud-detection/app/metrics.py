@@ -0,0 +1,299 @@
+import logging
+import math
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Histogram buckets: SUB_BUCKETS per power of two from 2^MIN_EXPONENT seconds
+# (~7.6 us) to 2^MAX_EXPONENT seconds (16 s), so every recorded latency is
+# known within 50% whatever its magnitude
+MIN_EXPONENT = -17
+MAX_EXPONENT = 4
+SUB_BUCKETS = 2
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def _bucket_bounds():
+    bounds = []
+    for exponent in range(MIN_EXPONENT, MAX_EXPONENT):
+        for sub in range(1, SUB_BUCKETS + 1):
+            bounds.append(2.0 ** exponent * (1 + sub / SUB_BUCKETS))
+    return bounds
+
+BUCKET_BOUNDS = _bucket_bounds()
+
+def _bucket_index(value):
+    """Index of the bucket holding value; len(BUCKET_BOUNDS) for overflow"""
+    if value <= 0:
+        return 0
+    # value = mantissa * 2^exponent with mantissa in [0.5, 1)
+    mantissa, exponent = math.frexp(value)
+    octave = exponent - 1 - MIN_EXPONENT
+    if octave < 0:
+        return 0
+    if octave >= MAX_EXPONENT - MIN_EXPONENT:
+        return len(BUCKET_BOUNDS)
+    return octave * SUB_BUCKETS + int((mantissa * 2 - 1) * SUB_BUCKETS)
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+class Counter:
+    """A monotonically increasing count, per combination of label values"""
+    
+    type_name = 'counter'
+    
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+    
+    def value(self, *label_values):
+        return self._values.get(label_values, 0)
+    
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {value}"
+
+class Histogram:
+    """
+    Latency distribution with logarithmic buckets, per combination of label values.
+    
+    Recording is a frexp and a list increment; the buckets have a constant
+    relative width, like an HDR histogram, so microsecond stages and
+    multi-second ones are both measured precisely.
+    """
+    
+    type_name = 'histogram'
+    
+    def __init__(self, name, help_text, label_names=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._series = {}  # label values -> [bucket counts, sum, count]
+        self._lock = threading.Lock()
+    
+    def observe(self, seconds, *label_values):
+        index = _bucket_index(seconds)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(BUCKET_BOUNDS) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += seconds
+            series[2] += 1
+    
+    def count(self, *label_values):
+        series = self._series.get(label_values)
+        return series[2] if series is not None else 0
+    
+    def quantile(self, q, *label_values):
+        """
+        Upper bound of the bucket holding the q-quantile.
+        
+        Args:
+            q (float): Quantile between 0 and 1
+        
+        Returns:
+            float: Latency in seconds, None if nothing was recorded
+        """
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None or series[2] == 0:
+                return None
+            counts, _, total = list(series[0]), series[1], series[2]
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else math.inf
+        return math.inf
+    
+    def render(self):
+        with self._lock:
+            snapshot = sorted(
+                (label_values, list(series[0]), series[1], series[2])
+                for label_values, series in self._series.items()
+            )
+        for label_values, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKET_BOUNDS, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.label_names, label_values, f'le="{bound:.6g}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, label_values, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {count}"
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {total!r}"
+            yield f"{self.name}_count{labels} {count}"
+
+class Registry:
+    """The metrics of one process, rendered in the Prometheus text format"""
+    
+    def __init__(self):
+        self._metrics = []
+    
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+    
+    def counter(self, name, help_text, label_names=()):
+        return self.register(Counter(name, help_text, label_names))
+    
+    def histogram(self, name, help_text, label_names=()):
+        return self.register(Histogram(name, help_text, label_names))
+    
+    def render(self):
+        """
+        Render every metric.
+        
+        Returns:
+            str: Prometheus text exposition format
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help_text}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+REGISTRY = Registry()
+
+# Pipeline stages: db_fetch, input, graph_build, temporal, graph_analysis,
+# content, risk, commit and ack
+STAGE_DURATION = REGISTRY.histogram(
+    'safepay_stage_duration_seconds', 'Time spent in each pipeline stage', ('stage',)
+)
+QUEUE_LAG = REGISTRY.histogram(
+    'safepay_queue_lag_seconds', 'Time between a transaction being queued and a worker receiving it'
+)
+DECISIONS = REGISTRY.counter(
+    'safepay_decisions_total', 'Transactions scored, by decision', ('decision',)
+)
+ERRORS = REGISTRY.counter(
+    'safepay_errors_total', 'Errors, by the stage that raised them', ('stage',)
+)
+VERDICT_CACHE_LOOKUPS = REGISTRY.counter(
+    'safepay_verdict_cache_lookups_total', 'Domain verdict cache lookups, by result', ('result',)
+)
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    'safepay_http_request_duration_seconds', 'API request latency', ('endpoint', 'method', 'status')
+)
+
+# Thread ID -> stage the thread is running, read by the sampling profiler
+_active_stages = {}
+
+def active_stage(thread_id):
+    """
+    Stage a thread is running.
+    
+    Args:
+        thread_id (int): threading.get_ident() of the thread
+    
+    Returns:
+        str: Stage name, None outside any stage_timer block
+    """
+    return _active_stages.get(thread_id)
+
+class _StageTimer:
+    __slots__ = ('stage', 'start', 'thread_id', 'previous')
+    
+    def __init__(self, stage):
+        self.stage = stage
+    
+    def __enter__(self):
+        self.thread_id = threading.get_ident()
+        self.previous = _active_stages.get(self.thread_id)
+        _active_stages[self.thread_id] = self.stage
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        STAGE_DURATION.observe(time.perf_counter() - self.start, self.stage)
+        if self.previous is None:
+            _active_stages.pop(self.thread_id, None)
+        else:
+            _active_stages[self.thread_id] = self.previous
+        if exc_type is not None:
+            ERRORS.inc(self.stage)
+        return False
+
+def stage_timer(stage):
+    """
+    Time a block as one pipeline stage; an exception leaving it counts as an error of that stage.
+    
+    Blocks must not await: the stage is tracked per thread, for the profiler.
+    
+    Usage:
+        with stage_timer('db_fetch'):
+            ...
+    
+    Args:
+        stage (str): Stage name
+    
+    Returns:
+        context manager
+    """
+    return _StageTimer(stage)
+
+def observe_queue_lag(enqueued_at):
+    """
+    Record the queue lag of a message.
+    
+    Args:
+        enqueued_at (float): Producer's time.time() when queuing the message, or None
+    """
+    if enqueued_at is not None:
+        # Clocks of the API and worker hosts may disagree slightly
+        QUEUE_LAG.observe(max(time.time() - enqueued_at, 0.0))
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/metrics', '/api/metrics'):
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        # Scrapes every few seconds would flood the worker log
+        pass
+
+def start_metrics_server(port, host='0.0.0.0'):
+    """
+    Serve this process's metrics on GET /metrics from a background thread.
+    
+    Args:
+        port (int): Port to listen on
+        host (str): Address to bind
+    
+    Returns:
+        ThreadingHTTPServer: The server, or None if the port could not be bound
+    """
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logging.error(f"Metrics listener could not bind port {port}: {str(e)}")
+        return None
+    
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name='metrics-listener', daemon=True)
+    thread.start()
+    logging.info(f"Serving metrics on port {port}")
+    return server
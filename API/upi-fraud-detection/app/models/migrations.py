@@ -0,0 +1,182 @@
+"""
+Bring an existing database up to date with the models.
+
+db.create_all() only creates missing tables, so indexes added to a model
+later never reach a database created before them. This adds them without
+touching the data, and drops the indexes they replace; on PostgreSQL both
+run CONCURRENTLY, so writes carry on while a large table is indexed.
+
+It also converts the JSON text written to the payload columns (risk_details,
+txn_metadata) before they became CompactJSON: to JSONB on PostgreSQL, to the
+compact binary format on SQLite. Unconverted rows stay readable, so this can
+run after deploying.
+
+Usage:
+    python -m app.models.migrations
+    python -m app.models.migrations --skip-payloads
+"""
+import argparse
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.dialects.postgresql import JSONB
+from app.models.transaction import Transaction
+from app.models.types import decode_payload, encode_payload
+
+MIGRATED_TABLES = (Transaction.__table__,)
+
+# Columns stored with CompactJSON
+PAYLOAD_COLUMNS = {
+    'transactions': ('txn_metadata', 'risk_details'),
+}
+
+# Indexes replaced by a composite index with the same leading column
+SUPERSEDED_INDEXES = {
+    'transactions': ('ix_transactions_sender_id', 'ix_transactions_receiver_id'),
+}
+
+def ensure_indexes(engine, tables=MIGRATED_TABLES):
+    """
+    Create every declared index missing from the database, then drop the
+    indexes they supersede.
+    
+    Args:
+        engine (Engine): Database engine
+        tables (iterable): Tables whose indexes to check
+    
+    Returns:
+        tuple: (names of the indexes created, names of the indexes dropped)
+    """
+    created = []
+    dropped = []
+    inspector = inspect(engine)
+    postgresql = engine.dialect.name == 'postgresql'
+    
+    for table in tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name in existing:
+                continue
+            
+            logging.info(f"Creating index {index.name} on {table.name}")
+            if postgresql:
+                # CREATE INDEX CONCURRENTLY cannot run inside a transaction
+                options = index.dialect_options['postgresql']
+                concurrently = options['concurrently']
+                options['concurrently'] = True
+                try:
+                    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                        index.create(connection)
+                finally:
+                    options['concurrently'] = concurrently
+            else:
+                with engine.begin() as connection:
+                    index.create(connection)
+            created.append(index.name)
+        
+        declared = {index.name for index in table.indexes}
+        for name in SUPERSEDED_INDEXES.get(table.name, ()):
+            if name not in existing or name in declared:
+                continue
+            
+            logging.info(f"Dropping superseded index {name} on {table.name}")
+            if postgresql:
+                with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                    connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+            else:
+                with engine.begin() as connection:
+                    connection.execute(text(f'DROP INDEX IF EXISTS "{name}"'))
+            dropped.append(name)
+    
+    return created, dropped
+
+def convert_payload_columns(engine, columns=PAYLOAD_COLUMNS, batch_size=1000):
+    """
+    Convert JSON text in the payload columns to their current storage.
+    
+    On PostgreSQL a text column is altered to JSONB in place. That rewrites
+    the table under an exclusive lock, so run it when a pause in writes is
+    acceptable. On SQLite, text rows are re-encoded in batches of batch_size,
+    each in its own transaction; VACUUM afterwards returns the space.
+    
+    Args:
+        engine (Engine): Database engine
+        columns (dict): Table name -> payload column names
+        batch_size (int): Rows re-encoded per transaction (SQLite)
+    
+    Returns:
+        dict: 'table.column' -> what was done to it; columns already converted are left out
+    """
+    converted = {}
+    inspector = inspect(engine)
+    dialect = engine.dialect.name
+    
+    for table, names in columns.items():
+        if not inspector.has_table(table):
+            continue
+        types = {column['name']: column['type'] for column in inspector.get_columns(table)}
+        
+        for name in names:
+            key = f"{table}.{name}"
+            if dialect == 'postgresql':
+                if isinstance(types[name], JSONB):
+                    continue
+                logging.info(f"Converting {key} to JSONB")
+                with engine.begin() as connection:
+                    connection.execute(text(
+                        f'ALTER TABLE "{table}" ALTER COLUMN "{name}" TYPE JSONB '
+                        f'USING NULLIF("{name}", \'\')::jsonb'
+                    ))
+                converted[key] = 'altered to JSONB'
+            elif dialect == 'sqlite':
+                count = _reencode_sqlite_column(engine, table, name, batch_size)
+                converted[key] = f"{count} rows re-encoded"
+                logging.info(f"Re-encoded {count} rows of {key}")
+            else:
+                logging.error(f"Converting {key} is not supported on {dialect}; its text rows stay readable")
+    
+    return converted
+
+def _reencode_sqlite_column(engine, table, name, batch_size):
+    """Re-encode the JSON text rows of a column, batch by batch"""
+    select = text(
+        f'SELECT rowid, "{name}" FROM "{table}" WHERE typeof("{name}") = \'text\' LIMIT :limit'
+    )
+    update = text(f'UPDATE "{table}" SET "{name}" = :value WHERE rowid = :row_id')
+    total = 0
+    while True:
+        with engine.begin() as connection:
+            rows = connection.execute(select, {'limit': batch_size}).fetchall()
+            if not rows:
+                return total
+            for row_id, value in rows:
+                payload = decode_payload(value)
+                connection.execute(update, {
+                    'row_id': row_id,
+                    'value': encode_payload(payload) if payload is not None else None
+                })
+            total += len(rows)
+
+def main():
+    from app import create_app, db
+    
+    parser = argparse.ArgumentParser(description='Bring an existing database up to date with the models')
+    parser.add_argument('--skip-payloads', action='store_true', help='Only create and drop indexes')
+    parser.add_argument('--batch-size', type=int, default=1000, help='Rows re-encoded per transaction (SQLite)')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    app = create_app()
+    with app.app_context():
+        created, dropped = ensure_indexes(db.engine)
+        converted = {} if args.skip_payloads else convert_payload_columns(db.engine, batch_size=args.batch_size)
+    
+    print(f"Created {len(created)} index(es)" + (f": {', '.join(created)}" if created else ""))
+    print(f"Dropped {len(dropped)} index(es)" + (f": {', '.join(dropped)}" if dropped else ""))
+    for key, outcome in converted.items():
+        print(f"Converted {key}: {outcome}")
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,21 @@
 from datetime import datetime
+from sqlalchemy import select, union
+from sqlalchemy.orm import defer
 from app import db
-import json
+from app.config import Config
+from app.models.types import CompactJSON
 
 class Transaction(db.Model):
     __tablename__ = 'transactions'
     
     id = db.Column(db.String(36), primary_key=True)  # UUID
-    sender_id = db.Column(db.String(50), nullable=False, index=True)
-    receiver_id = db.Column(db.String(50), nullable=False, index=True)
+    sender_id = db.Column(db.String(50), nullable=False)
+    receiver_id = db.Column(db.String(50), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow)
     
     # txn_metadata such as URL, QR code info, location, device info, etc.
-    txn_metadata = db.Column(db.Text, nullable=True)
+    txn_metadata = db.Column(CompactJSON, nullable=True)
     
     # Risk assessment results
     risk_score = db.Column(db.Float, nullable=True)
@@ -22,8 +25,8 @@ class Transaction(db.Model):
     # Decision: 'approved', 'blocked', 'pending_verification'
     status = db.Column(db.String(20), default='pending')
     
-    # Detailed risk breakdown (stored as JSON)
-    risk_details = db.Column(db.Text, nullable=True)
+    # Detailed risk breakdown, as much as RISK_DETAILS_LEVEL keeps
+    risk_details = db.Column(CompactJSON, nullable=True)
     
     # Processed flag to track if transaction has been analyzed
     processed = db.Column(db.Boolean, default=False)
@@ -32,18 +35,74 @@ class Transaction(db.Model):
     is_simulated = db.Column(db.Boolean, default=False)
     simulation_type = db.Column(db.String(50), nullable=True)
     
+    # Every history query filters on an account and then on or by timestamp.
+    # Existing databases get new indexes with: python -m app.models.migrations
+    __table_args__ = (
+        db.Index('ix_transactions_sender_id_timestamp', 'sender_id', 'timestamp'),
+        db.Index('ix_transactions_receiver_id_timestamp', 'receiver_id', 'timestamp'),
+        # Newest-first listing with keyset pagination
+        db.Index('ix_transactions_timestamp_id', 'timestamp', 'id'),
+        # Backlog of transactions still waiting for a verdict, oldest first
+        db.Index(
+            'ix_transactions_unprocessed', 'timestamp',
+            postgresql_where=(processed == False),
+            sqlite_where=(processed == False)
+        ),
+    )
+    
     def __repr__(self):
         return f"<Transaction {self.id} - {self.sender_id} to {self.receiver_id} - ${self.amount}>"
     
-    def to_dict(self):
-        """Convert transaction to dictionary"""
-        return {
+    @classmethod
+    def history_query(cls):
+        """
+        Query for history rows: the analyzers only read their amounts, parties
+        and timestamps, so txn_metadata and risk_details are not loaded.
+        
+        Returns:
+            Query: Query over Transaction
+        """
+        return cls.query.options(defer(cls.txn_metadata), defer(cls.risk_details))
+    
+    @classmethod
+    def involving(cls, account_ids, since):
+        """
+        Query for every transaction sent or received by any of the accounts since a time.
+        
+        The IDs come from a UNION of one query per column, so each side can use
+        the (sender_id, timestamp) or (receiver_id, timestamp) index; an OR
+        across both columns would force a scan. UNION also drops the duplicates
+        of transactions between two of the accounts. The rows are then read by
+        ID, so the deferred payload columns stay out of the UNION too.
+        
+        Args:
+            account_ids (iterable): Account IDs
+            since (datetime): Earliest timestamp, inclusive
+        
+        Returns:
+            Query: Query over Transaction
+        """
+        account_ids = list(dict.fromkeys(account_ids))
+        transaction_ids = union(
+            select(cls.id).where(cls.sender_id.in_(account_ids), cls.timestamp >= since),
+            select(cls.id).where(cls.receiver_id.in_(account_ids), cls.timestamp >= since)
+        )
+        return cls.history_query().filter(cls.id.in_(transaction_ids))
+    
+    def to_dict(self, include_metadata=True):
+        """
+        Convert transaction to dictionary.
+        
+        Args:
+            include_metadata (bool): Whether to include txn_metadata; leave it out
+                for rows from history_query(), where reading it costs a query per row
+        """
+        result = {
             'id': self.id,
             'sender_id': self.sender_id,
             'receiver_id': self.receiver_id,
             'amount': self.amount,
             'timestamp': self.timestamp.isoformat(),
-            'txn_metadata': json.loads(self.txn_metadata) if self.txn_metadata else {},
             'risk_score': self.risk_score,
             'status': self.status,
             'processed': self.processed,
@@ -52,11 +111,40 @@ class Transaction(db.Model):
             'is_simulated': self.is_simulated,
             'simulation_type': self.simulation_type
         }
+        if include_metadata:
+            result['txn_metadata'] = self.txn_metadata or {}
+        return result
+    
+    @staticmethod
+    def serialize_risk_details(details_dict, level=None):
+        """
+        Prepare risk details for the risk_details column.
+        
+        Args:
+            details_dict (dict): Risk details from RiskEngine.calculate_risk
+            level (str, optional): 'full' keeps every analyzer's explanation,
+                'summary' only the scores, weights, decision and override reason;
+                defaults to Config.RISK_DETAILS_LEVEL
+        
+        Returns:
+            dict: Details to store
+        """
+        if (level or Config.RISK_DETAILS_LEVEL) != 'summary':
+            return details_dict
+        
+        summary = {key: value for key, value in details_dict.items() if not isinstance(value, dict)}
+        for section in ('graph_temporal', 'content_analysis'):
+            if section in details_dict:
+                summary[section] = {
+                    key: value for key, value in details_dict[section].items() if key != 'details'
+                }
+        summary['detail_level'] = 'summary'
+        return summary
     
     def set_risk_details(self, details_dict):
-        """Store risk details as JSON string"""
-        self.risk_details = json.dumps(details_dict)
+        """Store risk details at the configured detail level"""
+        self.risk_details = self.serialize_risk_details(details_dict)
     
     def get_risk_details(self):
         """Retrieve risk details as dictionary"""
-        return json.loads(self.risk_details) if self.risk_details else {}
\ No newline at end of file
+        return self.risk_details or {}
\ No newline at end of file
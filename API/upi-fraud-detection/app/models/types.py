@@ -0,0 +1,121 @@
+import zlib
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.types import LargeBinary, TypeDecorator
+from app import serialization
+from app.config import Config
+
+try:
+    import msgpack
+except ImportError:
+    # Optional: only needed with PAYLOAD_CODEC=msgpack, which falls back to JSON without it
+    msgpack = None
+
+# First byte of a stored payload: how the rest is encoded. Rows written as
+# JSON text before this format start with '{' or '[' and are read as such.
+FORMAT_MSGPACK = 1
+FORMAT_MSGPACK_ZLIB = 2
+FORMAT_JSON = 3
+FORMAT_JSON_ZLIB = 4
+
+_COMPRESSED = {FORMAT_MSGPACK: FORMAT_MSGPACK_ZLIB, FORMAT_JSON: FORMAT_JSON_ZLIB}
+
+def encode_payload(value, codec=None, compress_min_bytes=None):
+    """
+    Encode a JSON-compatible value in the tagged binary format.
+    
+    Args:
+        value (dict or list): Value to encode
+        codec (str, optional): 'msgpack' or 'json', defaults to Config.PAYLOAD_CODEC;
+            msgpack falls back to JSON when the package is not installed
+        compress_min_bytes (int, optional): Payloads at least this long are
+            zlib-compressed when that makes them smaller, defaults to
+            Config.PAYLOAD_COMPRESS_MIN_BYTES (0 disables compression)
+    
+    Returns:
+        bytes: Format tag followed by the encoded value
+    """
+    codec = codec or Config.PAYLOAD_CODEC
+    if compress_min_bytes is None:
+        compress_min_bytes = Config.PAYLOAD_COMPRESS_MIN_BYTES
+    
+    if codec == 'msgpack' and msgpack is not None:
+        tag, body = FORMAT_MSGPACK, msgpack.packb(value, use_bin_type=True)
+    else:
+        tag, body = FORMAT_JSON, serialization.dumps_bytes(value)
+    
+    if compress_min_bytes and len(body) >= compress_min_bytes:
+        compressed = zlib.compress(body, 6)
+        if len(compressed) < len(body):
+            tag, body = _COMPRESSED[tag], compressed
+    
+    return bytes((tag,)) + body
+
+def decode_payload(data):
+    """
+    Decode a stored payload: the tagged binary format or legacy JSON text.
+    
+    Args:
+        data (bytes, memoryview or str): Column value
+    
+    Returns:
+        The decoded value
+    
+    Raises:
+        ValueError: If the format tag is unknown
+        ImportError: If the payload is msgpack and msgpack is not installed
+    """
+    if not data:
+        return None
+    if isinstance(data, str):
+        return serialization.loads(data)
+    
+    data = bytes(data)
+    tag = data[0]
+    if tag in (ord('{'), ord('[')):
+        return serialization.loads(data)
+    if tag in (FORMAT_JSON_ZLIB, FORMAT_MSGPACK_ZLIB):
+        body = zlib.decompress(data[1:])
+    else:
+        body = data[1:]
+    
+    if tag in (FORMAT_JSON, FORMAT_JSON_ZLIB):
+        return serialization.loads(body)
+    if tag in (FORMAT_MSGPACK, FORMAT_MSGPACK_ZLIB):
+        if msgpack is None:
+            raise ImportError("Stored payload is msgpack-encoded; install msgpack to read it")
+        return msgpack.unpackb(body, raw=False, strict_map_key=False)
+    raise ValueError(f"Unknown payload format {tag}")
+
+class CompactJSON(TypeDecorator):
+    """
+    A JSON document column, stored compactly.
+    
+    On PostgreSQL the column is JSONB. Elsewhere it holds encode_payload
+    bytes: JSON (or msgpack) with zlib for large documents. Reads also accept
+    the JSON text written before, so rows need not be converted before
+    deploying; python -m app.models.migrations converts them.
+    """
+    
+    impl = LargeBinary
+    cache_ok = True
+    
+    def load_dialect_impl(self, dialect):
+        if dialect.name == 'postgresql':
+            return dialect.type_descriptor(JSONB(none_as_null=True))
+        return dialect.type_descriptor(LargeBinary())
+    
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        if isinstance(value, str):
+            # JSON text from a caller written for the old Text column
+            value = serialization.loads(value)
+        if dialect.name == 'postgresql':
+            return value
+        return encode_payload(value)
+    
+    def process_result_value(self, value, dialect):
+        if value is None or isinstance(value, (dict, list)):
+            return value
+        # JSON text from a PostgreSQL column not converted to JSONB yet, or bytes
+        return decode_payload(value)
@@ -0,0 +1,166 @@
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from app.config import Config
+from app.metrics import active_stage
+
+class SamplingProfiler:
+    """
+    Samples the stacks of every thread of the process for a fixed window.
+    
+    While a window runs, a background thread reads sys._current_frames() every
+    PROFILER_INTERVAL_MS and counts each distinct stack, rooted at the pipeline
+    stage the thread was in (stage_timer) or 'none'. At the end of the window
+    the counts are written in the collapsed format of flamegraph.pl and
+    speedscope, one 'stage:<name>;frame;frame;... count' line per stack.
+    
+    When no window is running nothing is sampled and there is no thread.
+    """
+    
+    def __init__(self, output_dir=None, interval_ms=None):
+        """
+        Initialize the profiler.
+        
+        Args:
+            output_dir (str, optional): Directory for profiles, defaults to Config.PROFILER_OUTPUT_DIR
+            interval_ms (float, optional): Time between samples, defaults to Config.PROFILER_INTERVAL_MS
+        """
+        self.output_dir = output_dir or Config.PROFILER_OUTPUT_DIR
+        self.interval = (interval_ms or Config.PROFILER_INTERVAL_MS) / 1000
+        # Reentrant: start() also runs from a signal handler on the main thread
+        self._lock = threading.RLock()
+        self._thread = None
+        self._deadline = None
+        self.last_profile = None
+    
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, seconds=None):
+        """
+        Start a profiling window, unless one is already running.
+        
+        Args:
+            seconds (float, optional): Length of the window, defaults to
+                Config.PROFILER_DURATION_SECONDS and is capped by Config.PROFILER_MAX_SECONDS
+        
+        Returns:
+            bool: Whether a window was started
+        """
+        seconds = min(seconds or Config.PROFILER_DURATION_SECONDS, Config.PROFILER_MAX_SECONDS)
+        with self._lock:
+            if self.running:
+                return False
+            self._deadline = time.monotonic() + seconds
+            self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+            self._thread.start()
+        
+        logging.info(f"Profiling process {os.getpid()} for {seconds:.0f} seconds")
+        return True
+    
+    def status(self):
+        """
+        Returns:
+            dict: Whether a window is running, seconds left and the last profile written
+        """
+        return {
+            'pid': os.getpid(),
+            'running': self.running,
+            'seconds_left': max(self._deadline - time.monotonic(), 0) if self.running else 0,
+            'last_profile': self.last_profile
+        }
+    
+    def _run(self):
+        own_thread = threading.get_ident()
+        stacks = Counter()
+        samples = 0
+        started = time.monotonic()
+        
+        try:
+            while time.monotonic() < self._deadline:
+                for thread_id, frame in sys._current_frames().items():
+                    if thread_id != own_thread:
+                        stacks[self._collapse(thread_id, frame)] += 1
+                samples += 1
+                time.sleep(self.interval)
+            
+            self.last_profile = self._write(stacks, samples, time.monotonic() - started)
+            logging.info(f"Profile written to {self.last_profile['path']} ({samples} samples)")
+        except Exception as e:
+            logging.error(f"Error profiling process {os.getpid()}: {str(e)}")
+    
+    @staticmethod
+    def _collapse(thread_id, frame):
+        """One line of the collapsed format for a thread's stack, root first"""
+        frames = []
+        while frame is not None:
+            code = frame.f_code
+            # Last two path components tell app/api/routes.py from app/rabbitmq/consumer.py
+            filename = '/'.join(code.co_filename.replace('\\', '/').rsplit('/', 2)[-2:])
+            frames.append(f"{code.co_name} ({filename}:{code.co_firstlineno})")
+            frame = frame.f_back
+        frames.append(f"stage:{active_stage(thread_id) or 'none'}")
+        # Semicolons separate frames; the count follows the last space
+        return ';'.join(label.replace(';', ',') for label in reversed(frames))
+    
+    def _write(self, stacks, samples, seconds):
+        os.makedirs(self.output_dir, exist_ok=True)
+        name = f"profile-{os.getpid()}-{datetime.utcnow().strftime('%Y%m%d-%H%M%S')}.folded"
+        path = os.path.join(self.output_dir, name)
+        with open(path, 'w') as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        
+        stages = Counter()
+        for stack, count in stacks.items():
+            stages[stack.split(';', 1)[0][len('stage:'):]] += count
+        
+        return {
+            'path': path,
+            'samples': samples,
+            'seconds': round(seconds, 1),
+            'stages': dict(stages.most_common())
+        }
+
+_profiler = None
+_profiler_pid = None
+_profiler_lock = threading.Lock()
+
+def get_profiler():
+    """
+    Return the profiler for the current process, creating it on first use.
+    
+    Returns:
+        SamplingProfiler: The process-wide profiler
+    """
+    global _profiler, _profiler_pid
+    
+    # A forked process samples its own threads
+    if _profiler is None or _profiler_pid != os.getpid():
+        with _profiler_lock:
+            if _profiler is None or _profiler_pid != os.getpid():
+                _profiler = SamplingProfiler()
+                _profiler_pid = os.getpid()
+    
+    return _profiler
+
+def install_signal_handler(signum=signal.SIGUSR2):
+    """
+    Start a profiling window of PROFILER_DURATION_SECONDS when the process receives signum.
+    
+    Must be called from the main thread.
+    
+    Args:
+        signum (int): Signal to handle, SIGUSR2 by default
+    """
+    def handler(signum, frame):
+        if not get_profiler().start():
+            logging.info("Profiler already running; signal ignored")
+    
+    signal.signal(signum, handler)
@@ -0,0 +1,268 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app import db, serialization
+from app.config import Config
+from app.models.transaction import Transaction
+from app.algorithm.feature_context import TransactionContext
+from app.metrics import ERRORS, STAGE_DURATION, observe_queue_lag, stage_timer
+from app.rabbitmq.consumer import result_message, score_transaction, stop_requested
+from app.runtime import get_runtime
+
+def _import_aio_pika():
+    # Only the async worker mode needs aio-pika
+    try:
+        import aio_pika
+    except ImportError as e:
+        raise ImportError("WORKER_MODE=async requires aio-pika (pip install aio-pika)") from e
+    return aio_pika
+
+class AsyncTransactionPipeline:
+    """
+    Scores transactions with database work and scoring overlapped.
+    
+    Each transaction goes through three steps: load it (with its history
+    window when the analyzers read one), score it, store the result. Loads and stores run on a pool of database
+    threads, so the round-trips of many transactions overlap; scoring runs on
+    a single thread, because the analyzers and the in-memory transaction graph
+    are not thread-safe, and never waits for the database.
+    """
+    
+    def __init__(self, runtime, db_threads=None):
+        """
+        Initialize the pipeline.
+        
+        Args:
+            runtime (WorkerRuntime): Runtime holding the analyzers
+            db_threads (int, optional): Threads for database work, defaults to
+                Config.WORKER_ASYNC_DB_THREADS
+        """
+        self.runtime = runtime
+        self.db_executor = ThreadPoolExecutor(
+            max_workers=db_threads or Config.WORKER_ASYNC_DB_THREADS,
+            thread_name_prefix='pipeline-db'
+        )
+        self.score_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pipeline-score')
+    
+    def _load(self, transaction_id):
+        """Load a transaction and the history rows scoring will read (database thread)"""
+        with self.runtime.app.app_context(), stage_timer('db_fetch'):
+            transaction = Transaction.query.get(transaction_id)
+            if transaction is None:
+                return None
+            
+            context = TransactionContext(
+                transaction,
+                include_window=self.runtime.graph_temporal.needs_history_window
+            )
+            # With the in-memory stores the analyzers read no history at all;
+            # user_data stays lazy and only queries if a stage reads it
+            if context.include_window:
+                context.window_transactions()
+            return transaction, context
+    
+    def _score(self, transaction, context):
+        """Score a loaded transaction (scoring thread)"""
+        # The in-memory graph may run its periodic catch-up query from here
+        with self.runtime.app.app_context():
+            return score_transaction(transaction, self.runtime, context)
+    
+    def _store(self, result):
+        """Write a result back to its transaction (database thread)"""
+        with self.runtime.app.app_context():
+            try:
+                with stage_timer('commit'):
+                    db.session.bulk_update_mappings(Transaction, [result])
+                    db.session.commit()
+            except Exception:
+                db.session.rollback()
+                raise
+    
+    async def process(self, transaction_id):
+        """
+        Score and store one transaction.
+        
+        Args:
+            transaction_id (str): The ID of the transaction to process
+        
+        Returns:
+            dict: The stored column values, or None if the transaction does not exist
+        """
+        loop = asyncio.get_running_loop()
+        
+        loaded = await loop.run_in_executor(self.db_executor, self._load, transaction_id)
+        if loaded is None:
+            logging.error(f"Transaction {transaction_id} not found in database")
+            return None
+        
+        result = await loop.run_in_executor(self.score_executor, self._score, *loaded)
+        await loop.run_in_executor(self.db_executor, self._store, result)
+        
+        logging.info(f"Transaction {transaction_id} processed successfully. Risk score: {result['risk_score']}, Decision: {result['status']}")
+        return result
+    
+    def shutdown(self):
+        """Wait for queued work and stop the threads"""
+        self.score_executor.shutdown(wait=True)
+        self.db_executor.shutdown(wait=True)
+
+class AsyncConsumer:
+    """
+    aio-pika consumer that keeps several transactions in flight.
+    
+    The broker's prefetch limit bounds the transactions in flight: up to
+    in_flight messages are delivered unacknowledged, each handled by its own
+    task through AsyncTransactionPipeline, and acknowledged once its result is
+    stored. Like the blocking consumer, a transaction that fails to score is
+    logged and its message acknowledged, leaving the transaction unprocessed.
+    
+    After request_stop(), the consumer stops receiving, lets the transactions
+    in flight finish and be acknowledged, and returns.
+    """
+    
+    def __init__(self, runtime=None, in_flight=None, db_threads=None, on_processed=None):
+        """
+        Initialize the consumer.
+        
+        Args:
+            runtime (WorkerRuntime, optional): Runtime to use, defaults to the process-wide one
+            in_flight (int, optional): Maximum unacknowledged messages, defaults to
+                Config.WORKER_ASYNC_IN_FLIGHT
+            db_threads (int, optional): Threads for database work
+            on_processed (callable, optional): Called with the number of messages
+                acknowledged, after each message
+        """
+        self.runtime = runtime or get_runtime()
+        self.in_flight = in_flight or Config.WORKER_ASYNC_IN_FLIGHT
+        self.pipeline = AsyncTransactionPipeline(self.runtime, db_threads)
+        self.on_processed = on_processed
+        self.queue_name = os.getenv('TRANSACTION_QUEUE', Config.TRANSACTION_QUEUE)
+        self._exchange = None
+        self._tasks = set()
+    
+    async def _connect(self, aio_pika):
+        """Connect with the blocking consumer's retry policy; None if RabbitMQ stays unreachable"""
+        max_retries = 5
+        retry_count = 0
+        
+        while retry_count < max_retries and not stop_requested():
+            try:
+                # connect_robust also reconnects and restores the consumer after a drop
+                return await aio_pika.connect_robust(
+                    host=Config.RABBITMQ_HOST,
+                    port=Config.RABBITMQ_PORT,
+                    login=Config.RABBITMQ_USER,
+                    password=Config.RABBITMQ_PASS,
+                    virtualhost=Config.RABBITMQ_VHOST,
+                    heartbeat=600
+                )
+            except Exception as e:
+                retry_count += 1
+                wait_time = 5 * retry_count
+                logging.error(f"Connection to RabbitMQ failed (attempt {retry_count}/{max_retries}): {str(e)}. Retrying in {wait_time} seconds...")
+                await asyncio.sleep(wait_time)
+        
+        if not stop_requested():
+            logging.critical("Failed to connect to RabbitMQ after maximum retry attempts")
+        return None
+    
+    async def run(self):
+        """Consume until request_stop() is called or RabbitMQ stays unreachable"""
+        aio_pika = _import_aio_pika()
+        
+        connection = await self._connect(aio_pika)
+        if connection is None:
+            return
+        
+        try:
+            channel = await connection.channel()
+            await channel.set_qos(prefetch_count=self.in_flight)
+            queue = await channel.declare_queue(self.queue_name, durable=True)
+            self._exchange = await channel.declare_exchange(
+                Config.RESULTS_EXCHANGE, aio_pika.ExchangeType.FANOUT, durable=True
+            )
+            
+            consumer_tag = await queue.consume(self._on_message)
+            logging.info(f"Async consumer started ({self.in_flight} in flight). Waiting for messages on queue: {self.queue_name}")
+            
+            while not stop_requested():
+                await asyncio.sleep(0.5)
+            
+            # Stop deliveries, then let the transactions in flight finish
+            await queue.cancel(consumer_tag)
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            logging.info("Consumer stopped")
+        finally:
+            await connection.close()
+            self.pipeline.shutdown()
+    
+    async def _on_message(self, message):
+        task = asyncio.ensure_future(self._handle(message))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+    
+    async def _handle(self, message):
+        if stop_requested():
+            # Shutting down: hand the message back instead of starting it
+            await message.nack(requeue=True)
+            return
+        
+        try:
+            body = serialization.loads(message.body)
+            observe_queue_lag(body.get('enqueued_at'))
+            transaction_id = body.get('transaction_id')
+        except Exception as e:
+            logging.error(f"Dropping malformed message: {str(e)}")
+            ERRORS.inc('message')
+            transaction_id = None
+        
+        if transaction_id:
+            try:
+                result = await self.pipeline.process(transaction_id)
+                if result is not None:
+                    await self._announce(result)
+            except Exception as e:
+                logging.error(f"Error processing transaction {transaction_id}: {str(e)}")
+        
+        # Not stage_timer: other tasks run on this thread while the ack is awaited
+        start = time.perf_counter()
+        await message.ack()
+        STAGE_DURATION.observe(time.perf_counter() - start, 'ack')
+        if self.on_processed is not None:
+            self.on_processed(1)
+    
+    async def _announce(self, result):
+        """Announce a stored verdict on the results exchange; failures are only logged"""
+        aio_pika = _import_aio_pika()
+        try:
+            await self._exchange.publish(
+                aio_pika.Message(body=result_message(result), content_type='application/json'),
+                routing_key=''
+            )
+        except Exception as e:
+            logging.error(f"Error announcing result for transaction {result['id']}: {str(e)}")
+            ERRORS.inc('announce')
+
+def start_async_consumer(in_flight=None, db_threads=None, on_processed=None):
+    """
+    Start the asyncio consumer to process transactions.
+    
+    Args:
+        in_flight (int, optional): Maximum transactions in flight, defaults to
+            Config.WORKER_ASYNC_IN_FLIGHT
+        db_threads (int, optional): Threads for database work, defaults to
+            Config.WORKER_ASYNC_DB_THREADS
+        on_processed (callable, optional): Called with the number of messages
+            acknowledged, after each message
+    """
+    # Fail before the warmup if aio-pika is missing
+    _import_aio_pika()
+    
+    # Build the app, engine and analyzers once for the lifetime of the process
+    runtime = get_runtime()
+    runtime.warmup()
+    
+    asyncio.run(AsyncConsumer(runtime, in_flight, db_threads, on_processed).run())
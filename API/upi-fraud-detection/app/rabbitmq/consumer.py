@@ -1,85 +1,344 @@
 import pika
-import json
 import logging
 import os
+import threading
 import time
-from app import create_app, db
+from app import db, serialization
+from app.config import Config
 from app.models.transaction import Transaction
 from app.algorithm.input_processor import process_transaction_input
-from app.algorithm.graph_temporal import GraphTemporalAnalyzer
-from app.algorithm.content_analyzer import ContentAnalyzer
-from app.algorithm.risk_engine import RiskEngine
+from app.algorithm.feature_context import TransactionContext
+from app.metrics import DECISIONS, ERRORS, observe_queue_lag, stage_timer
+from app.runtime import get_runtime
 
-def process_transaction(transaction_id):
+# Set by request_stop(): consumers finish the work in hand, acknowledge it and return
+_stop_requested = threading.Event()
+
+def request_stop():
+    """
+    Ask the consumer in this process to shut down gracefully.
+    
+    Only sets a flag, so it is safe to call from a signal handler. The message
+    or batch being processed is finished and acknowledged; messages prefetched
+    but not started are returned to the queue when the channel closes.
+    """
+    _stop_requested.set()
+
+def stop_requested():
+    """Whether request_stop() has been called in this process"""
+    return _stop_requested.is_set()
+
+def score_transaction(transaction, runtime, context=None):
+    """
+    Run a loaded transaction through the fraud detection pipeline.
+    
+    Args:
+        transaction (Transaction): The transaction to score
+        runtime (WorkerRuntime): Runtime holding the analyzers
+        context (TransactionContext, optional): History rows already loaded
+            for the transaction, created here when omitted
+        
+    Returns:
+        dict: Column values to store on the transaction
+    """
+    # History rows are fetched once and shared by the stages below
+    if context is None:
+        context = TransactionContext(
+            transaction,
+            include_window=runtime.graph_temporal.needs_history_window
+        )
+    
+    # Step 1: Process input
+    with stage_timer('input'):
+        user_data, transaction_data = process_transaction_input(transaction, context)
+    
+    # Step 2: Run graph-temporal analysis (timed per stage inside analyze)
+    graph_temporal_score, graph_temporal_details = runtime.graph_temporal.analyze(
+        transaction.sender_id, 
+        transaction.receiver_id, 
+        transaction.amount,
+        transaction.timestamp,
+        transaction.id,
+        context
+    )
+    
+    # Step 3: Run content analysis (phishing/QR code detection)
+    with stage_timer('content'):
+        content_analysis_score, content_analysis_details = runtime.content_analyzer.analyze(transaction_data)
+    
+    # Step 4: Run risk engine for final decision
+    with stage_timer('risk'):
+        risk_score, decision, risk_details = runtime.risk_engine.calculate_risk(
+            graph_temporal_score, 
+            content_analysis_score,
+            transaction_data,
+            graph_temporal_details,
+            content_analysis_details
+        )
+    DECISIONS.inc(decision)
+    
+    return {
+        'id': transaction.id,
+        'graph_temporal_score': graph_temporal_score,
+        'content_analysis_score': content_analysis_score,
+        'risk_score': risk_score,
+        'status': decision,
+        'processed': True,
+        'risk_details': Transaction.serialize_risk_details(risk_details)
+    }
+
+def result_message(result):
+    """
+    Encode a stored verdict for the results exchange.
+    
+    Args:
+        result (dict): Column values returned by score_transaction
+        
+    Returns:
+        bytes: JSON message
+    """
+    return serialization.dumps_bytes({
+        'transaction_id': result['id'],
+        'status': result['status'],
+        'risk_score': result['risk_score'],
+        'graph_temporal_score': result['graph_temporal_score'],
+        'content_analysis_score': result['content_analysis_score']
+    })
+
+def publish_results(channel, results):
+    """
+    Announce stored verdicts on the results exchange, so API processes can
+    wake up clients waiting for them. Failures are logged and not retried;
+    waiters fall back to reading the database.
+    
+    Args:
+        channel (BlockingChannel): Channel to publish on
+        results (list): Column values returned by score_transaction
+    """
+    properties = pika.BasicProperties(content_type='application/json')
+    for result in results:
+        try:
+            channel.basic_publish(
+                exchange=Config.RESULTS_EXCHANGE,
+                routing_key='',
+                body=result_message(result),
+                properties=properties
+            )
+        except Exception as e:
+            logging.error(f"Error announcing result for transaction {result['id']}: {str(e)}")
+            ERRORS.inc('announce')
+            return
+
+def process_transaction(transaction_id, runtime=None, notify=None):
     """
     Process a transaction through the fraud detection pipeline.
     
     Args:
         transaction_id (str): The ID of the transaction to process
+        runtime (WorkerRuntime, optional): Runtime to use, defaults to the process-wide one
+        notify (callable, optional): Called with the list of stored results after the commit
     """
-    app = create_app()
-    with app.app_context():
+    if runtime is None:
+        runtime = get_runtime()
+    
+    with runtime.app.app_context():
         try:
             # Retrieve transaction from database
-            transaction = Transaction.query.get(transaction_id)
+            with stage_timer('db_fetch'):
+                transaction = Transaction.query.get(transaction_id)
             if not transaction:
                 logging.error(f"Transaction {transaction_id} not found in database")
                 return
             
             logging.info(f"Processing transaction {transaction_id}")
             
-            # Step 1: Process input
-            user_data, transaction_data = process_transaction_input(transaction)
-            
-            # Step 2: Run graph-temporal analysis
-            graph_temporal = GraphTemporalAnalyzer()
-            graph_temporal_score, graph_temporal_details = graph_temporal.analyze(
-                transaction.sender_id, 
-                transaction.receiver_id, 
-                transaction.amount,
-                transaction.timestamp
-            )
-            
-            # Step 3: Run content analysis (phishing/QR code detection)
-            content_analyzer = ContentAnalyzer()
-            content_analysis_score, content_analysis_details = content_analyzer.analyze(transaction_data)
-            
-            # Step 4: Run risk engine for final decision
-            risk_engine = RiskEngine()
-            risk_score, decision, risk_details = risk_engine.calculate_risk(
-                graph_temporal_score, 
-                content_analysis_score,
-                transaction_data,
-                graph_temporal_details,
-                content_analysis_details
-            )
+            result = score_transaction(transaction, runtime)
             
             # Update transaction with results
-            transaction.graph_temporal_score = graph_temporal_score
-            transaction.content_analysis_score = content_analysis_score
-            transaction.risk_score = risk_score
-            transaction.status = decision
-            transaction.processed = True
-            transaction.set_risk_details(risk_details)
+            for column, value in result.items():
+                setattr(transaction, column, value)
             
             # Save to database
-            db.session.commit()
+            with stage_timer('commit'):
+                db.session.commit()
+            
+            logging.info(f"Transaction {transaction_id} processed successfully. Risk score: {result['risk_score']}, Decision: {result['status']}")
             
-            logging.info(f"Transaction {transaction_id} processed successfully. Risk score: {risk_score}, Decision: {decision}")
+            if notify is not None:
+                notify([result])
             
         except Exception as e:
             logging.error(f"Error processing transaction {transaction_id}: {str(e)}")
             db.session.rollback()
 
-def start_consumer():
+def process_transactions_batch(transaction_ids, runtime=None, notify=None):
+    """
+    Process several transactions with one read and one commit.
+    
+    All referenced transactions are loaded with a single IN (...) query and the
+    results are written back with one bulk update. A transaction that fails to
+    score is logged and left unprocessed; the rest of the batch is still stored.
+    
+    Args:
+        transaction_ids (list): IDs of the transactions to process
+        runtime (WorkerRuntime, optional): Runtime to use, defaults to the process-wide one
+        notify (callable, optional): Called with the list of stored results after the commit
+        
+    Returns:
+        int: Number of transactions that were scored and stored
+        
+    Raises:
+        Exception: If the batch could not be committed
+    """
+    if runtime is None:
+        runtime = get_runtime()
+    
+    with runtime.app.app_context():
+        try:
+            # Retrieve all transactions of the batch at once
+            with stage_timer('db_fetch'):
+                transactions = Transaction.query.filter(Transaction.id.in_(transaction_ids)).all()
+            
+            found = {transaction.id for transaction in transactions}
+            for transaction_id in transaction_ids:
+                if transaction_id not in found:
+                    logging.error(f"Transaction {transaction_id} not found in database")
+            
+            results = []
+            for transaction in transactions:
+                try:
+                    results.append(score_transaction(transaction, runtime))
+                except Exception as e:
+                    logging.error(f"Error processing transaction {transaction.id}: {str(e)}")
+            
+            # Store every result with one bulk update and a single commit
+            with stage_timer('commit'):
+                if results:
+                    db.session.bulk_update_mappings(Transaction, results)
+                db.session.commit()
+            
+            logging.info(f"Batch of {len(transaction_ids)} messages processed, {len(results)} transactions stored")
+            
+            if notify is not None and results:
+                notify(results)
+            return len(results)
+            
+        except Exception as e:
+            logging.error(f"Error processing transaction batch: {str(e)}")
+            db.session.rollback()
+            raise
+
+def consume_batches(channel, queue_name, runtime, batch_size, batch_timeout_ms, on_processed=None):
+    """
+    Consume messages in micro-batches until the channel is closed or a stop
+    is requested.
+    
+    A batch is flushed when it holds batch_size messages or when
+    batch_timeout_ms have passed since its first message, whichever comes first.
+    The whole batch is then acknowledged with a single multiple=True ack.
+    
+    Args:
+        channel (BlockingChannel): Channel to consume from
+        queue_name (str): Queue holding transaction messages
+        runtime (WorkerRuntime): Runtime holding the analyzers
+        batch_size (int): Maximum number of messages per batch
+        batch_timeout_ms (int): Maximum time to wait for a batch to fill up
+        on_processed (callable, optional): Called with the number of messages
+            acknowledged after each batch
+    """
+    batch_timeout = batch_timeout_ms / 1000.0
+    transaction_ids = []
+    last_delivery_tag = None
+    deadline = None
+    
+    def flush():
+        try:
+            process_transactions_batch(
+                transaction_ids, runtime,
+                notify=lambda results: publish_results(channel, results)
+            )
+            with stage_timer('ack'):
+                channel.basic_ack(delivery_tag=last_delivery_tag, multiple=True)
+            if on_processed is not None:
+                on_processed(message_count)
+        except Exception as e:
+            logging.error(f"Error in batch consumer: {str(e)}")
+            # Reject the whole batch and requeue it
+            channel.basic_nack(delivery_tag=last_delivery_tag, multiple=True, requeue=True)
+    
+    message_count = 0
+    for method, properties, body in channel.consume(queue_name, inactivity_timeout=batch_timeout):
+        if _stop_requested.is_set():
+            # Finish the batch in hand; a delivery just received is left
+            # unacknowledged and goes back to the queue with the channel
+            if transaction_ids:
+                flush()
+            elif last_delivery_tag is not None:
+                channel.basic_ack(delivery_tag=last_delivery_tag, multiple=True)
+            channel.cancel()
+            return
+        
+        if method is not None:
+            message_count += 1
+            try:
+                # Parse message
+                message = serialization.loads(body)
+                observe_queue_lag(message.get('enqueued_at'))
+                transaction_id = message.get('transaction_id')
+                if transaction_id:
+                    transaction_ids.append(transaction_id)
+            except Exception as e:
+                logging.error(f"Dropping malformed message: {str(e)}")
+                ERRORS.inc('message')
+            
+            last_delivery_tag = method.delivery_tag
+            if deadline is None:
+                deadline = time.monotonic() + batch_timeout
+        
+        # Flush when full, when the batch timed out, or when the queue went idle
+        if last_delivery_tag is not None and (
+            len(transaction_ids) >= batch_size or
+            method is None or
+            time.monotonic() >= deadline
+        ):
+            if transaction_ids:
+                flush()
+            else:
+                channel.basic_ack(delivery_tag=last_delivery_tag, multiple=True)
+            
+            transaction_ids = []
+            last_delivery_tag = None
+            deadline = None
+            message_count = 0
+
+def start_consumer(batch_size=None, batch_timeout_ms=None, on_processed=None):
     """
     Start the RabbitMQ consumer to process transactions.
+    
+    Runs until request_stop() is called or RabbitMQ stays unreachable.
+    
+    Args:
+        batch_size (int, optional): Messages per batch, defaults to Config.WORKER_BATCH_SIZE.
+            A batch size of 1 processes messages one at a time.
+        batch_timeout_ms (int, optional): Maximum wait for a batch to fill up,
+            defaults to Config.WORKER_BATCH_TIMEOUT_MS
+        on_processed (callable, optional): Called with the number of messages
+            acknowledged, after each message or batch
     """
+    if batch_size is None:
+        batch_size = Config.WORKER_BATCH_SIZE
+    if batch_timeout_ms is None:
+        batch_timeout_ms = Config.WORKER_BATCH_TIMEOUT_MS
+    
+    # Build the app, engine and analyzers once for the lifetime of the process
+    runtime = get_runtime()
+    runtime.warmup()
+    
     # Number of connection attempts
     max_retries = 5
     retry_count = 0
     
-    while retry_count < max_retries:
+    while retry_count < max_retries and not _stop_requested.is_set():
         try:
             # RabbitMQ connection parameters
             host = os.getenv('RABBITMQ_HOST', 'localhost') 
@@ -104,22 +363,46 @@ def start_consumer():
             queue_name = os.getenv('TRANSACTION_QUEUE', 'transactions_queue')
             channel.queue_declare(queue=queue_name, durable=True)
             
+            # Declare the exchange verdicts are announced on
+            channel.exchange_declare(exchange=Config.RESULTS_EXCHANGE, exchange_type='fanout', durable=True)
+            
             # Set prefetch count to limit number of unacknowledged messages
-            channel.basic_qos(prefetch_count=1)
+            channel.basic_qos(prefetch_count=batch_size)
+            
+            if batch_size > 1:
+                logging.info(f"Batch consumer started (batch size {batch_size}, timeout {batch_timeout_ms} ms). Waiting for messages on queue: {queue_name}")
+                consume_batches(channel, queue_name, runtime, batch_size, batch_timeout_ms, on_processed)
+                if _stop_requested.is_set():
+                    connection.close()
+                    logging.info("Consumer stopped")
+                    return
+                continue
             
             # Define callback function for incoming messages
             def callback(ch, method, properties, body):
+                if _stop_requested.is_set():
+                    # Shutting down: hand the message back instead of starting it
+                    ch.basic_nack(delivery_tag=method.delivery_tag, requeue=True)
+                    return
+                
                 try:
                     # Parse message
-                    message = json.loads(body)
+                    message = serialization.loads(body)
+                    observe_queue_lag(message.get('enqueued_at'))
                     transaction_id = message.get('transaction_id')
                     
                     if transaction_id:
                         # Process the transaction
-                        process_transaction(transaction_id)
+                        process_transaction(
+                            transaction_id, runtime,
+                            notify=lambda results: publish_results(ch, results)
+                        )
                         
                     # Acknowledge the message
-                    ch.basic_ack(delivery_tag=method.delivery_tag)
+                    with stage_timer('ack'):
+                        ch.basic_ack(delivery_tag=method.delivery_tag)
+                    if on_processed is not None:
+                        on_processed(1)
                     
                 except Exception as e:
                     logging.error(f"Error in consumer callback: {str(e)}")
@@ -130,7 +413,13 @@ def start_consumer():
             channel.basic_consume(queue=queue_name, on_message_callback=callback)
             
             logging.info(f"Consumer started. Waiting for messages on queue: {queue_name}")
-            channel.start_consuming()
+            
+            # Like start_consuming(), but checks for a stop request every second
+            while not _stop_requested.is_set():
+                connection.process_data_events(time_limit=1)
+            connection.close()
+            logging.info("Consumer stopped")
+            return
             
         except pika.exceptions.AMQPConnectionError as e:
             retry_count += 1
@@ -143,4 +432,21 @@ def start_consumer():
             retry_count += 1
             time.sleep(5)
     
-    logging.critical("Failed to connect to RabbitMQ after maximum retry attempts")
\ No newline at end of file
+    logging.critical("Failed to connect to RabbitMQ after maximum retry attempts")
+
+def run_consumer(mode=None, on_processed=None):
+    """
+    Start the consumer for the configured worker mode.
+    
+    Args:
+        mode (str, optional): 'blocking' or 'async', defaults to Config.WORKER_MODE
+        on_processed (callable, optional): Called with the number of messages acknowledged
+    """
+    mode = mode or Config.WORKER_MODE
+    if mode == 'async':
+        from app.rabbitmq.async_consumer import start_async_consumer
+        start_async_consumer(on_processed=on_processed)
+    elif mode == 'blocking':
+        start_consumer(on_processed=on_processed)
+    else:
+        raise ValueError(f"Unknown worker mode: {mode}")
\ No newline at end of file
@@ -1,12 +1,16 @@
 import pika
-import json
 import logging
-from flask import current_app
+import atexit
 import os
+import queue
+import threading
+import time
+from app import serialization
+from app.config import Config
 
-def get_rabbitmq_connection():
+def get_connection_parameters():
     """
-    Create and return a connection to RabbitMQ.
+    Build the RabbitMQ connection parameters from the environment.
     """
     # Get configuration from environment or use default
     host = os.getenv('RABBITMQ_HOST', 'localhost') 
@@ -16,55 +20,374 @@ def get_rabbitmq_connection():
     
     # Set up credentials and parameters
     credentials = pika.PlainCredentials(user, password)
-    parameters = pika.ConnectionParameters(
+    return pika.ConnectionParameters(
         host=host,
         port=port,
         credentials=credentials,
         heartbeat=600,
         blocked_connection_timeout=300
     )
-    
+
+def get_rabbitmq_connection():
+    """
+    Create and return a connection to RabbitMQ.
+    """
     # Create and return the connection
-    connection = pika.BlockingConnection(parameters)
+    connection = pika.BlockingConnection(get_connection_parameters())
     return connection
 
+class TransactionPublisher:
+    """
+    Long-lived, per-process publisher for transaction messages.
+    
+    Callers only put the message on an in-memory outbox. A background I/O thread
+    owns a single connection with a pool of channels in confirm mode, declares the
+    queue once per connection and publishes the outbox round-robin across the
+    channels. Broker confirms are handled asynchronously: messages that are
+    nacked, or still unconfirmed when a channel or the connection drops, go back
+    on the outbox and are published again after reconnecting.
+    """
+    
+    def __init__(self, queue_name=None, channel_count=None, max_pending=None, max_unconfirmed=None):
+        """
+        Initialize the publisher. The I/O thread is started by start().
+        
+        Args:
+            queue_name (str, optional): Queue to publish to
+            channel_count (int, optional): Number of channels in the pool
+            max_pending (int, optional): Capacity of the in-memory outbox
+            max_unconfirmed (int, optional): Maximum messages awaiting a broker confirm
+        """
+        self.queue_name = queue_name or os.getenv('TRANSACTION_QUEUE', 'transactions_queue')
+        self.channel_count = channel_count or Config.PUBLISHER_CHANNELS
+        self.max_pending = max_pending or Config.PUBLISHER_MAX_PENDING
+        self.max_unconfirmed = max_unconfirmed or Config.PUBLISHER_MAX_UNCONFIRMED
+        
+        self._outbox = queue.Queue()
+        self._connection = None
+        self._channels = []  # Channels that are open and in confirm mode
+        self._next_channel = 0
+        self._unconfirmed = {}  # channel number -> {delivery tag: body}
+        self._delivery_tags = {}  # channel number -> last delivery tag
+        self._queue_declared = False
+        
+        # Messages accepted by publish() and not yet confirmed by the broker
+        self._in_flight = 0
+        self._in_flight_cond = threading.Condition()
+        
+        self._properties = pika.BasicProperties(
+            delivery_mode=2,  # make message persistent
+            content_type='application/json'
+        )
+        
+        self._thread = None
+        self._stopping = False
+    
+    def start(self):
+        """Start the background I/O thread"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='transaction-publisher', daemon=True)
+            self._thread.start()
+    
+    def publish(self, body):
+        """
+        Enqueue a message body for publishing.
+        
+        Args:
+            body (bytes): Encoded message
+        
+        Raises:
+            queue.Full: If too many messages are pending, e.g. because the broker has been unreachable
+        """
+        with self._in_flight_cond:
+            if self._in_flight >= self.max_pending:
+                raise queue.Full(f"{self._in_flight} messages are waiting to be published")
+            self._in_flight += 1
+        self._outbox.put_nowait(body)
+        self._wake()
+    
+    def publish_many(self, bodies):
+        """
+        Enqueue several message bodies at once; either all are accepted or none.
+        
+        The I/O thread is woken once for the whole batch, and the broker confirms
+        the messages with multiple-acks as they arrive.
+        
+        Args:
+            bodies (list): Encoded messages
+        
+        Raises:
+            queue.Full: If the batch does not fit within the pending limit
+        """
+        with self._in_flight_cond:
+            if self._in_flight + len(bodies) > self.max_pending:
+                raise queue.Full(f"{self._in_flight} messages are waiting to be published")
+            self._in_flight += len(bodies)
+        for body in bodies:
+            self._outbox.put_nowait(body)
+        self._wake()
+    
+    def flush(self, timeout=None):
+        """
+        Wait until every enqueued message has been confirmed by the broker.
+        
+        Args:
+            timeout (float, optional): Maximum seconds to wait
+        
+        Returns:
+            bool: True if everything was confirmed
+        """
+        with self._in_flight_cond:
+            return self._in_flight_cond.wait_for(lambda: self._in_flight == 0, timeout)
+    
+    def stop(self, timeout=5):
+        """
+        Flush outstanding messages and close the connection.
+        
+        Args:
+            timeout (float): Maximum seconds to wait for outstanding confirms
+        """
+        if not self.flush(timeout):
+            logging.warning(f"Publisher stopped with {self._in_flight} unconfirmed messages")
+        
+        self._stopping = True
+        connection = self._connection
+        if connection is not None:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._close_connection)
+            except Exception:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def _wake(self):
+        """Ask the I/O thread to drain the outbox"""
+        connection = self._connection
+        if connection is not None and connection.is_open:
+            try:
+                connection.ioloop.add_callback_threadsafe(self._drain)
+            except Exception:
+                # The connection is going away; the outbox is drained after reconnecting
+                pass
+    
+    def _run(self):
+        """I/O thread: keep a connection open, reconnecting with backoff"""
+        retry_count = 0
+        while not self._stopping:
+            opened_at = time.monotonic()
+            try:
+                self._connection = pika.SelectConnection(
+                    get_connection_parameters(),
+                    on_open_callback=self._on_connection_open,
+                    on_open_error_callback=self._on_connection_open_error,
+                    on_close_callback=self._on_connection_closed
+                )
+                self._connection.ioloop.start()
+            except Exception as e:
+                logging.error(f"Publisher connection error: {str(e)}")
+            
+            self._connection = None
+            if self._stopping:
+                break
+            
+            # Reset the backoff once a connection has stayed up for a while
+            retry_count = 0 if time.monotonic() - opened_at > 30 else retry_count + 1
+            wait_time = min(30, 0.5 * 2 ** retry_count)
+            logging.error(f"Publisher disconnected from RabbitMQ. Reconnecting in {wait_time} seconds...")
+            time.sleep(wait_time)
+    
+    def _on_connection_open(self, connection):
+        # The first channel declares the queue; the rest of the pool opens afterwards
+        self._queue_declared = False
+        connection.channel(on_open_callback=self._on_channel_open)
+    
+    def _on_connection_open_error(self, connection, error):
+        logging.error(f"Publisher could not connect to RabbitMQ: {str(error)}")
+        connection.ioloop.stop()
+    
+    def _on_connection_closed(self, connection, reason):
+        for channel_number in list(self._unconfirmed):
+            self._requeue_unconfirmed(channel_number)
+        self._channels = []
+        connection.ioloop.stop()
+    
+    def _on_channel_open(self, channel):
+        channel.add_on_close_callback(self._on_channel_closed)
+        
+        # The queue only needs to be declared once per connection
+        if self._queue_declared:
+            self._enable_confirms(channel)
+        else:
+            channel.queue_declare(
+                queue=self.queue_name,
+                durable=True,
+                callback=lambda frame: self._on_queue_declared(channel)
+            )
+    
+    def _on_queue_declared(self, channel):
+        self._queue_declared = True
+        self._enable_confirms(channel)
+        for _ in range(self.channel_count - 1):
+            self._connection.channel(on_open_callback=self._on_channel_open)
+    
+    def _enable_confirms(self, channel):
+        channel.confirm_delivery(
+            ack_nack_callback=self._on_delivery_confirmation,
+            callback=lambda frame: self._on_channel_ready(channel)
+        )
+    
+    def _on_channel_ready(self, channel):
+        self._unconfirmed[channel.channel_number] = {}
+        self._delivery_tags[channel.channel_number] = 0
+        self._channels.append(channel)
+        logging.info(f"Publisher channel {channel.channel_number} ready")
+        self._drain()
+    
+    def _on_channel_closed(self, channel, reason):
+        logging.warning(f"Publisher channel {channel.channel_number} closed: {reason}")
+        if channel in self._channels:
+            self._channels.remove(channel)
+        self._requeue_unconfirmed(channel.channel_number)
+        
+        # Replace the channel while the connection is still usable
+        connection = self._connection
+        if connection is not None and connection.is_open and not self._stopping:
+            connection.channel(on_open_callback=self._on_channel_open)
+    
+    def _close_connection(self):
+        if self._connection is not None and self._connection.is_open:
+            self._connection.close()
+    
+    def _unconfirmed_count(self):
+        return sum(len(pending) for pending in self._unconfirmed.values())
+    
+    def _drain(self):
+        """Publish outbox messages on the channel pool (I/O thread only)"""
+        while self._channels and self._unconfirmed_count() < self.max_unconfirmed:
+            try:
+                body = self._outbox.get_nowait()
+            except queue.Empty:
+                return
+            
+            channel = self._channels[self._next_channel % len(self._channels)]
+            self._next_channel += 1
+            
+            try:
+                channel.basic_publish(
+                    exchange='',
+                    routing_key=self.queue_name,
+                    body=body,
+                    properties=self._properties
+                )
+            except Exception as e:
+                logging.error(f"Error publishing message to RabbitMQ: {str(e)}")
+                self._outbox.put_nowait(body)
+                return
+            
+            channel_number = channel.channel_number
+            self._delivery_tags[channel_number] += 1
+            self._unconfirmed[channel_number][self._delivery_tags[channel_number]] = body
+    
+    def _on_delivery_confirmation(self, frame):
+        """Handle a Basic.Ack or Basic.Nack from the broker (I/O thread only)"""
+        confirmation = frame.method
+        pending = self._unconfirmed.get(frame.channel_number, {})
+        
+        if confirmation.multiple:
+            tags = [tag for tag in pending if tag <= confirmation.delivery_tag]
+        else:
+            tags = [confirmation.delivery_tag] if confirmation.delivery_tag in pending else []
+        
+        is_ack = isinstance(confirmation, pika.spec.Basic.Ack)
+        for tag in tags:
+            body = pending.pop(tag)
+            if not is_ack:
+                # The broker could not take the message; publish it again
+                self._outbox.put_nowait(body)
+        
+        if is_ack and tags:
+            with self._in_flight_cond:
+                self._in_flight -= len(tags)
+                self._in_flight_cond.notify_all()
+        elif not is_ack:
+            logging.warning(f"Broker nacked {len(tags)} messages; republishing")
+        
+        self._drain()
+    
+    def _requeue_unconfirmed(self, channel_number):
+        """Put messages without a confirm back on the outbox"""
+        pending = self._unconfirmed.pop(channel_number, {})
+        self._delivery_tags.pop(channel_number, None)
+        for tag in sorted(pending):
+            self._outbox.put_nowait(pending[tag])
+
+# Publisher shared by all requests handled by this process
+_publisher = None
+_publisher_pid = None
+_publisher_lock = threading.Lock()
+
+def get_publisher():
+    """
+    Return the publisher for the current process, starting it on first use.
+    
+    Returns:
+        TransactionPublisher: The process-wide publisher
+    """
+    global _publisher, _publisher_pid
+    
+    # Gunicorn forks workers after import, so each process needs its own I/O thread
+    if _publisher is None or _publisher_pid != os.getpid():
+        with _publisher_lock:
+            if _publisher is None or _publisher_pid != os.getpid():
+                _publisher = TransactionPublisher()
+                _publisher.start()
+                _publisher_pid = os.getpid()
+                atexit.register(_publisher.stop)
+    
+    return _publisher
+
 def publish_transaction(transaction_id):
     """
     Publish a transaction ID to the RabbitMQ queue for processing.
     
+    The message is handed to the process-wide publisher, so the caller only pays
+    for an in-memory enqueue; delivery and broker confirms happen in the background.
+    
     Args:
         transaction_id (str): The ID of the transaction to be processed
     """
     try:
-        # Get a connection and channel
-        connection = get_rabbitmq_connection()
-        channel = connection.channel()
-        
-        # Declare the queue (creates if it doesn't exist)
-        queue_name = os.getenv('TRANSACTION_QUEUE', 'transactions_queue')
-        channel.queue_declare(queue=queue_name, durable=True)
-        
         # Prepare message
         message = {
-            'transaction_id': transaction_id
+            'transaction_id': transaction_id,
+            # Lets the worker measure queue lag
+            'enqueued_at': time.time()
         }
         
-        # Publish the message
-        channel.basic_publish(
-            exchange='',
-            routing_key=queue_name,
-            body=json.dumps(message),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # make message persistent
-                content_type='application/json'
-            )
-        )
-        
-        logging.info(f"Transaction {transaction_id} published to RabbitMQ queue")
+        get_publisher().publish(serialization.dumps_bytes(message))
         
-        # Close the connection
-        connection.close()
+        logging.info(f"Transaction {transaction_id} queued for publishing to RabbitMQ")
         
     except Exception as e:
         logging.error(f"Error publishing transaction to RabbitMQ: {str(e)}")
+        raise
+
+def publish_transactions(transaction_ids):
+    """
+    Publish several transaction IDs to the RabbitMQ queue in one hand-off.
+    
+    Args:
+        transaction_ids (list): IDs of the transactions to be processed
+    """
+    try:
+        enqueued_at = time.time()
+        get_publisher().publish_many([
+            serialization.dumps_bytes({'transaction_id': transaction_id, 'enqueued_at': enqueued_at})
+            for transaction_id in transaction_ids
+        ])
+        
+        logging.info(f"{len(transaction_ids)} transactions queued for publishing to RabbitMQ")
+    
+    except Exception as e:
+        logging.error(f"Error publishing transactions to RabbitMQ: {str(e)}")
         raise
\ No newline at end of file
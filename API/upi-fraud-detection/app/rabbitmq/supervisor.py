@@ -0,0 +1,257 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from app import db
+from app.config import Config
+from app.metrics import start_metrics_server
+from app.profiler import install_signal_handler
+from app.runtime import adopt_runtime, get_runtime
+
+# A child that exits sooner than this after starting is restarted with a growing delay
+MIN_HEALTHY_SECONDS = 10
+MAX_RESTART_DELAY_SECONDS = 60
+
+# Signals whose handlers differ between the supervisor and its children
+CHILD_SIGNALS = {signal.SIGTERM, signal.SIGINT, signal.SIGUSR2}
+
+class WorkerSupervisor:
+    """
+    Runs several consumer processes in one worker container.
+    
+    The runtime is warmed up once in the supervisor (transaction graph,
+    account statistics, look-alike index) and each child is forked from it,
+    so children start warm and share those pages copy-on-write. Children that
+    exit unexpectedly are restarted; children that keep crashing right after
+    starting are restarted with a growing delay.
+    
+    On SIGTERM or SIGINT the supervisor asks every child to stop: each one
+    finishes and acknowledges the message or batch in hand, hands its
+    prefetched messages back to the queue and exits. Children still running
+    after WORKER_SHUTDOWN_TIMEOUT_SECONDS are killed, and their unacknowledged
+    messages are redelivered by RabbitMQ.
+    
+    Each child counts the messages it acknowledges in shared memory, and the
+    supervisor logs per-child throughput every WORKER_REPORT_SECONDS. Each
+    child also serves its own metrics on WORKER_METRICS_PORT + slot.
+    
+    SIGUSR2 is forwarded to every child, each of which then profiles itself.
+    """
+    
+    def __init__(self, processes, mode=None):
+        """
+        Initialize the supervisor.
+        
+        Args:
+            processes (int): Number of consumer processes
+            mode (str, optional): Consumer mode, passed to run_consumer
+        """
+        self.processes = processes
+        self.mode = mode
+        
+        # Messages acknowledged per child slot; each slot has a single writer
+        self.counters = multiprocessing.Array('Q', processes, lock=False)
+        
+        self._children = {}  # pid -> slot
+        self._started_at = [0.0] * processes
+        self._restart_delay = [0.0] * processes
+        self._restart_at = {}  # slot -> monotonic time of the next restart
+        self._stopping = False
+    
+    def _on_signal(self, signum, frame):
+        self._stopping = True
+    
+    def _forward_signal(self, signum, frame):
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+    
+    def run(self):
+        """
+        Warm up, start the children and supervise them until asked to stop.
+        
+        Returns:
+            int: Exit status for the worker
+        """
+        runtime = get_runtime()
+        runtime.warmup()
+        
+        # Children open their own connections; none are inherited from here
+        with runtime.app.app_context():
+            db.engine.dispose()
+        
+        signal.signal(signal.SIGTERM, self._on_signal)
+        signal.signal(signal.SIGINT, self._on_signal)
+        signal.signal(signal.SIGUSR2, self._forward_signal)
+        
+        for slot in range(self.processes):
+            self._spawn(slot, runtime)
+        logging.info(f"Supervisor started {self.processes} consumer processes")
+        
+        last_counts = list(self.counters)
+        last_report = time.monotonic()
+        
+        while not self._stopping:
+            self._reap()
+            
+            now = time.monotonic()
+            for slot, restart_at in list(self._restart_at.items()):
+                if now >= restart_at:
+                    del self._restart_at[slot]
+                    self._spawn(slot, runtime)
+            
+            if now - last_report >= Config.WORKER_REPORT_SECONDS:
+                last_counts = self._report(last_counts, now - last_report)
+                last_report = now
+            
+            time.sleep(0.5)
+        
+        self._shutdown()
+        totals = ', '.join(f"{slot}: {count}" for slot, count in enumerate(self.counters))
+        logging.info(f"Messages processed per consumer: {totals} (total {sum(self.counters)})")
+        return 0
+    
+    def _spawn(self, slot, runtime):
+        # Until the child has its own handlers, a signal would run the inherited
+        # supervisor handlers in it; hold them and let the child unblock them
+        previous_mask = signal.pthread_sigmask(signal.SIG_BLOCK, CHILD_SIGNALS)
+        try:
+            pid = os.fork()
+            if pid == 0:
+                # Never return into the supervisor loop from a child
+                status = 1
+                try:
+                    status = self._child_main(slot, runtime, previous_mask)
+                finally:
+                    os._exit(status)
+        finally:
+            signal.pthread_sigmask(signal.SIG_SETMASK, previous_mask)
+        
+        self._children[pid] = slot
+        self._started_at[slot] = time.monotonic()
+        logging.info(f"Started consumer {slot} (pid {pid})")
+    
+    def _child_main(self, slot, runtime, signal_mask):
+        """Body of a forked child, started with CHILD_SIGNALS blocked; returns its exit status"""
+        from app.rabbitmq.consumer import request_stop, run_consumer
+        
+        # The supervisor handles Ctrl-C and forwards it as SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, lambda signum, frame: request_stop())
+        install_signal_handler()
+        # A SIGTERM held since the fork is delivered now, to the child's handler
+        signal.pthread_sigmask(signal.SIG_SETMASK, signal_mask)
+        
+        try:
+            adopt_runtime(runtime)
+            
+            # Metrics live in each child's memory, so each child serves its own
+            if Config.WORKER_METRICS_PORT:
+                start_metrics_server(Config.WORKER_METRICS_PORT + slot)
+            
+            def on_processed(count):
+                self.counters[slot] += count
+            
+            run_consumer(self.mode, on_processed=on_processed)
+            return 0
+        except Exception as e:
+            logging.error(f"Consumer {slot} failed: {str(e)}")
+            return 1
+        finally:
+            logging.shutdown()
+    
+    def _reap(self):
+        """Collect exited children and schedule their restart"""
+        while self._children:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            
+            slot = self._children.pop(pid, None)
+            if slot is None:
+                continue
+            
+            lifetime = time.monotonic() - self._started_at[slot]
+            if lifetime < MIN_HEALTHY_SECONDS:
+                self._restart_delay[slot] = min(max(self._restart_delay[slot] * 2, 1), MAX_RESTART_DELAY_SECONDS)
+            else:
+                self._restart_delay[slot] = 0
+            
+            logging.error(
+                f"Consumer {slot} (pid {pid}) exited with {self._describe(status)} after {lifetime:.0f} seconds; "
+                f"restarting in {self._restart_delay[slot]:.0f} seconds"
+            )
+            self._restart_at[slot] = time.monotonic() + self._restart_delay[slot]
+    
+    @staticmethod
+    def _describe(status):
+        if os.WIFSIGNALED(status):
+            return f"signal {os.WTERMSIG(status)}"
+        return f"status {os.WEXITSTATUS(status)}"
+    
+    def _shutdown(self):
+        """Stop every child gracefully, killing those that overrun the timeout"""
+        logging.info(f"Stopping {len(self._children)} consumer processes")
+        for pid in self._children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        
+        deadline = time.monotonic() + Config.WORKER_SHUTDOWN_TIMEOUT_SECONDS
+        while self._children and time.monotonic() < deadline:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+            slot = self._children.pop(pid, None)
+            if slot is not None:
+                logging.info(f"Consumer {slot} (pid {pid}) stopped with {self._describe(status)}")
+        
+        for pid, slot in self._children.items():
+            logging.error(f"Consumer {slot} (pid {pid}) did not stop in time; killing it")
+            try:
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+            except (ProcessLookupError, ChildProcessError):
+                pass
+        self._children = {}
+    
+    def _report(self, last_counts, interval):
+        """
+        Log messages per second for each child since the last report.
+        
+        Args:
+            last_counts (list): Counters at the last report
+            interval (float): Seconds since the last report
+        
+        Returns:
+            list: Current counters
+        """
+        counts = list(self.counters)
+        rates = [(count - last) / interval for count, last in zip(counts, last_counts)]
+        per_child = ', '.join(f"{slot}: {rate:.1f}" for slot, rate in enumerate(rates))
+        logging.info(f"Throughput in msg/s per consumer: {per_child} (total {sum(rates):.1f})")
+        return counts
+
+def run_supervisor(processes, mode=None):
+    """
+    Run consumer processes under a supervisor until SIGTERM or SIGINT.
+    
+    Args:
+        processes (int): Number of consumer processes
+        mode (str, optional): Consumer mode, 'blocking' or 'async'
+    
+    Returns:
+        int: Exit status for the worker
+    """
+    return WorkerSupervisor(processes, mode).run()
@@ -0,0 +1,95 @@
+import logging
+import socket
+import time
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+from app.config import Config
+
+def check_broker(timeout=1.0):
+    """
+    Check that RabbitMQ accepts connections.
+    
+    RabbitMQ only opens its listener once it has finished booting, so an
+    accepted TCP connection means the consumer can connect.
+    
+    Args:
+        timeout (float): Seconds to wait for the connection
+    
+    Raises:
+        OSError: If the broker does not accept the connection
+    """
+    with socket.create_connection((Config.RABBITMQ_HOST, Config.RABBITMQ_PORT), timeout=timeout):
+        pass
+
+def check_database(timeout=2):
+    """
+    Check that the database answers a query.
+    
+    Uses a throwaway engine: the app cannot be created before the database
+    is up, because create_app creates the tables.
+    
+    Args:
+        timeout (int): Connect timeout in seconds (PostgreSQL only)
+    
+    Raises:
+        Exception: If the database cannot be reached
+    """
+    url = Config.SQLALCHEMY_DATABASE_URI
+    connect_args = {'connect_timeout': timeout} if url.startswith('postgres') else {}
+    engine = create_engine(url, poolclass=NullPool, connect_args=connect_args)
+    try:
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+    finally:
+        engine.dispose()
+
+def wait_until_ready(name, check, deadline, initial_delay=None, max_delay=None):
+    """
+    Run a readiness check until it passes, retrying with exponential backoff.
+    
+    Args:
+        name (str): Dependency name for the logs
+        check (callable): Raises while the dependency is not ready
+        deadline (float): time.monotonic() after which to give up
+        initial_delay (float, optional): First retry delay, defaults to Config.READINESS_INITIAL_DELAY_SECONDS
+        max_delay (float, optional): Longest retry delay, defaults to Config.READINESS_MAX_DELAY_SECONDS
+    
+    Returns:
+        bool: Whether the check passed before the deadline
+    """
+    delay = initial_delay or Config.READINESS_INITIAL_DELAY_SECONDS
+    max_delay = max_delay or Config.READINESS_MAX_DELAY_SECONDS
+    started = time.monotonic()
+    attempt = 0
+    
+    while True:
+        attempt += 1
+        try:
+            check()
+            logging.info(f"{name} ready after {attempt} attempt(s) in {time.monotonic() - started:.2f} seconds")
+            return True
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logging.error(f"{name} not ready after {attempt} attempts: {str(e)}")
+                return False
+            if attempt == 1:
+                logging.info(f"Waiting for {name}: {str(e)}")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, max_delay)
+
+def wait_for_dependencies(timeout=None):
+    """
+    Wait until RabbitMQ and the database are ready, replacing a fixed start-up delay.
+    
+    Args:
+        timeout (float, optional): Seconds to wait in total, defaults to Config.READINESS_TIMEOUT_SECONDS
+    
+    Returns:
+        bool: Whether both are ready
+    """
+    deadline = time.monotonic() + (timeout or Config.READINESS_TIMEOUT_SECONDS)
+    return (
+        wait_until_ready('RabbitMQ', check_broker, deadline) and
+        wait_until_ready('Database', check_database, deadline)
+    )
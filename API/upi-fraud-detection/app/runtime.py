@@ -0,0 +1,105 @@
+import logging
+import os
+import threading
+from app import create_app, db
+from app.config import Config
+from app.algorithm.graph_temporal import GraphTemporalAnalyzer
+from app.algorithm.transaction_graph import TransactionGraph
+from app.algorithm.account_stats import AccountStatsStore
+from app.algorithm.content_analyzer import ContentAnalyzer
+from app.algorithm.risk_engine import RiskEngine
+
+class WorkerRuntime:
+    """
+    Long-lived per-process state for the fraud detection pipeline.
+    
+    Builds the Flask app (and with it the SQLAlchemy engine and connection pool)
+    and the analyzers once, so that every message handled by the process reuses
+    them instead of paying the setup cost again.
+    """
+    
+    def __init__(self, app=None, config_class=Config):
+        """
+        Initialize the runtime.
+        
+        Args:
+            app (Flask, optional): An existing app to reuse (e.g. the API process).
+                A new app without the API routes is created from config_class when omitted.
+            config_class (type): Configuration used when creating the app
+        """
+        self.app = app if app is not None else create_app(config_class, register_api=False)
+        self.account_stats = AccountStatsStore()
+        self.transaction_graph = TransactionGraph(account_stats=self.account_stats)
+        self.graph_temporal = GraphTemporalAnalyzer(self.transaction_graph)
+        self.content_analyzer = ContentAnalyzer()
+        self.risk_engine = RiskEngine()
+        self.warmed_up = False
+    
+    def warmup(self):
+        """
+        Prepare the runtime before the first message arrives.
+        
+        Opens a database connection so the pool is populated and the first
+        transaction does not pay for the connection handshake, and loads the
+        transaction graph and account statistics for the current window.
+        """
+        if self.warmed_up:
+            return
+        
+        with self.app.app_context():
+            with db.engine.connect() as connection:
+                connection.execute(db.text('SELECT 1'))
+            self.transaction_graph.bootstrap()
+        
+        self.warmed_up = True
+        logging.info("Worker runtime warmed up")
+    
+    def after_fork(self):
+        """
+        Make a runtime inherited from the parent process safe to use in a
+        forked child.
+        
+        The analyzers, the transaction graph and the look-alike index are
+        kept, so the child starts warm; the database connections are not
+        shared, the child opens its own on first use.
+        """
+        with self.app.app_context():
+            # close=False: the parent's connections must not be closed from here
+            db.engine.dispose(close=False)
+
+# Runtime shared by everything running in this process
+_runtime = None
+_runtime_pid = None
+_runtime_lock = threading.Lock()
+
+def get_runtime():
+    """
+    Return the runtime for the current process, creating it on first use.
+    
+    Returns:
+        WorkerRuntime: The process-wide runtime
+    """
+    global _runtime, _runtime_pid
+    
+    # A forked child must not share the parent's connection pool
+    if _runtime is None or _runtime_pid != os.getpid():
+        with _runtime_lock:
+            if _runtime is None or _runtime_pid != os.getpid():
+                _runtime = WorkerRuntime()
+                _runtime_pid = os.getpid()
+    
+    return _runtime
+
+def adopt_runtime(runtime):
+    """
+    Make a runtime created before fork() the runtime of the current process.
+    
+    Args:
+        runtime (WorkerRuntime): Runtime inherited from the parent process
+    """
+    global _runtime, _runtime_pid
+    
+    runtime.after_fork()
+    with _runtime_lock:
+        _runtime = runtime
+        _runtime_pid = os.getpid()
\ No newline at end of file
@@ -0,0 +1,124 @@
+import datetime
+import decimal
+import json
+import uuid
+from flask.json.provider import JSONProvider
+from app.config import Config
+
+try:
+    import orjson
+except ImportError:
+    # Optional: without orjson the stdlib json module is used
+    orjson = None
+
+def _default(value):
+    """Encode the types JSON has no native form for"""
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    # numpy arrays and scalars, without importing numpy
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _select_backend(name):
+    """
+    Pick the JSON backend.
+    
+    Args:
+        name (str): 'auto' (orjson when installed), 'orjson' or 'json'
+    
+    Returns:
+        str: Backend in use
+    """
+    if name == 'json' or orjson is None:
+        return 'json'
+    return 'orjson'
+
+BACKEND = _select_backend(Config.JSON_BACKEND)
+
+if BACKEND == 'orjson':
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    def _encode(value):
+        return orjson.dumps(value, default=_default, option=_ORJSON_OPTIONS)
+    
+    _decode = orjson.loads
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False)
+    
+    def _encode(value):
+        return _encoder.encode(value).encode('utf-8')
+    
+    def _decode(data):
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+def dumps_bytes(value):
+    """
+    Encode a value as compact UTF-8 JSON.
+    
+    datetimes, dates and times become ISO 8601 strings, Decimals floats,
+    UUIDs strings, sets lists and numpy values their Python equivalents.
+    
+    Args:
+        value: Value to encode
+    
+    Returns:
+        bytes: JSON document
+    
+    Raises:
+        TypeError: If the value holds an unsupported type
+    """
+    return _encode(value)
+
+def dumps(value):
+    """
+    Encode a value as compact JSON, like dumps_bytes.
+    
+    Returns:
+        str: JSON document
+    """
+    return _encode(value).decode('utf-8')
+
+def loads(data):
+    """
+    Decode a JSON document.
+    
+    Args:
+        data (bytes, bytearray, memoryview or str): JSON document
+    
+    Returns:
+        The decoded value
+    
+    Raises:
+        ValueError: If the document is not valid JSON
+    """
+    return _decode(data)
+
+class FastJSONProvider(JSONProvider):
+    """
+    Flask JSON provider on top of this module.
+    
+    jsonify and request.get_json use the selected backend, and responses are
+    built from the encoded bytes directly. datetimes are ISO 8601 strings
+    rather than Flask's HTTP dates.
+    """
+    
+    mimetype = 'application/json'
+    
+    def dumps(self, obj, **kwargs):
+        return dumps(obj)
+    
+    def loads(self, s, **kwargs):
+        return loads(s)
+    
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(dumps_bytes(obj), mimetype=self.mimetype)
@@ -0,0 +1 @@
+# Benchmarks for the fraud detection pipeline (run from the project root)
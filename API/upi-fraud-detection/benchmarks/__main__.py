@@ -0,0 +1,6 @@
+"""
+Run the pipeline benchmark: python -m benchmarks [options of benchmarks.pipeline]
+"""
+from benchmarks.pipeline import main
+
+main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: transactions/sec of the blocking consumer versus the async pipeline.
+
+"blocking" runs process_transaction for one message after another, as the
+start_consumer callback does. "async" keeps --in-flight transactions in
+AsyncTransactionPipeline, with loads and commits on --db-threads threads.
+The broker is left out, so both modes only differ in how database work and
+scoring are scheduled. SQLite answers in microseconds, so --db-latency-ms
+adds a delay to every statement to stand in for the network round-trip to
+a remote PostgreSQL server. Without it the async mode is slower: the thread
+hand-offs cost more than the round-trips they overlap.
+
+Usage:
+    python -m benchmarks.async_pipeline --messages 300 --db-latency-ms 2
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+def add_statement_latency(engine, seconds):
+    """Sleep before every statement executed on the engine"""
+    from sqlalchemy import event
+    
+    def on_execute(conn, cursor, statement, parameters, context, executemany):
+        time.sleep(seconds)
+    
+    event.listen(engine, 'before_cursor_execute', on_execute)
+
+async def run_pipeline(pipeline, transaction_ids, in_flight):
+    semaphore = asyncio.Semaphore(in_flight)
+    
+    async def process(transaction_id):
+        async with semaphore:
+            await pipeline.process(transaction_id)
+    
+    await asyncio.gather(*(process(transaction_id) for transaction_id in transaction_ids))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=300, help='Messages per mode')
+    parser.add_argument('--accounts', type=int, default=500)
+    parser.add_argument('--history', type=int, default=5000)
+    parser.add_argument('--db-latency-ms', type=float, default=2.0, help='Delay added to every statement')
+    parser.add_argument('--in-flight', type=int, default=32)
+    parser.add_argument('--db-threads', type=int, default=4)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    
+    # Point the app at a throwaway SQLite file before anything reads the config
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    
+    from app import db
+    from app.models.transaction import Transaction
+    from app.rabbitmq.async_consumer import AsyncTransactionPipeline
+    from app.rabbitmq.consumer import process_transaction
+    from app.runtime import WorkerRuntime
+    from benchmarks.worker_runtime import seed_database
+    
+    runtime = WorkerRuntime()
+    with runtime.app.app_context():
+        pending_ids = seed_database(db, Transaction, args.accounts, args.history, args.messages * 2)
+        engine = db.engine
+    runtime.warmup()
+    add_statement_latency(engine, args.db_latency_ms / 1000)
+    
+    blocking_ids = pending_ids[:args.messages]
+    async_ids = pending_ids[args.messages:]
+    
+    start = time.perf_counter()
+    for transaction_id in blocking_ids:
+        process_transaction(transaction_id, runtime)
+    blocking = len(blocking_ids) / (time.perf_counter() - start)
+    
+    pipeline = AsyncTransactionPipeline(runtime, args.db_threads)
+    start = time.perf_counter()
+    asyncio.run(run_pipeline(pipeline, async_ids, args.in_flight))
+    pipelined = len(async_ids) / (time.perf_counter() - start)
+    pipeline.shutdown()
+    
+    with runtime.app.app_context():
+        stored = Transaction.query.filter(Transaction.id.in_(pending_ids), Transaction.processed == True).count()
+    
+    print(f"statement latency {args.db_latency_ms} ms, {args.messages} messages per mode")
+    print(f"blocking (one at a time):                 {blocking:8.1f} tx/s")
+    print(f"async ({args.in_flight} in flight, {args.db_threads} db threads):     {pipelined:8.1f} tx/s")
+    print(f"speedup {pipelined / blocking:.1f}x, stored {stored}/{len(pending_ids)}")
+
+if __name__ == '__main__':
+    main()
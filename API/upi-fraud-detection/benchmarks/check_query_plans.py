@@ -0,0 +1,204 @@
+"""
+Check: the history queries use the transactions indexes on SQLite.
+
+Seeds a throwaway SQLite database, runs each query path of the pipeline and
+the API, captures the statements it actually issues and checks their
+EXPLAIN QUERY PLAN: the expected index is used, the transactions table is
+never scanned without an index, and no ORDER BY needs a temporary B-tree
+where an index provides the order. Exits with status 1 on any regression;
+tests/test_query_plans.py runs the same checks under pytest.
+
+Usage:
+    python -m benchmarks.check_query_plans
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+SENDER_INDEX = 'ix_transactions_sender_id_timestamp'
+RECEIVER_INDEX = 'ix_transactions_receiver_id_timestamp'
+TIMESTAMP_INDEX = 'ix_transactions_timestamp_id'
+UNPROCESSED_INDEX = 'ix_transactions_unprocessed'
+
+class StatementRecorder:
+    """Records the SELECTs on the transactions table executed under the current label"""
+    
+    def __init__(self, engine):
+        from sqlalchemy import event
+        
+        self.label = None
+        self.statements = {}  # label -> list of (statement, parameters)
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+    
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.label is not None and statement.lstrip().upper().startswith('SELECT') and 'transactions' in statement:
+            self.statements.setdefault(self.label, []).append((statement, parameters))
+
+def query_plan(connection, statement, parameters):
+    """EXPLAIN QUERY PLAN lines for a statement"""
+    cursor = connection.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+    return [row[3] for row in cursor.fetchall()]
+
+def check_plan(plan, expected_indexes, ordered):
+    """
+    Problems with the plans of one case.
+    
+    Args:
+        plan (list): EXPLAIN QUERY PLAN lines of every statement in the case
+        expected_indexes (tuple): Indexes the case must use
+        ordered (bool): Whether ORDER BY must come from an index
+    
+    Returns:
+        list: Problem descriptions, empty if the plan is fine
+    """
+    problems = []
+    text = '\n'.join(plan)
+    for index in expected_indexes:
+        if index not in text:
+            problems.append(f"does not use {index}")
+    for line in plan:
+        if line.startswith('SCAN transactions') and 'USING' not in line:
+            problems.append(f"full table scan: {line}")
+        if ordered and 'USE TEMP B-TREE FOR ORDER BY' in line:
+            problems.append(f"sorts instead of reading in index order: {line}")
+    return problems
+
+def run_cases(app, db, recorder, sender_id, receiver_id):
+    """Run every query path once, recording its statements under a label"""
+    from app.algorithm.feature_context import TransactionContext
+    from app.algorithm.graph_temporal import GraphTemporalAnalyzer
+    from app.algorithm.input_processor import process_transaction_input
+    from app.algorithm.transaction_graph import TransactionGraph
+    from app.models.transaction import Transaction
+    
+    now = datetime.utcnow()
+    with app.app_context():
+        transaction = Transaction(
+            id='plan-check', sender_id=sender_id, receiver_id=receiver_id,
+            amount=100.0, timestamp=now
+        )
+        
+        recorder.label = 'graph_temporal.analyze (no context)'
+        GraphTemporalAnalyzer().analyze(sender_id, receiver_id, 100.0, now, transaction.id)
+        
+        recorder.label = 'process_transaction_input (no context)'
+        user_data, _ = process_transaction_input(transaction)
+        for view in user_data.values():
+            dict(view.items())
+        
+        recorder.label = 'TransactionContext recent lists'
+        TransactionContext(transaction).sender_recent()
+        
+        recorder.label = 'TransactionContext history window'
+        TransactionContext(transaction, include_window=True).window_transactions()
+        
+        recorder.label = 'TransactionGraph catch-up'
+        TransactionGraph(account_stats=None)._load_since(now - timedelta(hours=1))
+        
+        recorder.label = 'unprocessed backlog'
+        Transaction.query.filter(Transaction.processed == False).order_by(Transaction.timestamp).limit(100).all()
+        
+        db.session.rollback()
+    
+    client = app.test_client()
+    recorder.label = 'recent transactions, first page'
+    first = client.get('/api/recent-transactions?limit=20').get_json()
+    recorder.label = 'recent transactions, next page'
+    client.get(f"/api/recent-transactions?limit=20&cursor={first['next_cursor']}")
+    recorder.label = None
+
+# label -> (indexes that must appear in the plan, ORDER BY must come from an index)
+EXPECTATIONS = {
+    'graph_temporal.analyze (no context)': ((SENDER_INDEX, RECEIVER_INDEX), False),
+    'process_transaction_input (no context)': ((SENDER_INDEX, RECEIVER_INDEX), True),
+    'TransactionContext recent lists': ((SENDER_INDEX, RECEIVER_INDEX), True),
+    'TransactionContext history window': ((SENDER_INDEX, RECEIVER_INDEX), False),
+    'TransactionGraph catch-up': ((TIMESTAMP_INDEX,), True),
+    'unprocessed backlog': ((UNPROCESSED_INDEX,), True),
+    'recent transactions, first page': ((TIMESTAMP_INDEX,), True),
+    'recent transactions, next page': ((TIMESTAMP_INDEX,), True),
+}
+
+def prepare(app, db, accounts=500, history=5000):
+    """
+    Seed the app's (empty) database and start recording its statements.
+    
+    Returns:
+        tuple: (StatementRecorder, sender_id, receiver_id) of a seeded transaction
+    """
+    from app.models.transaction import Transaction
+    from benchmarks.worker_runtime import seed_database
+    
+    with app.app_context():
+        seed_database(db, Transaction, accounts, history, 50)
+        sample = Transaction.query.filter(Transaction.processed == True).first()
+        
+        # Give the planner statistics, as a long-lived database would have
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql('ANALYZE')
+        
+        return StatementRecorder(db.engine), sample.sender_id, sample.receiver_id
+
+def check_all(app, db, recorder):
+    """
+    Check the recorded statements of every case against EXPECTATIONS.
+    
+    Returns:
+        dict: label -> (plans, one list of lines per statement; problems, empty if fine)
+    """
+    results = {}
+    with app.app_context():
+        connection = db.engine.raw_connection()
+        try:
+            for label, (expected_indexes, ordered) in EXPECTATIONS.items():
+                statements = recorder.statements.get(label)
+                if not statements:
+                    results[label] = ([], ['no query recorded'])
+                    continue
+                
+                plans = [query_plan(connection, statement, parameters) for statement, parameters in statements]
+                # Indexes may be spread over several statements of one case
+                problems = check_plan([line for plan in plans for line in plan], expected_indexes, ordered)
+                results[label] = (plans, problems)
+        finally:
+            connection.close()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--accounts', type=int, default=500)
+    parser.add_argument('--history', type=int, default=5000)
+    parser.add_argument('--verbose', action='store_true', help='Print every plan')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    
+    # Point the app at a throwaway SQLite file before anything reads the config
+    db_path = os.path.join(tempfile.mkdtemp(), 'plans.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    
+    from app import create_app, db
+    
+    app = create_app()
+    recorder, sender_id, receiver_id = prepare(app, db, args.accounts, args.history)
+    run_cases(app, db, recorder, sender_id, receiver_id)
+    
+    failures = 0
+    for label, (plans, problems) in check_all(app, db, recorder).items():
+        print(f"{'FAIL' if problems else 'ok':<6}{label} ({len(plans)} statement(s))")
+        for problem in problems:
+            print(f"        {problem}")
+        if args.verbose or problems:
+            for plan in plans:
+                for line in plan:
+                    print(f"        | {line}")
+        failures += bool(problems)
+    
+    print(f"{len(EXPECTATIONS) - failures}/{len(EXPECTATIONS)} query plans ok")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
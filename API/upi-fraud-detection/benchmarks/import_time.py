@@ -0,0 +1,109 @@
+"""
+Check: worker and API start-up imports stay lean.
+
+Imports each entry point in a fresh interpreter with python -X importtime,
+reports the total import time, the slowest packages and modules, and the
+time until the worker runtime is warmed up on an empty SQLite database.
+Exits with status 1 if an entry point imports a library it must load
+lazily (ML libraries, numpy, aio-pika, multiprocessing), so it can run in CI.
+
+Usage:
+    python -m benchmarks.import_time
+    python -m benchmarks.import_time --top 30
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+# Entry point -> statement run in the fresh interpreter
+ENTRY_POINTS = {
+    'worker': 'import worker',
+    'api': 'import app.api.routes',
+}
+
+# Top-level packages an entry point must not import at start-up
+LAZY_PACKAGES = {
+    'worker': ('torch', 'transformers', 'cv2', 'pandas', 'sklearn', 'networkx', 'numpy', 'aio_pika', 'multiprocessing'),
+    'api': ('torch', 'transformers', 'cv2', 'pandas', 'sklearn', 'networkx', 'numpy', 'aio_pika'),
+}
+
+READY_STATEMENT = """
+import time
+start = time.perf_counter()
+import worker
+from app.runtime import get_runtime
+get_runtime().warmup()
+print(f"{(time.perf_counter() - start) * 1000:.1f}")
+"""
+
+def parse_importtime(stderr):
+    """
+    Parse the -X importtime report.
+
+    Returns:
+        list: (module, self microseconds, cumulative microseconds) per imported module
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+def run_python(statement, env, importtime=False):
+    command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', statement]
+    return subprocess.run(command, capture_output=True, text=True, env=env, check=True)
+
+def report(name, modules, top, out=sys.stdout):
+    """Print the import time of an entry point and its heaviest packages and modules"""
+    total = sum(self_us for _, self_us, _ in modules)
+    print(f"{name}: {len(modules)} modules imported in {total / 1000:.1f} ms", file=out)
+
+    packages = {}
+    for module, self_us, _ in modules:
+        package = module.split('.')[0]
+        packages[package] = packages.get(package, 0) + self_us
+    print(f"  {'package':<28}{'ms':>8}", file=out)
+    for package, self_us in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {package:<28}{self_us / 1000:>8.1f}", file=out)
+
+    print(f"  {'module':<48}{'self ms':>8}{'cumul. ms':>10}", file=out)
+    for module, self_us, cumulative_us in sorted(modules, key=lambda item: -item[1])[:top]:
+        print(f"  {module:<48}{self_us / 1000:>8.1f}{cumulative_us / 1000:>10.1f}", file=out)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--top', type=int, default=15, help='Packages and modules to list')
+    args = parser.parse_args()
+
+    # A throwaway SQLite file and an unreachable broker: nothing leaves the machine
+    env = dict(os.environ)
+    env['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'imports.db')}"
+    env['DOMAIN_CACHE_PATH'] = ''
+    env['PYTHONPATH'] = os.pathsep.join(filter(None, [os.getcwd(), env.get('PYTHONPATH')]))
+
+    # Compile once, so the measured runs read bytecode like a deployed container
+    for statement in ENTRY_POINTS.values():
+        run_python(statement, env)
+
+    failures = 0
+    for name, statement in ENTRY_POINTS.items():
+        modules = parse_importtime(run_python(statement, env, importtime=True).stderr)
+        report(name, modules, args.top)
+
+        imported = {module.split('.')[0] for module, _, _ in modules}
+        eager = [package for package in LAZY_PACKAGES[name] if package in imported]
+        if eager:
+            print(f"FAIL  {name} imports {', '.join(eager)} at start-up")
+            failures += 1
+        print()
+
+    ready_ms = float(run_python(READY_STATEMENT, env).stdout.strip().splitlines()[-1])
+    print(f"worker ready (imports, app, warmup on an empty database): {ready_ms:.1f} ms")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,341 @@
+"""
+Benchmark: per-stage latency and throughput of the fraud pipeline.
+
+Seeds a throwaway SQLite database with synthetic history, publishes a
+synthetic stream to an in-memory queue standing in for RabbitMQ and consumes
+it the way the worker does, timing every stage: queue (receive and decode),
+load, process_transaction_input, GraphTemporalAnalyzer.analyze,
+ContentAnalyzer.analyze, RiskEngine.calculate_risk and store (commit).
+
+Prints a table to stderr and writes the results as JSON, so runs on two
+commits can be compared with --baseline.
+
+Usage:
+    python -m benchmarks.pipeline --output results.json
+    python -m benchmarks.pipeline --baseline results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+STAGES = ('queue', 'load', 'input', 'graph_temporal', 'content', 'risk', 'store')
+
+# Bump when the layout of the JSON output changes
+SCHEMA_VERSION = 1
+
+class InMemoryQueue:
+    """Stand-in for the transactions queue: messages are encoded as the producer encodes them"""
+    
+    def __init__(self):
+        from app import serialization
+        self._serialization = serialization
+        self._messages = deque()
+    
+    def publish(self, transaction_id):
+        self._messages.append(self._serialization.dumps_bytes({'transaction_id': transaction_id, 'enqueued_at': time.time()}))
+    
+    def get(self):
+        """Next transaction ID, or None when the queue is empty"""
+        if not self._messages:
+            return None
+        return self._serialization.loads(self._messages.popleft())['transaction_id']
+    
+    def __len__(self):
+        return len(self._messages)
+
+class StageTimer:
+    """Collects durations per stage in nanoseconds"""
+    
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.enabled = True
+        self._stage = None
+        self._start = 0
+    
+    def start(self, stage):
+        self._stage = stage
+        self._start = time.perf_counter_ns()
+    
+    def stop(self):
+        if self.enabled:
+            self.samples[self._stage].append(time.perf_counter_ns() - self._start)
+    
+    def summary(self):
+        """
+        Latency statistics per stage.
+        
+        Returns:
+            dict: Stage -> count, mean, p50, p90, p99 and max in milliseconds,
+                total seconds, operations per second and share of the pipeline time
+        """
+        grand_total = sum(sum(samples) for samples in self.samples.values()) or 1
+        result = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            ordered = sorted(samples)
+            total = sum(ordered)
+            
+            def percentile(p):
+                # Nearest rank
+                return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * p // 100) - 1))] / 1e6
+            
+            result[stage] = {
+                'count': len(ordered),
+                'mean_ms': round(total / len(ordered) / 1e6, 4),
+                'p50_ms': round(percentile(50), 4),
+                'p90_ms': round(percentile(90), 4),
+                'p99_ms': round(percentile(99), 4),
+                'max_ms': round(ordered[-1] / 1e6, 4),
+                'total_s': round(total / 1e9, 4),
+                'ops_per_second': round(len(ordered) / (total / 1e9), 1) if total else None,
+                'share': round(total / grand_total, 4)
+            }
+        return result
+
+def process_message(transaction_queue, runtime, timer, use_context=True):
+    """
+    Take one message off the queue and run it through the pipeline, timing each stage.
+    
+    Returns:
+        tuple: (transaction, decision), or None when the queue is empty
+    """
+    from app import db
+    from app.algorithm.feature_context import TransactionContext
+    from app.algorithm.input_processor import process_transaction_input
+    from app.models.transaction import Transaction
+    
+    timer.start('queue')
+    transaction_id = transaction_queue.get()
+    timer.stop()
+    if transaction_id is None:
+        return None
+    
+    timer.start('load')
+    transaction = db.session.get(Transaction, transaction_id)
+    timer.stop()
+    
+    timer.start('input')
+    context = None
+    if use_context:
+        context = TransactionContext(transaction, include_window=runtime.graph_temporal.needs_history_window)
+    user_data, transaction_data = process_transaction_input(transaction, context)
+    timer.stop()
+    
+    timer.start('graph_temporal')
+    graph_temporal_score, graph_temporal_details = runtime.graph_temporal.analyze(
+        transaction.sender_id, transaction.receiver_id, transaction.amount,
+        transaction.timestamp, transaction.id, context
+    )
+    timer.stop()
+    
+    timer.start('content')
+    content_score, content_details = runtime.content_analyzer.analyze(transaction_data)
+    timer.stop()
+    
+    timer.start('risk')
+    risk_score, decision, risk_details = runtime.risk_engine.calculate_risk(
+        graph_temporal_score, content_score, transaction_data,
+        graph_temporal_details, content_details
+    )
+    timer.stop()
+    
+    timer.start('store')
+    transaction.graph_temporal_score = graph_temporal_score
+    transaction.content_analysis_score = content_score
+    transaction.risk_score = risk_score
+    transaction.status = decision
+    transaction.processed = True
+    transaction.risk_details = Transaction.serialize_risk_details(risk_details)
+    db.session.commit()
+    timer.stop()
+    
+    return transaction, decision
+
+def git_commit():
+    """Commit of the working tree, if it is a git checkout"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    """
+    Run the benchmark.
+    
+    Returns:
+        dict: Results, ready to be written as JSON
+    """
+    import sqlalchemy
+    from app import db, serialization
+    from app.algorithm.graph_temporal import GraphTemporalAnalyzer
+    from app.models.transaction import Transaction
+    from app.runtime import WorkerRuntime
+    from benchmarks.synthetic import TrafficGenerator, degree_summary
+    
+    runtime = WorkerRuntime()
+    if args.graph == 'query':
+        # Rebuild the graph from the database for every transaction
+        runtime.graph_temporal = GraphTemporalAnalyzer()
+    
+    generator = TrafficGenerator(
+        seed=args.seed, accounts=args.accounts, merchants=args.merchants,
+        protected_domains=runtime.content_analyzer.legitimate_domains
+    )
+    now = datetime.utcnow()
+    history = generator.history(args.history, now - timedelta(minutes=5), days=args.days)
+    stream = generator.stream(args.warmup + args.transactions, now, fraud_rate=args.fraud_rate)
+    
+    with runtime.app.app_context():
+        db.session.bulk_insert_mappings(Transaction, history)
+        db.session.bulk_insert_mappings(Transaction, stream)
+        db.session.commit()
+    
+    runtime.warmup()
+    
+    transaction_queue = InMemoryQueue()
+    timer = StageTimer()
+    decisions = {}
+    
+    with runtime.app.app_context():
+        for row in stream:
+            transaction_queue.publish(row['id'])
+        
+        # First transactions fill caches and the connection pool; not measured
+        timer.enabled = False
+        for _ in range(args.warmup):
+            process_message(transaction_queue, runtime, timer)
+        timer.enabled = True
+        
+        start = time.perf_counter()
+        while True:
+            processed = process_message(transaction_queue, runtime, timer, use_context=not args.no_context)
+            if processed is None:
+                break
+            transaction, decision = processed
+            pattern = transaction.simulation_type or 'none'
+            decisions.setdefault(pattern, Counter())[decision] += 1
+        seconds = time.perf_counter() - start
+    
+    return {
+        'benchmark': 'pipeline',
+        'schema': SCHEMA_VERSION,
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'git_commit': git_commit(),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'json_backend': serialization.BACKEND
+        },
+        'parameters': {
+            'seed': args.seed,
+            'accounts': args.accounts,
+            'merchants': args.merchants,
+            'history': args.history,
+            'days': args.days,
+            'transactions': args.transactions,
+            'warmup': args.warmup,
+            'fraud_rate': args.fraud_rate,
+            'graph': args.graph,
+            'context': not args.no_context
+        },
+        'dataset': {
+            'history_degrees': degree_summary(history),
+            'stream_patterns': dict(Counter(row['simulation_type'] or 'none' for row in stream[args.warmup:]))
+        },
+        'throughput': {
+            'transactions': args.transactions,
+            'seconds': round(seconds, 4),
+            'transactions_per_second': round(args.transactions / seconds, 1)
+        },
+        'stages': timer.summary(),
+        'decisions': {pattern: dict(counts) for pattern, counts in sorted(decisions.items())}
+    }
+
+def print_report(results, baseline=None, out=sys.stderr):
+    """Print stage latencies, with the change from a baseline run if given"""
+    def change(new, old):
+        if not old:
+            return ''
+        return f"{(new - old) / old * 100:+7.1f}%"
+    
+    header = f"{'stage':<16}{'mean ms':>10}{'p50 ms':>10}{'p99 ms':>10}{'share':>8}"
+    if baseline:
+        header += f"{'p50 vs base':>14}"
+    print(header, file=out)
+    
+    base_stages = baseline.get('stages', {}) if baseline else {}
+    for stage in STAGES:
+        stats = results['stages'].get(stage)
+        if stats is None:
+            continue
+        line = f"{stage:<16}{stats['mean_ms']:>10.3f}{stats['p50_ms']:>10.3f}{stats['p99_ms']:>10.3f}{stats['share']:>8.1%}"
+        if baseline and stage in base_stages:
+            line += f"{change(stats['p50_ms'], base_stages[stage]['p50_ms']):>14}"
+        print(line, file=out)
+    
+    throughput = results['throughput']['transactions_per_second']
+    line = f"throughput: {throughput:.1f} tx/s"
+    if baseline:
+        base_throughput = baseline['throughput']['transactions_per_second']
+        line += f" (baseline {base_throughput:.1f} tx/s, {change(throughput, base_throughput).strip()})"
+        if baseline.get('parameters') != results['parameters']:
+            line += "\nwarning: baseline was run with different parameters"
+    print(line, file=out)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--accounts', type=int, default=2000)
+    parser.add_argument('--merchants', type=int, default=100)
+    parser.add_argument('--history', type=int, default=20000, help='Processed transactions already stored')
+    parser.add_argument('--days', type=int, default=30, help='Period covered by the history')
+    parser.add_argument('--transactions', type=int, default=1000, help='Measured transactions')
+    parser.add_argument('--warmup', type=int, default=50, help='Transactions processed before measuring')
+    parser.add_argument('--fraud-rate', type=float, default=0.03)
+    parser.add_argument(
+        '--graph', choices=('runtime', 'query'), default='runtime',
+        help='In-memory graph of the worker runtime, or a graph built from the database per transaction'
+    )
+    parser.add_argument('--no-context', action='store_true', help='Let each stage query on its own')
+    parser.add_argument('--output', help='Write the JSON results here instead of stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare with')
+    args = parser.parse_args(argv)
+    
+    logging.basicConfig(level=logging.WARNING)
+    
+    # Point the app at a throwaway SQLite file before anything reads the config;
+    # domain verdicts are not shared with other runs
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ['DOMAIN_CACHE_PATH'] = ''
+    
+    results = run(args)
+    
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    
+    output = json.dumps(results, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Benchmark: SQL statements issued per pipeline stage for each transaction.
+
+Compares the stages querying on their own ("per-stage queries") with the
+shared TransactionContext, both for the per-call graph build and for the
+worker runtime with in-memory graph and account statistics.
+
+Usage:
+    python -m benchmarks.query_counts --messages 50
+"""
+import argparse
+import logging
+import os
+import tempfile
+from collections import Counter
+
+STAGES = ('input', 'graph_temporal', 'content', 'risk')
+
+class QueryCounter:
+    """Counts statements executed on an engine, attributed to the current stage"""
+    
+    def __init__(self, engine):
+        from sqlalchemy import event
+        
+        self.stage = None
+        self.counts = Counter()
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+    
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.stage is not None:
+            self.counts[self.stage] += 1
+
+def score(transaction, analyzer, content_analyzer, risk_engine, counter, use_context):
+    from app.algorithm.feature_context import TransactionContext
+    from app.algorithm.input_processor import process_transaction_input
+    
+    context = None
+    if use_context:
+        context = TransactionContext(transaction, include_window=analyzer.needs_history_window)
+    
+    counter.stage = 'input'
+    user_data, transaction_data = process_transaction_input(transaction, context)
+    
+    counter.stage = 'graph_temporal'
+    graph_temporal_score, graph_temporal_details = analyzer.analyze(
+        transaction.sender_id, transaction.receiver_id, transaction.amount,
+        transaction.timestamp, transaction.id, context
+    )
+    
+    counter.stage = 'content'
+    content_score, content_details = content_analyzer.analyze(transaction_data)
+    
+    counter.stage = 'risk'
+    risk_engine.calculate_risk(
+        graph_temporal_score, content_score, transaction_data,
+        graph_temporal_details, content_details
+    )
+    counter.stage = None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--accounts', type=int, default=200)
+    parser.add_argument('--history', type=int, default=3000)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    
+    # Point the app at a throwaway SQLite file before anything reads the config
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    
+    from app import db
+    from app.algorithm.graph_temporal import GraphTemporalAnalyzer
+    from app.models.transaction import Transaction
+    from app.runtime import WorkerRuntime
+    from benchmarks.worker_runtime import seed_database
+    
+    runtime = WorkerRuntime()
+    with runtime.app.app_context():
+        pending_ids = seed_database(db, Transaction, args.accounts, args.history, args.messages)
+        runtime.warmup()
+        counter = QueryCounter(db.engine)
+        
+        modes = [
+            ('per-stage queries', GraphTemporalAnalyzer(), False),
+            ('shared context', GraphTemporalAnalyzer(), True),
+            ('runtime + context', runtime.graph_temporal, True),
+        ]
+        
+        print(f"{'queries per transaction':<24}" + ''.join(f"{stage:>16}" for stage in STAGES) + f"{'total':>10}")
+        for name, analyzer, use_context in modes:
+            counter.counts.clear()
+            for transaction_id in pending_ids:
+                transaction = db.session.get(Transaction, transaction_id)
+                score(transaction, analyzer, runtime.content_analyzer, runtime.risk_engine, counter, use_context)
+            
+            per_stage = [counter.counts[stage] / len(pending_ids) for stage in STAGES]
+            print(f"{name:<24}" + ''.join(f"{count:>16.2f}" for count in per_stage) + f"{sum(per_stage):>10.2f}")
+
+if __name__ == '__main__':
+    main()
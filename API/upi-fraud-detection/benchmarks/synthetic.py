@@ -0,0 +1,293 @@
+"""
+Synthetic UPI traffic: an account population and transaction streams.
+
+Everything is drawn from one random.Random(seed), so the same seed gives the
+same accounts, transactions and IDs on every machine and every commit.
+
+The population has personal accounts whose activity follows a power law (a
+few very active senders, a long tail of occasional ones), each with a small
+set of regular contacts, and merchants whose popularity follows a Zipf law.
+Streams mix ordinary payments (P2P and merchant, some with a legitimate
+payment URL or QR code) with the fraud patterns of /api/simulate-fraud:
+phishing_url, qr_code_tampering, network_fraud and high_value. Phishing URLs
+are look-alikes of the protected domains (typos, digit homoglyphs, added
+hyphens), domains with suspicious TLDs and keyword-stuffed hostnames.
+"""
+import random
+import uuid
+from datetime import timedelta
+
+FRAUD_TYPES = ('phishing_url', 'qr_code_tampering', 'network_fraud', 'high_value')
+
+# Digits and letters that pass for each other in a domain name
+HOMOGLYPHS = {'o': '0', 'l': '1', 'i': '1', 'e': '3', 'a': '4', 's': '5'}
+
+PHISHING_KEYWORDS = ('secure', 'verify', 'login', 'account', 'update', 'confirm')
+PHISHING_TLDS = ('.xyz', '.tk', '.ml', '.ga', '.cf', '.gq')
+
+class AccountPopulation:
+    """
+    Personal accounts and merchants with power-law activity.
+    
+    Attributes:
+        accounts (list): Personal account IDs
+        merchants (list): Merchant account IDs
+        contacts (dict): Personal account ID -> list of regular P2P receivers
+    """
+    
+    def __init__(self, rng, accounts, merchants, contacts_per_account=8, activity_exponent=1.2):
+        """
+        Generate the population.
+        
+        Args:
+            rng (random.Random): Source of randomness
+            accounts (int): Number of personal accounts
+            merchants (int): Number of merchants
+            contacts_per_account (int): Average size of an account's contact list
+            activity_exponent (float): Pareto shape of the sending activity; lower is more skewed
+        """
+        self.rng = rng
+        self.accounts = [f"acc_{i}" for i in range(accounts)]
+        self.merchants = [f"merchant_{i}" for i in range(merchants)]
+        
+        # Sending activity: Pareto weights give power-law out-degrees
+        self._activity = [rng.paretovariate(activity_exponent) for _ in self.accounts]
+        
+        # Merchant popularity: Zipf weights give power-law in-degrees
+        self._popularity = [1 / (rank + 1) for rank in range(merchants)]
+        
+        # Contacts are drawn by activity as well, so busy accounts are also popular receivers
+        self.contacts = {}
+        for account in self.accounts:
+            size = max(1, int(rng.expovariate(1 / contacts_per_account)))
+            contacts = set(rng.choices(self.accounts, weights=self._activity, k=size))
+            contacts.discard(account)
+            self.contacts[account] = sorted(contacts) or [rng.choice(self.accounts)]
+    
+    def sender(self):
+        """A sender, weighted by activity"""
+        return self.rng.choices(self.accounts, weights=self._activity)[0]
+    
+    def merchant(self):
+        """A merchant, weighted by popularity"""
+        return self.rng.choices(self.merchants, weights=self._popularity)[0]
+    
+    def contact(self, account):
+        """A receiver for a P2P payment: usually a regular contact, sometimes anyone"""
+        if self.rng.random() < 0.85:
+            return self.rng.choice(self.contacts[account])
+        receiver = self.rng.choice(self.accounts)
+        return receiver if receiver != account else self.rng.choice(self.contacts[account])
+
+class PhishingUrlGenerator:
+    """Payment URLs on protected domains and on phishing look-alikes of them"""
+    
+    def __init__(self, rng, protected_domains):
+        """
+        Args:
+            rng (random.Random): Source of randomness
+            protected_domains (list): Legitimate payment domains to imitate
+        """
+        self.rng = rng
+        self.protected_domains = list(protected_domains)
+    
+    def legitimate(self):
+        """An https URL on a protected domain"""
+        domain = self.rng.choice(self.protected_domains)
+        return f"https://{domain}/pay?ref={self.rng.getrandbits(32):08x}"
+    
+    def lookalike_domain(self):
+        """A protected domain with a typo, a homoglyph or an added hyphen"""
+        domain = self.rng.choice(self.protected_domains)
+        name, _, suffix = domain.rpartition('.')
+        technique = self.rng.randrange(5)
+        position = self.rng.randrange(len(name))
+        
+        if technique == 0:  # swap two neighbouring characters
+            position = min(position, len(name) - 2)
+            name = name[:position] + name[position + 1] + name[position] + name[position + 2:]
+        elif technique == 1:  # drop a character
+            name = name[:position] + name[position + 1:]
+        elif technique == 2:  # double a character
+            name = name[:position] + name[position] + name[position:]
+        elif technique == 3:  # replace a letter with a look-alike digit
+            candidates = [i for i, char in enumerate(name) if char in HOMOGLYPHS]
+            if candidates:
+                position = self.rng.choice(candidates)
+                name = name[:position] + HOMOGLYPHS[name[position]] + name[position + 1:]
+        else:  # add a hyphen
+            position = max(position, 1)
+            name = name[:position] + '-' + name[position:]
+        return f"{name}.{suffix}"
+    
+    def phishing(self):
+        """An http URL on a look-alike, suspicious-TLD or keyword-stuffed domain"""
+        style = self.rng.randrange(3)
+        if style == 0:
+            domain = self.lookalike_domain()
+        elif style == 1:
+            # The most distinctive label, e.g. 'netbanking' in netbanking.sbi.co.in
+            brand = max(self.rng.choice(self.protected_domains).split('.')[:-1], key=len)
+            domain = f"{brand}-{self.rng.choice(PHISHING_KEYWORDS)}{self.rng.choice(PHISHING_TLDS)}"
+        else:
+            brand = self.rng.choice(self.protected_domains)
+            domain = f"{self.rng.choice(PHISHING_KEYWORDS)}-{brand}.{self.rng.choice(PHISHING_KEYWORDS)}-{self.rng.randrange(10 ** 6):06d}.com"
+        return f"http://{domain}/payment?session={self.rng.getrandbits(48):012x}"
+
+class TrafficGenerator:
+    """Transaction rows, as keyword arguments for Transaction, for a population"""
+    
+    def __init__(self, seed=42, accounts=2000, merchants=100, protected_domains=()):
+        """
+        Args:
+            seed (int): Seed for every random choice, including IDs
+            accounts (int): Number of personal accounts
+            merchants (int): Number of merchants
+            protected_domains (list): Legitimate payment domains, used for payment URLs
+        """
+        self.rng = random.Random(seed)
+        self.population = AccountPopulation(self.rng, accounts, merchants)
+        self.urls = PhishingUrlGenerator(self.rng, protected_domains or ['paytm.com'])
+    
+    def _id(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+    
+    def _ordinary(self, timestamp):
+        rng = self.rng
+        sender = self.population.sender()
+        metadata = {}
+        
+        if rng.random() < 0.6:
+            receiver = self.population.merchant()
+            amount = round(rng.lognormvariate(6.0, 1.1), 2)
+            channel = rng.random()
+            if channel < 0.3:
+                metadata = {'payment_url': self.urls.legitimate(), 'user_agent': 'Mozilla/5.0'}
+            elif channel < 0.6:
+                metadata = {
+                    'qr_code_payload': {'original_receiver': receiver, 'merchant_id': receiver},
+                    'device_info': rng.choice(('Android 12', 'Android 13', 'iOS 16'))
+                }
+        else:
+            receiver = self.population.contact(sender)
+            amount = round(rng.lognormvariate(7.0, 1.3), 2)
+        
+        return self._row(sender, receiver, amount, timestamp, metadata)
+    
+    def _fraud(self, fraud_type, timestamp):
+        """A transaction shaped like the /api/simulate-fraud scenario of the same name"""
+        rng = self.rng
+        sender = self.population.sender()
+        receiver = self.population.contact(sender)
+        amount = round(rng.lognormvariate(7.0, 1.0), 2)
+        metadata = {}
+        
+        if fraud_type == 'high_value':
+            amount *= 100
+        elif fraud_type == 'phishing_url':
+            metadata = {
+                'payment_url': self.urls.phishing(),
+                'user_agent': 'Mozilla/5.0',
+                'ip_address': f"192.168.{rng.randrange(256)}.{rng.randrange(1, 255)}"
+            }
+        elif fraud_type == 'qr_code_tampering':
+            metadata = {
+                'qr_code_payload': {
+                    'original_receiver': receiver,
+                    'tampered_receiver': f"mule_{rng.randrange(50)}",
+                    'tampering_confidence': round(rng.uniform(0.6, 0.99), 2)
+                },
+                'device_info': 'Android 12'
+            }
+        elif fraud_type == 'network_fraud':
+            # A first payment to an account outside the sender's network
+            receiver = f"mule_{rng.randrange(50)}"
+            metadata = {
+                'recent_receivers': rng.sample(self.population.accounts, 3) + [receiver],
+                'network_anomaly': 'unusual_connection_chain'
+            }
+        
+        return self._row(sender, receiver, amount, timestamp, metadata, fraud_type)
+    
+    def _row(self, sender, receiver, amount, timestamp, metadata, simulation_type=None):
+        return {
+            'id': self._id(),
+            'sender_id': sender,
+            'receiver_id': receiver,
+            'amount': amount,
+            'timestamp': timestamp,
+            'txn_metadata': metadata,
+            'is_simulated': simulation_type is not None,
+            'simulation_type': simulation_type
+        }
+    
+    def history(self, count, end, days=30):
+        """
+        Processed transactions spread over the days before end, oldest first.
+        
+        Args:
+            count (int): Number of transactions
+            end (datetime): Time of the newest transaction
+            days (int): Length of the period
+        
+        Returns:
+            list: Transaction rows with status 'approved' and processed set
+        """
+        span = days * 24 * 3600
+        offsets = sorted((self.rng.uniform(0, span) for _ in range(count)), reverse=True)
+        rows = []
+        for offset in offsets:
+            row = self._ordinary(end - timedelta(seconds=offset))
+            row.update(status='approved', processed=True)
+            rows.append(row)
+        return rows
+    
+    def stream(self, count, start, rate_per_second=200.0, fraud_rate=0.03):
+        """
+        Incoming transactions to score, in arrival order.
+        
+        Args:
+            count (int): Number of transactions
+            start (datetime): Arrival time of the first transaction
+            rate_per_second (float): Mean arrival rate (Poisson arrivals)
+            fraud_rate (float): Share of transactions following a fraud pattern
+        
+        Returns:
+            list: Pending transaction rows
+        """
+        rows = []
+        timestamp = start
+        for _ in range(count):
+            timestamp += timedelta(seconds=self.rng.expovariate(rate_per_second))
+            if self.rng.random() < fraud_rate:
+                row = self._fraud(self.rng.choice(FRAUD_TYPES), timestamp)
+            else:
+                row = self._ordinary(timestamp)
+            row.update(status='pending', processed=False)
+            rows.append(row)
+        return rows
+
+def degree_summary(rows):
+    """
+    Out- and in-degree statistics of a set of transaction rows.
+    
+    Returns:
+        dict: Distinct counterparties per sender and per receiver (max, mean, top 1% share)
+    """
+    out_edges = {}
+    in_edges = {}
+    for row in rows:
+        out_edges.setdefault(row['sender_id'], set()).add(row['receiver_id'])
+        in_edges.setdefault(row['receiver_id'], set()).add(row['sender_id'])
+    
+    def summarize(edges):
+        degrees = sorted((len(neighbours) for neighbours in edges.values()), reverse=True)
+        top = degrees[:max(1, len(degrees) // 100)]
+        return {
+            'nodes': len(degrees),
+            'max': degrees[0] if degrees else 0,
+            'mean': round(sum(degrees) / len(degrees), 2) if degrees else 0,
+            'top_1pct_share': round(sum(top) / sum(degrees), 3) if degrees else 0
+        }
+    
+    return {'out_degree': summarize(out_edges), 'in_degree': summarize(in_edges)}
@@ -0,0 +1,116 @@
+"""
+Benchmark: messages/sec of the worker with and without the long-lived runtime.
+
+"before" rebuilds the Flask app, engine and analyzers for every message, which
+is what process_transaction used to do. "after" reuses one WorkerRuntime, and
+"batched" additionally processes --batch-size messages per read and commit.
+
+Usage:
+    python -m benchmarks.worker_runtime --messages 200
+"""
+import argparse
+import logging
+import os
+import random
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+def seed_database(db, Transaction, accounts, history, pending, seed=42):
+    """
+    Insert historical (processed) transactions and pending ones to score.
+    
+    Returns:
+        list: IDs of the pending transactions
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    account_ids = [f"acc_{i}" for i in range(accounts)]
+    
+    for _ in range(history):
+        sender, receiver = rng.sample(account_ids, 2)
+        db.session.add(Transaction(
+            id=str(uuid.uuid4()),
+            sender_id=sender,
+            receiver_id=receiver,
+            amount=round(rng.uniform(10, 5000), 2),
+            timestamp=now - timedelta(minutes=rng.randint(1, 60 * 24 * 29)),
+            status='approved',
+            processed=True
+        ))
+    
+    pending_ids = []
+    for _ in range(pending):
+        sender, receiver = rng.sample(account_ids, 2)
+        transaction_id = str(uuid.uuid4())
+        db.session.add(Transaction(
+            id=transaction_id,
+            sender_id=sender,
+            receiver_id=receiver,
+            amount=round(rng.uniform(10, 20000), 2),
+            timestamp=now,
+            status='pending',
+            processed=False
+        ))
+        pending_ids.append(transaction_id)
+    
+    db.session.commit()
+    return pending_ids
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200, help='Messages per mode')
+    parser.add_argument('--accounts', type=int, default=500)
+    parser.add_argument('--history', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=50)
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.WARNING)
+    
+    # Point the app at a throwaway SQLite file before anything reads the config
+    db_path = os.path.join(tempfile.mkdtemp(), 'bench.db')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    
+    from app import db
+    from app.algorithm.graph_temporal import GraphTemporalAnalyzer
+    from app.models.transaction import Transaction
+    from app.rabbitmq.consumer import process_transaction, process_transactions_batch
+    from app.runtime import WorkerRuntime
+    
+    runtime = WorkerRuntime()
+    with runtime.app.app_context():
+        pending_ids = seed_database(db, Transaction, args.accounts, args.history, args.messages * 3)
+    
+    before_ids = pending_ids[:args.messages]
+    after_ids = pending_ids[args.messages:args.messages * 2]
+    batched_ids = pending_ids[args.messages * 2:]
+    
+    # Before: a fresh app, engine and analyzers for every message
+    start = time.perf_counter()
+    for transaction_id in before_ids:
+        legacy = WorkerRuntime()
+        legacy.graph_temporal = GraphTemporalAnalyzer()
+        process_transaction(transaction_id, legacy)
+    before = len(before_ids) / (time.perf_counter() - start)
+    
+    # After: one warmed-up runtime for the whole run
+    runtime.warmup()
+    start = time.perf_counter()
+    for transaction_id in after_ids:
+        process_transaction(transaction_id, runtime)
+    after = len(after_ids) / (time.perf_counter() - start)
+    
+    # Batched: one IN (...) read and one commit per batch
+    start = time.perf_counter()
+    for i in range(0, len(batched_ids), args.batch_size):
+        process_transactions_batch(batched_ids[i:i + args.batch_size], runtime)
+    batched = len(batched_ids) / (time.perf_counter() - start)
+    
+    print(f"before (create_app per message): {before:8.1f} msg/s")
+    print(f"after  (long-lived runtime):     {after:8.1f} msg/s")
+    print(f"batched (batch size {args.batch_size:<4}):      {batched:8.1f} msg/s")
+    print(f"speedup:                         {after / before:8.1f}x / {batched / before:.1f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,16 @@
+import os
+
+# Gunicorn settings for the API (gunicorn -c gunicorn.conf.py run:app)
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+# /transaction/<id>/wait and /transaction/<id>/events hold a request open for
+# up to RESULT_WAIT_MAX_SECONDS and RESULT_STREAM_MAX_SECONDS. Threaded workers
+# keep serving other requests meanwhile; each waiting client takes one thread
+worker_class = 'gthread'
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+threads = int(os.getenv('GUNICORN_THREADS', 32))
+
+# Longer than the longest event stream, so no response is cut off
+timeout = int(os.getenv('RESULT_STREAM_MAX_SECONDS', 300)) + 30
+graceful_timeout = 30
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# Tests run against a throwaway SQLite file and an unreachable broker. Set
+# before app.config is first imported, since Config reads the environment then
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'tests.db')}"
+os.environ['RABBITMQ_HOST'] = '127.0.0.1'
+os.environ['RABBITMQ_PORT'] = '1'
+os.environ['DOMAIN_CACHE_PATH'] = ''
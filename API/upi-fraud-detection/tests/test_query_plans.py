@@ -0,0 +1,21 @@
+"""
+Query plan regression tests: the history queries must keep using the
+transactions indexes. See benchmarks/check_query_plans.py for the checks.
+"""
+import pytest
+from benchmarks.check_query_plans import EXPECTATIONS, check_all, prepare, run_cases
+
+@pytest.fixture(scope='module')
+def plan_results():
+    from app import create_app, db
+    
+    app = create_app()
+    recorder, sender_id, receiver_id = prepare(app, db, accounts=200, history=2000)
+    run_cases(app, db, recorder, sender_id, receiver_id)
+    return check_all(app, db, recorder)
+
+@pytest.mark.parametrize('label', list(EXPECTATIONS))
+def test_query_plan(plan_results, label):
+    plans, problems = plan_results[label]
+    plan_text = '\n'.join(line for plan in plans for line in plan)
+    assert not problems, f"{label}: {'; '.join(problems)}\n{plan_text}"
@@ -0,0 +1,67 @@
+"""
+calculate_risk_batch must give exactly the scores and decisions of
+calculate_risk, row by row.
+"""
+import numpy as np
+import pytest
+from app.algorithm.risk_engine import BLOCKING_SIMULATIONS, DECISIONS, VERIFICATION_SIMULATIONS, RiskEngine
+from app.config import Config
+from benchmarks.risk_batch import generate_rows, score_scalar
+
+def edge_rows():
+    """Rows on every decision threshold and amount cut-off, for every account and simulation kind"""
+    thresholds = [Config.LOW_RISK_THRESHOLD, Config.MEDIUM_RISK_THRESHOLD, Config.HIGH_RISK_THRESHOLD]
+    scores = sorted({0.0, 1.0, 0.8, np.nextafter(0.8, 1.0)} | {
+        value for threshold in thresholds for value in (np.nextafter(threshold, 0.0), threshold, np.nextafter(threshold, 1.0))
+    })
+    amounts = [0.0, 9999.99, 10000.0, 10000.01, 20000.0, 60000.0]
+    simulations = [(False, '')] + [(True, simulation_type) for simulation_type in
+                                   ('',) + BLOCKING_SIMULATIONS + VERIFICATION_SIMULATIONS + ('velocity',)]
+    
+    rows = {key: [] for key in ('graph_temporal_scores', 'content_analysis_scores', 'amounts',
+                                'is_new_account', 'is_simulated', 'simulation_types')}
+    for score in scores:
+        for amount in amounts:
+            for is_new_account in (False, True):
+                for is_simulated, simulation_type in simulations:
+                    # Both scores on the value, and each alone, so the combined score lands on the thresholds
+                    for graph_temporal_score, content_analysis_score in ((score, score), (score, 0.0), (0.0, score)):
+                        rows['graph_temporal_scores'].append(graph_temporal_score)
+                        rows['content_analysis_scores'].append(content_analysis_score)
+                        rows['amounts'].append(amount)
+                        rows['is_new_account'].append(is_new_account)
+                        rows['is_simulated'].append(is_simulated)
+                        rows['simulation_types'].append(simulation_type)
+    
+    return {
+        key: np.array(values, dtype=object if key == 'simulation_types' else None)
+        for key, values in rows.items()
+    }
+
+@pytest.mark.parametrize('data', [generate_rows(5000, seed=7), edge_rows()], ids=['random', 'edges'])
+def test_batch_matches_scalar(data):
+    risk_engine = RiskEngine()
+    scalar_scores, scalar_decisions = score_scalar(risk_engine, data)
+    batch_scores, batch_decisions = risk_engine.calculate_risk_batch(**data)
+    
+    for row, (scalar_score, batch_score) in enumerate(zip(scalar_scores, batch_scores.tolist())):
+        assert batch_score == scalar_score, f"row {row}: score {batch_score!r} != {scalar_score!r}"
+    assert [DECISIONS[code] for code in batch_decisions.tolist()] == scalar_decisions
+    
+    # The sample reaches every decision
+    assert set(scalar_decisions) == set(DECISIONS)
+
+def test_batch_without_optional_columns_matches_scalar_defaults():
+    data = generate_rows(1000, seed=11)
+    risk_engine = RiskEngine()
+    batch_scores, batch_decisions = risk_engine.calculate_risk_batch(
+        data['graph_temporal_scores'], data['content_analysis_scores'], data['amounts']
+    )
+    
+    for row, (graph_temporal_score, content_analysis_score, amount) in enumerate(zip(
+            data['graph_temporal_scores'].tolist(), data['content_analysis_scores'].tolist(), data['amounts'].tolist())):
+        risk_score, decision, _ = risk_engine.calculate_risk(
+            graph_temporal_score, content_analysis_score, {'amount': amount}, {}, {}
+        )
+        assert batch_scores[row] == risk_score, f"row {row}"
+        assert DECISIONS[batch_decisions[row]] == decision, f"row {row}"
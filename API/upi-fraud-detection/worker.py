@@ -1,19 +1,55 @@
+import argparse
 import os
 import logging
-import time
-from app.rabbitmq.consumer import start_consumer
+import signal
+import sys
+from app.config import Config
+from app.metrics import start_metrics_server
+from app.profiler import install_signal_handler
+from app.rabbitmq.consumer import request_stop, run_consumer
+from app.readiness import wait_for_dependencies
 
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    format='%(asctime)s - %(name)s - %(levelname)s - %(process)d - %(message)s'
 )
 
+def parse_args():
+    parser = argparse.ArgumentParser(description='UPI Fraud Detection worker')
+    parser.add_argument(
+        '--processes', type=int, default=Config.WORKER_PROCESSES,
+        help='Consumer processes to run under a supervisor (default: WORKER_PROCESSES, 1 runs a single consumer)'
+    )
+    parser.add_argument(
+        '--mode', choices=('blocking', 'async'), default=Config.WORKER_MODE,
+        help='Consumer implementation (default: WORKER_MODE)'
+    )
+    return parser.parse_args()
+
 if __name__ == '__main__':
-    # Wait for RabbitMQ to be ready
-    time.sleep(10)  # Simple delay to ensure RabbitMQ container is ready
+    args = parse_args()
+    
+    # Wait for RabbitMQ and the database, retrying with backoff up to READINESS_TIMEOUT_SECONDS
+    if not wait_for_dependencies():
+        logging.error("Dependencies not ready; starting anyway, the consumer retries on its own")
     
     logging.info("Starting UPI Fraud Detection worker...")
     
+    if args.processes > 1:
+        # One consumer per process, forked from a warmed-up supervisor
+        from app.rabbitmq.supervisor import run_supervisor
+        sys.exit(run_supervisor(args.processes, args.mode))
+    
+    # Finish the work in hand before exiting on SIGTERM
+    signal.signal(signal.SIGTERM, lambda signum, frame: request_stop())
+    
+    # kill -USR2 <pid> profiles the worker for PROFILER_DURATION_SECONDS
+    install_signal_handler()
+    
+    # Expose stage latencies, queue lag, decisions and errors for Prometheus
+    if Config.WORKER_METRICS_PORT:
+        start_metrics_server(Config.WORKER_METRICS_PORT)
+    
     # Start the RabbitMQ consumer
-    start_consumer()
\ No newline at end of file
+    run_consumer(args.mode)
\ No newline at end of file